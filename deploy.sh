@@ -48,6 +48,12 @@ python3 manage.py migrate
 # Collect static files
 python3 manage.py collectstatic --noinput
 
+# Publish the content snapshot for workers and static page snapshots for nginx
+python3 manage.py publish_site
+
+# Per-client video stream limit for nginx, taken from Django settings
+python3 manage.py nginx_stream_limits
+
 # Create superuser (admin/admin) if not exists
 echo "Creating default superuser..."
 cat <<EOF | python3 manage.py shell
@@ -84,6 +90,15 @@ systemctl restart gunicorn
 # 7. Setup Nginx
 echo "[7/9] Configuring Nginx..."
 cat > /etc/nginx/sites-available/dron <<EOF
+# Одновременные отдачи медиа с одного адреса (см. /protected-media/)
+limit_conn_zone \$binary_remote_addr zone=media_per_client:10m;
+
+# Загрузки с именем из хэша содержимого (landing/storage.py) не меняются
+map \$uri \$media_cache_control {
+    default "";
+    "~/[0-9a-f]{32}\.[A-Za-z0-9]+\$" "public, max-age=31536000, immutable";
+}
+
 server {
     listen 80;
     server_name $DOMAIN $IP;
@@ -92,10 +107,46 @@ server {
     
     location /static/ {
         alias $PROJECT_DIR/staticfiles/;
+        gzip_static on;
+        add_header Cache-Control "public, max-age=31536000, immutable";
     }
 
     location /media/ {
         alias $PROJECT_DIR/media/;
+        add_header Cache-Control \$media_cache_control;
+    }
+
+    location /media/hls/ {
+        alias $PROJECT_DIR/media/hls/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    location /media/videos/ {
+        proxy_pass http://127.0.0.1:8000;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+    }
+
+    location /protected-media/ {
+        internal;
+        alias $PROJECT_DIR/media/;
+        # Лимит потоков на клиента тот же, что у Django (MEDIA_STREAM_MAX_PER_CLIENT):
+        # файл создаёт manage.py nginx_stream_limits
+        include $PROJECT_DIR/var/nginx/stream_limits.conf;
+        limit_rate_after 4m;
+        limit_rate 2m;
+    }
+
+    location = / {
+        root $PROJECT_DIR/var/published;
+        try_files /index.html @django;
+    }
+
+    location = /privacy-policy/ {
+        root $PROJECT_DIR/var/published;
+        try_files /privacy-policy/index.html @django;
     }
 
     location / {
@@ -105,6 +156,23 @@ server {
         proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto \$scheme;
     }
+
+    # Метрики Prometheus: только с самого сервера и с токеном DRON_METRICS_TOKEN
+    location = /metrics {
+        allow 127.0.0.1;
+        deny all;
+        proxy_pass http://127.0.0.1:8000;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+    }
+
+    location @django {
+        proxy_pass http://127.0.0.1:8000;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+    }
 }
 EOF
 
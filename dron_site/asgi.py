@@ -6,5 +6,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dron_site.settings')
+os.environ.setdefault('DRON_SITE_ASGI', '1')
 
 application = get_asgi_application()
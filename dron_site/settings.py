@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: время ответа включает все остальные middleware
+    'landing.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,13 +41,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'landing.querybudget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'dron_site.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера (landing/metrics.py)
+        'BACKEND': 'landing.metrics.InstrumentedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -110,10 +114,128 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic кладёт файлы с хэшем в имени, минифицирует CSS и добавляет
+# сжатые копии .gz/.br для nginx (landing/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'landing.storage.LandingStaticStorage',
+    },
+}
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ширины уменьшенных копий изображений для srcset (landing/images.py)
+IMAGE_RENDITION_WIDTHS = (480, 960, 1440, 1920)
+
+# Отдача медиа из Django: 'x-accel' — Django проверяет запрос и выставляет
+# заголовки, а сам файл отдаёт nginx через X-Accel-Redirect (см. nginx.conf).
+# None — файл стримит сам Django, для разработки без nginx.
+MEDIA_OFFLOAD = None if DEBUG else 'x-accel'
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+# Асинхронная отдача видео и медиа, включается в dron_site/asgi.py
+MEDIA_ASYNC_STREAMING = os.environ.get('DRON_SITE_ASGI') == '1'
+
+# Ограничение одновременных отдач видео из Django (landing/streams.py),
+# картинки и другие медиа не ограничиваются. Каждый поток занимает
+# sync-воркер gunicorn целиком, поэтому потоков меньше, чем воркеров
+# (--workers 3 в gunicorn.service): один воркер всегда свободен для
+# страниц. Под ASGI поток не держит воркер, и лимит выше. Лимит на
+# клиента заметно ниже общего: один клиент (менеджер загрузок, страница
+# с несколькими плеерами) не занимает все места. Второй одновременный
+# запрос того же клиента (Safari перезапрашивает видео пересекающимися
+# Range) получает 429 с Retry-After и повторяется. Тот же лимит nginx
+# применяет к X-Accel-Redirect: manage.py nginx_stream_limits пишет его
+# в MEDIA_STREAM_NGINX_CONF, который подключает nginx.conf
+MEDIA_STREAM_MAX = 16 if MEDIA_ASYNC_STREAMING else 2
+MEDIA_STREAM_MAX_PER_CLIENT = 1
+# Скорость одного потока, байт/с (None — без ограничения). В sync-воркере
+# медленная отдача дольше держит воркер, включайте её вместе с ASGI.
+MEDIA_STREAM_RATE = None
+# Открытый диапазон (Range: bytes=N-) отдаётся кусками не больше этого:
+# медленный клиент не держит воркер на всё видео, плеер дозапросит продолжение
+MEDIA_STREAM_CHUNK = 4 * 1024 * 1024
+MEDIA_STREAM_RETRY_AFTER = 5
+# За nginx адрес клиента приходит в X-Real-IP (proxy_params)
+MEDIA_STREAM_CLIENT_HEADER = None if DEBUG else 'HTTP_X_REAL_IP'
+
+# Служебные файлы сайта (версии контента, кэши), общие для всех воркеров
+VAR_DIR = os.path.join(BASE_DIR, 'var')
+CONTENT_VERSION_FILE = os.path.join(VAR_DIR, 'content_version.json')
+# Файлы, которые воркеры отображают в память (арены landing/shm.py), и
+# счётчики метрик воркеров. Их содержимому воркеры доверяют, поэтому каталог
+# закрытый: 0700, владелец — пользователь сайта, это проверяется при открытии.
+# Общий /dev/shm не годится: файл с известным именем там может заранее
+# создать любой пользователь. Чтобы арены не сбрасывались на диск,
+# смонтируйте сюда tmpfs (uid пользователя сайта, mode=0700)
+RUN_DIR = os.path.join(VAR_DIR, 'run')
+
+# Общий для всех воркеров кэш в разделяемой памяти (landing/cache_backend.py):
+# без Redis/memcached кэш страниц один на все процессы и сбрасывается сразу везде.
+# На Windows (нет flock) — обычный LocMemCache
+CACHES = {
+    'default': {
+        'BACKEND': (
+            'django.core.cache.backends.locmem.LocMemCache' if os.name == 'nt'
+            else 'landing.cache_backend.SharedMemoryCache'
+        ),
+        'LOCATION': os.path.join(RUN_DIR, 'cache.arena'),
+        'OPTIONS': {
+            'SIZE': 32 * 1024 * 1024,
+            'BLOCK_SIZE': 64 * 1024,
+        },
+    },
+}
+
+# Общий для воркеров кэш горячих диапазонов медиа в разделяемой памяти
+# (landing/shm.py): начало и конец файлов, которые запрашивает каждый <video>.
+# Работает, когда файл стримит Django (MEDIA_OFFLOAD = None или ASGI);
+# с X-Accel-Redirect байты отдаёт nginx. 0 выключает кэш.
+MEDIA_HOT_CACHE_SIZE = 64 * 1024 * 1024
+MEDIA_HOT_CACHE_BLOCK = 256 * 1024
+MEDIA_HOT_CACHE_HEAD = 4 * 1024 * 1024
+MEDIA_HOT_CACHE_TAIL = 1024 * 1024
+MEDIA_HOT_CACHE_PATH = os.path.join(RUN_DIR, 'media.arena')
+MEDIA_STREAM_TABLE = os.path.join(VAR_DIR, 'media_streams.table')
+MEDIA_STREAM_NGINX_CONF = os.path.join(VAR_DIR, 'nginx', 'stream_limits.conf')
+
+# Блокировки single-flight (landing/singleflight.py): страницу после правки
+# пересчитывает один запрос, остальные ждут не дольше SINGLE_FLIGHT_TIMEOUT секунд
+SINGLE_FLIGHT_LOCK_DIR = os.path.join(VAR_DIR, 'locks')
+SINGLE_FLIGHT_TIMEOUT = 10
+
+# Статические снимки страниц, которые nginx отдаёт без Django
+PUBLISH_ROOT = os.path.join(VAR_DIR, 'published')
+PUBLISH_ON_SAVE = True
+
+# Снимок публичного контента (landing/snapshot.py): страницы и API галереи
+# читают его вместо БД. Пишется при каждой правке и командой publish_site
+CONTENT_SNAPSHOT_FILE = os.path.join(VAR_DIR, 'content_snapshot.json')
+SERVE_FROM_SNAPSHOT = True
+
+# Метрики Prometheus (landing/metrics.py): счётчики воркеров сбрасываются в
+# METRICS_DIR раз в METRICS_FLUSH_INTERVAL секунд и складываются на /metrics.
+# Доступ по Authorization: Bearer <DRON_METRICS_TOKEN> или для сотрудников
+METRICS_ENABLED = True
+METRICS_DIR = os.path.join(RUN_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get('DRON_METRICS_TOKEN')
+
+# Бюджет запросов к БД (landing/querybudget.py): при разработке превышение
+# бюджета view и повторяющиеся запросы (N+1) пишутся в лог со стеком,
+# с QUERY_BUDGET_RAISE — исключение. Бюджеты view без @query_budget
+# задаются по view_name (шаблоны fnmatch)
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_RAISE = False
+QUERY_REPEAT_THRESHOLD = 3
+QUERY_BUDGETS = {
+    'admin:landing_*_changelist': 10,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -125,12 +247,23 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 CONTACT_FORM_RECIPIENT = 'your_email@example.com' # Замените на ваш email
 DEFAULT_FROM_EMAIL = 'webmaster@localhost'
 
-# Bootstrap settings
-BOOTSTRAP5 = {
-    "css_url": {
-        "url": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
-    },
-    "javascript_url": {
-        "url": "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
-    },
+# Сторонние CSS и JS: путь к локальной сборке в статике (manage.py
+# build_vendor_assets) и адрес на CDN, если собранного файла нет. base.html
+# подключает их тегами vendor_stylesheet и vendor_script
+VENDOR_ASSETS = {
+    'bootstrap_css': (
+        'landing/vendor/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css',
+    ),
+    'bootstrap_js': (
+        'landing/vendor/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js',
+    ),
+    'icons_css': (
+        'landing/vendor/icons.css',
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.6.0/css/all.min.css',
+    ),
 }
+
+# Исходники Bootstrap и Font Awesome для build_vendor_assets (landing/vendor_assets.py)
+VENDOR_SOURCE_DIR = os.path.join(BASE_DIR, 'vendor')
@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from .cache import memoize_for_version
 from .models import (
     AboutBlock, Trailer, ProductInfo, Screenshot, VersionsBlock,
     FPVMode, PurchaseOptionsBlock, Footer, ScreenshotAlbum, AppScreenshot, PrivacyPolicy,
@@ -7,7 +9,10 @@ from .models import (
 
 class SingletonModelAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
-        return self.model.objects.count() == 0
+        # Меню админки спрашивает это у каждого синглтона на каждой странице:
+        # ответ кэшируется в процессе до изменения версии модели
+        label = self.model._meta.label_lower
+        return not memoize_for_version(('singleton-exists', label), label, self.model.objects.exists)
 
 @admin.register(Footer)
 class FooterAdmin(SingletonModelAdmin):
@@ -26,7 +31,13 @@ admin.site.register(PageSettings, SingletonModelAdmin)
 
 @admin.register(Trailer)
 class TrailerAdmin(SingletonModelAdmin):
-    fields = ('title', 'subtitle', 'local_video', 'video_url')
+    fields = (
+        'title', 'subtitle', 'local_video', 'video_url',
+        'video_duration', 'video_width', 'video_height', 'video_bitrate', 'video_faststart', 'video_hls',
+    )
+    readonly_fields = (
+        'video_duration', 'video_width', 'video_height', 'video_bitrate', 'video_faststart', 'video_hls',
+    )
 
 @admin.register(ProductInfo)
 class ProductInfoAdmin(SingletonModelAdmin):
@@ -50,6 +61,8 @@ class ScreenshotAlbumAdmin(admin.ModelAdmin):
 class ScreenshotAdmin(admin.ModelAdmin):
     list_display = ('album', 'caption', 'image')
     list_filter = ('album',)
+    # album в списке — это str(album): без select_related по запросу на строку
+    list_select_related = ('album',)
 
 @admin.register(AppScreenshot)
 class AppScreenshotAdmin(admin.ModelAdmin):
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class LandingConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'landing'
+
+	def ready(self):
+		from django.db.backends.signals import connection_created
+
+		from . import signals  # noqa: F401
+		from . import metrics, querybudget
+		from .snapshot import get_snapshot
+
+		# Снимок контента читается при старте воркера, а не на первом запросе
+		get_snapshot()
+		connection_created.connect(metrics.install_db_wrapper, dispatch_uid='landing_metrics_db')
+		connection_created.connect(querybudget.install_db_wrapper, dispatch_uid='landing_query_budget_db')
@@ -0,0 +1,236 @@
+"""
+Обработка CSS для сборки статики и инлайна критических стилей.
+
+minify_css — безопасная минификация без внешних зависимостей: убирает
+комментарии и лишние пробелы, не трогая строки и url().
+critical_css — правила первого экрана (шапка и #about), которые base.html
+вставляет в <style>, чтобы первая отрисовка не ждала весь style.css.
+purge_css — оставляет только правила с используемыми классами (сборка
+Bootstrap в build_vendor_assets), vendor_static — адрес собранного файла
+из settings.VENDOR_ASSETS.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+
+# Строки в кавычках и url(...) без кавычек не минифицируются
+_CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)'"]*\))''')
+# Комментарии /*! ... */ — лицензии библиотек, их оставляем
+_CSS_COMMENTS = re.compile(r'/\*(?!!).*?\*/', re.S)
+_CSS_SPACES = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+# Пробел перед двоеточием значим в селекторах (a :hover), после — нет
+_CSS_COLON = re.compile(r':\s+')
+
+# Селекторы первого экрана: шапка сайта и hero-секция
+CRITICAL_TOKENS = frozenset((
+    '*', 'html', 'body', 'a', 'h1', ':root',
+    '#about', '.custom-header', '.navbar', '.navbar-brand', '.navbar-nav', '.navbar-toggler',
+    '.navbar-toggler-icon', '.navbar-collapse', '.nav-link', '.nav-item', '.header-logo',
+    '.partner-logo', '.header-btn', '.btn-primary', '.hero-content', '.logo-column',
+    '.text-column', '.text-in-frame',
+))
+CRITICAL_PREFIXES = ('.frame-',)
+_SELECTOR_TOKENS = re.compile(r'[#.]?-?[A-Za-z_][-\w]*|\*|:root')
+
+
+def _split_strings(css):
+    """Чередует куски CSS и строковые литералы: чётные элементы — код."""
+    return _CSS_TOKENS.split(css)
+
+
+def minify_css(css):
+    parts = _split_strings(css)
+    result = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            result.append(part)
+            continue
+        part = _CSS_COMMENTS.sub('', part)
+        part = _CSS_SPACES.sub(' ', part)
+        part = _CSS_PUNCTUATION.sub(r'\1', part)
+        part = _CSS_COLON.sub(':', part)
+        result.append(part)
+    css = ''.join(result).strip()
+    return css.replace(';}', '}')
+
+
+def _blocks(css):
+    """
+    Разбирает CSS верхнего уровня на (прелюдия, тело) с учётом вложенных
+    скобок и строк. Для @import и подобных тело равно None.
+    """
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = None
+    quote = None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def _is_critical_selector(selector):
+    for token in _SELECTOR_TOKENS.findall(selector):
+        if token in CRITICAL_TOKENS or token.startswith(CRITICAL_PREFIXES):
+            return True
+    return False
+
+
+def extract_critical_css(css):
+    """Правила, у которых хотя бы один селектор относится к первому экрану."""
+    rules = []
+    for prelude, body in _blocks(minify_css(css)):
+        if body is None:
+            continue
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            inner = extract_critical_css(body)
+            if inner:
+                rules.append('%s{%s}' % (prelude, inner))
+        elif prelude.startswith('@'):
+            # @keyframes, @font-face и прочее нужны только полному файлу
+            continue
+        elif any(_is_critical_selector(selector) for selector in prelude.split(',')):
+            rules.append('%s{%s}' % (prelude, body))
+    return ''.join(rules)
+
+
+_CLASS_NAMES = re.compile(r'\.(-?[_a-zA-Z][-\w]*)')
+# Лицензия перед первым правилом (/*! Bootstrap ... */) попадает в его прелюдию
+_LICENSE_PREFIX = re.compile(r'^((?:/\*!.*?\*/\s*)+)', re.S)
+# Классы внутри :not() и подобных не обязаны быть в разметке
+_FUNCTIONAL_PSEUDO = re.compile(r':(?:not|is|where|has)\((?:[^()]|\([^()]*\))*\)')
+
+
+def split_selectors(prelude):
+    """Делит список селекторов по запятым верхнего уровня (не внутри скобок)."""
+    selectors = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors if selector.strip()]
+
+
+def _selector_used(selector, used_classes):
+    classes = _CLASS_NAMES.findall(_FUNCTIONAL_PSEUDO.sub('', selector))
+    return all(name in used_classes for name in classes)
+
+
+def purge_css(css, used_classes):
+    """
+    Оставляет селекторы, все классы которых есть в used_classes.
+    Селекторы без классов (элементы, :root, атрибуты), @font-face и
+    @keyframes сохраняются целиком.
+    """
+    rules = []
+    for prelude, body in _blocks(minify_css(css)):
+        license_match = _LICENSE_PREFIX.match(prelude)
+        if license_match:
+            # Лицензию сохраняем всегда, а правило проверяем без неё
+            rules.append(license_match.group(1).strip())
+            prelude = prelude[license_match.end():]
+        if body is None:
+            rules.append(prelude + ';')
+        elif prelude.startswith(('@media', '@supports', '@container', '@layer')):
+            inner = purge_css(body, used_classes)
+            if inner:
+                rules.append('%s{%s}' % (prelude, inner))
+        elif prelude.startswith('@'):
+            rules.append('%s{%s}' % (prelude, body))
+        else:
+            selectors = [selector for selector in split_selectors(prelude) if _selector_used(selector, used_classes)]
+            if selectors:
+                rules.append('%s{%s}' % (','.join(selectors), body))
+    return ''.join(rules)
+
+
+_critical_lock = threading.Lock()
+_critical_cache = {}
+
+
+def _read_static(path):
+    if not settings.DEBUG:
+        try:
+            # После collectstatic читаем уже собранный (минифицированный) файл
+            with staticfiles_storage.open(staticfiles_storage.stored_name(path)) as f:
+                return f.read().decode('utf-8')
+        except (OSError, ValueError, AttributeError):
+            pass
+    found = finders.find(path)
+    if not found:
+        raise FileNotFoundError(path)
+    with open(found, encoding='utf-8') as f:
+        return f.read()
+
+
+def critical_css(path):
+    """Критические правила статического CSS-файла, кэшируются в процессе."""
+    cached = _critical_cache.get(path)
+    if cached is not None and not settings.DEBUG:
+        return cached
+    css = extract_critical_css(_read_static(path))
+    with _critical_lock:
+        _critical_cache[path] = css
+    return css
+
+
+_vendor_cache = {}
+
+
+def _static_exists(path):
+    if settings.DEBUG:
+        return bool(finders.find(path))
+    if not hasattr(staticfiles_storage, 'stored_name'):
+        # Хранилище без манифеста (StaticFilesStorage в тестах)
+        return staticfiles_storage.exists(path)
+    try:
+        return staticfiles_storage.exists(staticfiles_storage.stored_name(path))
+    except ValueError:
+        # Файла нет в манифесте collectstatic
+        return False
+
+
+def vendor_static(name):
+    """
+    URL локальной сборки стороннего файла name из settings.VENDOR_ASSETS
+    (manage.py build_vendor_assets), а если её нет — адрес на CDN.
+    """
+    path, fallback = settings.VENDOR_ASSETS[name]
+    available = _vendor_cache.get(path)
+    if available is None or settings.DEBUG:
+        available = _vendor_cache[path] = _static_exists(path)
+    return static(path) if available else fallback
@@ -0,0 +1,300 @@
+"""
+Нагрузочный замер публичных страниц внутри процесса (команда bench_site).
+
+Запросы идут через WSGIHandler, как от gunicorn: со всеми middleware,
+кэшами и отдачей файлов, но без сети. Данные создаются в тестовой БД по
+образцу landing/fixtures/albums.json (до сотен скриншотов), служебные
+файлы (кэш, снимок контента, медиа) — во временном каталоге, поэтому
+замер не трогает рабочие данные сайта. Результат — JSON с пропускной
+способностью, p50/p95/p99, запросами к БД на запрос и пиковым RSS, его
+можно сохранить как базовый и сравнивать с ним следующие прогоны.
+"""
+import io
+import os
+import platform
+import sys
+import threading
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import reverse
+
+from .models import AppScreenshot, PrivacyPolicy, ProductInfo, Screenshot, ScreenshotAlbum
+from .publish import content_changed
+from .querybudget import track_queries
+from .testing import BUDGET_SETTINGS, isolated_settings
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS не измеряется
+    resource = None
+
+# Меняется вместе со структурой отчёта: с базовым другого формата не сравниваем
+RESULT_FORMAT = 1
+
+BENCH_VIDEO = 'bench.mp4'
+RANGE_SIZE = 1024 * 1024
+
+SCENARIOS = (
+    'index', 'privacy_policy', 'stream_video_full', 'stream_video_range', 'stream_video_suffix',
+)
+
+
+def bench_settings(directory, cache=True, concurrency=1):
+    """Настройки замера: служебные файлы в directory, лимиты отдачи не ниже concurrency."""
+    overrides = dict(
+        isolated_settings(directory),
+        # Потоки замера — разные клиенты; замеряется отдача видео, а не
+        # отказы 503 сверх общего лимита sync-воркеров
+        MEDIA_STREAM_MAX=max(settings.MEDIA_STREAM_MAX, concurrency),
+        # Запросы к БД считает сам замер
+        QUERY_BUDGET_ENABLED=False,
+    )
+    if not cache:
+        # Полный рендер на каждый запрос, как при проверке бюджетов запросов
+        overrides.update(BUDGET_SETTINGS)
+    return overrides
+
+
+def seed_content(albums=12, screenshots=300, app_screenshots=8, video_size=16 * 1024 * 1024):
+    """
+    Контент для замера: альбомы из landing/fixtures/albums.json и новые по
+    их образцу, скриншоты поровну по альбомам, текст политики и видео.
+    bulk_create не вызывает сигналы, публикуется всё один раз в конце.
+    """
+    fixture = os.path.join(apps.get_app_config('landing').path, 'fixtures', 'albums.json')
+    with open(fixture, encoding='utf-8') as f:
+        created = [item.object for item in serializers.deserialize('json', f)][:albums]
+    for number in range(len(created) + 1, albums + 1):
+        created.append(ScreenshotAlbum(title='Локация %d' % number, order=number))
+    created = ScreenshotAlbum.objects.bulk_create(created)
+    Screenshot.objects.bulk_create(
+        Screenshot(
+            album=created[number % len(created)], image='screenshots/bench-%d.png' % number,
+            image_width=1920, image_height=1080, image_color='#2b3a42',
+            caption='Скриншот %d' % number,
+        )
+        for number in range(screenshots if created else 0)
+    )
+    AppScreenshot.objects.bulk_create(
+        AppScreenshot(
+            title='Экран %d' % number, image='app_screenshots/bench-%d.png' % number,
+            image_width=1280, image_height=720, image_color='#1d262c', order=number,
+        )
+        for number in range(app_screenshots)
+    )
+    paragraph = (
+        'Мы обрабатываем персональные данные, которые вы указываете в форме обратной связи, '
+        'только для ответа на ваше обращение и не передаём их третьим лицам.'
+    )
+    singletons = [
+        PrivacyPolicy(pk=1, content='\n\n'.join('%d. %s' % (n, paragraph) for n in range(1, 41))),
+        ProductInfo(pk=1, description='\n'.join([paragraph] * 5)),
+    ]
+    for obj in singletons:
+        obj.update_render_fields()
+        type(obj).objects.bulk_create([obj])
+
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'videos'), exist_ok=True)
+    chunk = os.urandom(1024 * 1024)
+    with open(os.path.join(settings.MEDIA_ROOT, 'videos', BENCH_VIDEO), 'wb') as f:
+        for offset in range(0, video_size, len(chunk)):
+            f.write(chunk[:video_size - offset])
+    content_changed(*(model._meta.label_lower for model in apps.get_app_config('landing').get_models()))
+
+
+def scenario_requests(name):
+    """Путь и заголовки запроса сценария name."""
+    if name.startswith('stream_video'):
+        path = reverse('stream_video', args=[BENCH_VIDEO])
+        headers = {
+            'stream_video_full': {},
+            'stream_video_range': {'HTTP_RANGE': 'bytes=0-%d' % (RANGE_SIZE - 1)},
+            'stream_video_suffix': {'HTTP_RANGE': 'bytes=-%d' % RANGE_SIZE},
+        }[name]
+        return path, headers
+    return reverse(name), {}
+
+
+def _environ(path, headers, remote_addr):
+    host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': remote_addr,
+        'HTTP_HOST': host,
+        'HTTP_ACCEPT': 'text/html,*/*',
+        'HTTP_ACCEPT_ENCODING': 'gzip',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    environ.update(headers)
+    return environ
+
+
+def call_wsgi(handler, environ):
+    """(статус, байт тела): тело читается до конца и закрывается, как это делает сервер."""
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(int(status_line.split(' ', 1)[0]))
+        return lambda data: None
+
+    result = handler(environ, start_response)
+    size = 0
+    try:
+        for chunk in result:
+            size += len(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0], size
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу; values отсортированы."""
+    if not values:
+        return None
+    rank = max(int(fraction * len(values) + 0.999999) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def run_scenario(handler, name, requests=200, concurrency=4, warmup=5):
+    """Замер сценария: requests запросов из concurrency потоков после warmup прогревочных."""
+    path, headers = scenario_requests(name)
+    for _ in range(warmup):
+        call_wsgi(handler, _environ(path, headers, '127.0.0.1'))
+
+    per_thread = [requests // concurrency + (1 if n < requests % concurrency else 0) for n in range(concurrency)]
+    results = [[] for _ in range(concurrency)]
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(number):
+        # Свой адрес у каждого потока, как у разных посетителей
+        remote_addr = '127.0.1.%d' % (number + 1)
+        barrier.wait()
+        for _ in range(per_thread[number]):
+            started = time.perf_counter()
+            with track_queries() as log:
+                try:
+                    status, size = call_wsgi(handler, _environ(path, headers, remote_addr))
+                except Exception:
+                    status, size = None, 0
+            results[number].append((time.perf_counter() - started, status, size, log.count))
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for thread_results in results for sample in thread_results]
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    statuses = {}
+    for _latency, status, _size, _queries in samples:
+        key = str(status) if status is not None else 'exception'
+        statuses[key] = statuses.get(key, 0) + 1
+    count = len(samples) or 1
+    return {
+        'path': path,
+        'headers': {key[5:].lower(): value for key, value in headers.items()},
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[1] is None or sample[1] >= 400),
+        'statuses': statuses,
+        'seconds': round(elapsed, 4),
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / count, 3),
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3),
+        } if latencies else None,
+        'queries_per_request': round(sum(sample[3] for sample in samples) / count, 2),
+        'bytes_per_request': sum(sample[2] for sample in samples) // count,
+        # Пик процесса к концу сценария: сценарии идут в одном порядке, поэтому сравнимы
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmark(scenarios=SCENARIOS, config=None, **options):
+    """Отчёт по сценариям; config — параметры прогона, которые попадут в отчёт."""
+    handler = WSGIHandler()
+    return {
+        'format': RESULT_FORMAT,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'debug': settings.DEBUG,
+        },
+        'config': dict(config or {}, **options),
+        'scenarios': {name: run_scenario(handler, name, **options) for name in scenarios},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(current, baseline, threshold=0.15):
+    """
+    Регрессии current относительно baseline (список строк): пропускная
+    способность ниже или p50/p95/пиковый RSS выше более чем на threshold,
+    больше запросов к БД или ошибок. Сценарии, которых нет в базовом, пропускаются.
+    """
+    if baseline.get('format') != RESULT_FORMAT:
+        return ['базовый отчёт другого формата (%s), сравнение невозможно' % baseline.get('format')]
+    regressions = []
+    for name, result in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        if base['throughput'] and result['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append('%s: %.1f запросов/с вместо %.1f' % (name, result['throughput'], base['throughput']))
+        for key in ('p50', 'p95'):
+            now, before = result['latency_ms'][key], base['latency_ms'][key]
+            if now > before * (1 + threshold):
+                regressions.append('%s: %s %.2f мс вместо %.2f' % (name, key, now, before))
+        if result['queries_per_request'] > base['queries_per_request']:
+            regressions.append('%s: %.2f запросов к БД на запрос вместо %.2f' % (
+                name, result['queries_per_request'], base['queries_per_request'],
+            ))
+        if result['errors'] > base['errors']:
+            regressions.append('%s: ошибок %d вместо %d' % (name, result['errors'], base['errors']))
+    now, before = current.get('peak_rss_mb'), baseline.get('peak_rss_mb')
+    if now and before and now > before * (1 + threshold):
+        regressions.append('пиковый RSS %.1f МБ вместо %.1f' % (now, before))
+    return regressions
+
+
+def config_differences(current, baseline):
+    """Параметры прогона, которыми current отличается от baseline."""
+    keys = set(current.get('config', {})) | set(baseline.get('config', {}))
+    return sorted(
+        key for key in keys
+        if current.get('config', {}).get(key) != baseline.get('config', {}).get(key)
+    )
@@ -0,0 +1,238 @@
+"""
+Кэширование контента лендинга.
+
+Все воркеры gunicorn делят один файл с версиями контента (CONTENT_VERSION_FILE).
+Сигналы post_save/post_delete повышают версию изменённой модели, а каждый
+процесс сверяет её со своими закэшированными значениями. Чтение версии —
+это один os.stat(), файл перечитывается только когда его подменили.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from . import metrics
+from .singleflight import single_flight
+from .utils import write_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows: локальная разработка в один процесс
+    fcntl = None
+
+
+ALL_CONTENT = '*'
+LAST_MODIFIED = '@last_modified'
+
+_versions_lock = threading.Lock()
+_versions_state = {'stat': None, 'versions': {}}
+
+_memo_lock = threading.Lock()
+_memo = {}
+
+
+def _version_file():
+    return str(settings.CONTENT_VERSION_FILE)
+
+
+def get_content_versions():
+    """Словарь {label модели: версия} плюс общая версия под ключом '*'."""
+    path = _version_file()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    # Файл всегда подменяется через os.replace, поэтому меняется inode
+    stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    state = _versions_state
+    if state['stat'] == stat_key:
+        return state['versions']
+    with _versions_lock:
+        try:
+            with open(path, encoding='utf-8') as f:
+                versions = json.load(f)
+        except (OSError, ValueError):
+            versions = {}
+        _versions_state.update(stat=stat_key, versions=versions)
+    return versions
+
+
+def get_content_version(label=ALL_CONTENT):
+    return get_content_versions().get(label, 0)
+
+
+def bump_content_version(*labels, modified=None):
+    """
+    Повышает версию указанных моделей и общую версию контента.
+    modified — отметка изменения (updated_at) сохранённого объекта.
+    """
+    path = _version_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(path, encoding='utf-8') as f:
+                versions = json.load(f)
+        except (OSError, ValueError):
+            versions = {}
+        # Версия основана на времени, чтобы после потери файла не вернуться
+        # к уже использованным значениям
+        version = max(versions.get(ALL_CONTENT, 0) + 1, time.time_ns())
+        for label in labels:
+            versions[label] = version
+        versions[ALL_CONTENT] = version
+        stamp = (modified or timezone.now()).timestamp()
+        versions[LAST_MODIFIED] = max(versions.get(LAST_MODIFIED, 0), stamp)
+        write_atomic(path, json.dumps(versions, sort_keys=True))
+    return version
+
+
+def memoize_for_version(key, label, factory):
+    """
+    Кэш в памяти процесса: значение factory() живёт, пока не изменится
+    версия модели label.
+    """
+    version = get_content_version(label)
+    cached = _memo.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    value = factory()
+    with _memo_lock:
+        _memo[key] = (version, value)
+    return value
+
+
+def _templates_mtime():
+    # Выкладка новых шаблонов или статики (новые хэши в именах файлов)
+    # тоже меняет страницы, хотя контент прежний
+    templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
+    mtime = 0
+    for root, _dirs, files in os.walk(templates_dir):
+        for name in files:
+            mtime = max(mtime, os.path.getmtime(os.path.join(root, name)))
+    manifest = os.path.join(str(settings.STATIC_ROOT or ''), 'staticfiles.json')
+    if os.path.exists(manifest):
+        mtime = max(mtime, os.path.getmtime(manifest))
+    return int(mtime)
+
+
+TEMPLATES_MTIME = _templates_mtime()
+
+
+def _last_modified_from_db():
+    from django.apps import apps
+
+    stamps = []
+    for model in apps.get_app_config('landing').get_models():
+        field_names = {field.name for field in model._meta.get_fields()}
+        for field in ('updated_at', 'last_updated'):
+            if field in field_names:
+                stamps.append(model.objects.aggregate(stamp=Max(field))['stamp'])
+                break
+    stamps = [stamp.timestamp() for stamp in stamps if stamp is not None]
+    return max(stamps, default=0)
+
+
+def get_content_last_modified():
+    """Время последнего изменения контента или шаблонов (unix time)."""
+    stamp = get_content_versions().get(LAST_MODIFIED)
+    if stamp is None:
+        from .snapshot import get_snapshot
+
+        # Правок ещё не было: отметка из снимка контента или один раз из таблиц
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            stamp = snapshot.last_modified
+        else:
+            stamp = memoize_for_version('last_modified', ALL_CONTENT, _last_modified_from_db)
+    return max(int(stamp), TEMPLATES_MTIME)
+
+
+def content_etag(request, *args, **kwargs):
+    return '%x-%x' % (get_content_version(), TEMPLATES_MTIME)
+
+
+def content_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(get_content_last_modified(), tz=dt_timezone.utc)
+
+
+def section_key(name, labels):
+    """
+    Ключ фрагмента страницы: имя секции, версии моделей, от которых она
+    зависит, и версия шаблонов. Правка другой модели ключ не меняет.
+    """
+    versions = '-'.join('%x' % get_content_version(label) for label in labels)
+    return 'landing:section:%s:%x:%s' % (name, TEMPLATES_MTIME, versions)
+
+
+def _page_key(view_func):
+    return 'landing:page:%s.%s:%x' % (view_func.__module__, view_func.__qualname__, TEMPLATES_MTIME)
+
+
+def cache_page_for_content(view_func):
+    """
+    Кэширует готовый HTML страницы до изменения любого контента лендинга.
+
+    Шаблоны не читают из запроса ничего, кроме reverse() адресов, поэтому
+    ответ один для всех посетителей и ключ зависит только от view.
+    Запись хранит версию контента, по которой проверяется актуальность.
+    Устаревшую запись пересчитывает один запрос (single_flight), остальные
+    пока получают её прежнюю версию со своим ETag.
+
+    Сам view без кэша доступен как атрибут uncached (его переносят и
+    внешние декораторы через functools.wraps): публикации нужен свежий
+    рендер, а не прежняя версия из кэша.
+    """
+    key = _page_key(view_func)
+
+    def cached_response(entry):
+        version, content, content_type = entry
+        response = HttpResponse(content, content_type=content_type)
+        if version != get_content_version():
+            # condition() не перепишет ETag: браузер не закэширует старую
+            # страницу под ETag новой версии
+            response['ETag'] = quote_etag('%x-%x' % (version, TEMPLATES_MTIME))
+        return response
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or args or kwargs:
+            return view_func(request, *args, **kwargs)
+        version = get_content_version()
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            metrics.inc('dron_page_cache_total', ('hit',))
+            return cached_response(entry)
+
+        def render():
+            metrics.inc('dron_page_cache_total', ('render',))
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (version, response.content, response['Content-Type']), None)
+            return response
+
+        def fresh():
+            current = cache.get(key)
+            if current is not None and current[0] == get_content_version():
+                metrics.inc('dron_page_cache_total', ('fresh',))
+                return cached_response(current)
+            return None
+
+        stale = cached_response(entry) if entry is not None else None
+        response = single_flight(key, render, fresh=fresh, stale=stale)
+        if stale is not None and response is stale:
+            metrics.inc('dron_page_cache_total', ('stale',))
+        return response
+
+    wrapper.uncached = view_func
+    return wrapper
@@ -0,0 +1,171 @@
+"""
+Бэкенд кэша Django в разделяемой памяти (SharedArena из landing/shm.py).
+
+Все воркеры gunicorn видят одни и те же записи: кэш страниц, версии и
+прочее кэшируется один раз, а delete() из сигнала сразу действует во всех
+процессах. Размер ограничен файлом арены, старые записи вытесняются по
+LRU внутри набора слотов, истёкшие по TTL не возвращаются.
+
+Значение больше одного слота делится на куски. Первый кусок хранит срок
+жизни, длину и случайный маркер записи, остальные — тот же маркер: если
+какой-то кусок уже вытеснен или перезаписан, get() считает это промахом.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'landing.cache_backend.SharedMemoryCache',
+            'LOCATION': os.path.join(RUN_DIR, 'cache.arena'),
+            'OPTIONS': {'SIZE': 32 * 1024 * 1024, 'BLOCK_SIZE': 64 * 1024},
+        },
+    }
+
+Значения хранятся в pickle, поэтому файл арены должен быть доступен
+только пользователю сайта: SharedArena открывает его лишь в закрытом
+каталоге (0700) и подменяет файл чужого владельца или с правами шире 0600.
+"""
+import os
+import pickle
+import struct
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .shm import shared_arena
+
+# срок жизни (0 — бессрочно), маркер записи, длина значения, число кусков
+ENTRY_HEADER = struct.Struct('>d8sII')
+TOKEN_SIZE = 8
+# Одна запись не занимает больше этой доли арены
+MAX_ENTRY_SHARE = 4
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._size = options.get('SIZE', 32 * 1024 * 1024)
+        self._block_size = options.get('BLOCK_SIZE', 64 * 1024)
+
+    @property
+    def _arena(self):
+        # Арена одна на процесс, а экземпляр бэкенда Django создаёт в каждом потоке
+        return shared_arena(self._location, self._size, self._block_size)
+
+    @staticmethod
+    def _chunk_key(key, number):
+        return '%s\0%d' % (key, number)
+
+    def _read(self, key):
+        """(срок жизни, pickled) или None, если записи нет, она истекла или неполна."""
+        arena = self._arena
+        first = arena.get(key)
+        if first is None:
+            return None
+        expires, token, length, chunks = ENTRY_HEADER.unpack_from(first)
+        if expires and expires <= time.time():
+            return None
+        parts = [first[ENTRY_HEADER.size:]]
+        for number in range(1, chunks):
+            chunk = arena.get(self._chunk_key(key, number))
+            if chunk is None or chunk[:TOKEN_SIZE] != token:
+                return None
+            parts.append(chunk[TOKEN_SIZE:])
+        data = b''.join(parts)
+        if len(data) != length:
+            return None
+        return expires, data
+
+    def _write(self, key, data, expires):
+        """Записывает значение; False, если оно слишком велико для арены."""
+        arena = self._arena
+        first_size = arena.block_size - ENTRY_HEADER.size
+        rest_size = arena.block_size - TOKEN_SIZE
+        chunks = 1 + max(0, -(-(len(data) - first_size) // rest_size))
+        if chunks > arena.slot_count // MAX_ENTRY_SHARE:
+            self._delete(key)
+            return False
+        token = os.urandom(TOKEN_SIZE)
+        with arena.locked():
+            # Первый кусок пишется последним: до этого читатели видят старую запись целиком
+            for number in range(1, chunks):
+                start = first_size + (number - 1) * rest_size
+                arena.set(self._chunk_key(key, number), token + data[start:start + rest_size], group=key)
+            header = ENTRY_HEADER.pack(expires or 0, token, len(data), chunks)
+            arena.set(key, header + data[:first_size], group=key)
+        return True
+
+    def _delete(self, key):
+        return self._arena.delete(key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data = pickle.dumps(value, self.pickle_protocol)
+        with self._arena.locked():
+            if self._read(key) is not None:
+                return False
+            self._set(key, data, timeout)
+            return True
+
+    def _set(self, key, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            # Нулевой или отрицательный timeout: значение сразу устаревает
+            self._delete(key)
+            return True
+        return self._write(key, data, expires)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._read(key)
+        if entry is None:
+            return default
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set(key, pickle.dumps(value, self.pickle_protocol), timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = []
+        for key, value in data.items():
+            made_key = self.make_and_validate_key(key, version=version)
+            if not self._set(made_key, pickle.dumps(value, self.pickle_protocol), timeout):
+                failed.append(key)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._arena.locked():
+            entry = self._read(key)
+            if entry is None:
+                return False
+            self._set(key, entry[1], timeout)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._arena.locked():
+            entry = self._read(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            expires, data = entry
+            new_value = pickle.loads(data) + delta
+            # Срок жизни записи не меняется
+            self._write(key, pickle.dumps(new_value, self.pickle_protocol), expires or None)
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._read(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._arena.locked():
+            existed = self._read(key) is not None
+            self._delete(key)
+        return existed
+
+    def clear(self):
+        self._arena.clear()
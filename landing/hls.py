@@ -0,0 +1,374 @@
+"""
+HLS-плейлист для трейлера без перекодирования.
+
+Сегментом HLS может быть только MPEG-TS или фрагментированный MP4, куски
+обычного MP4 по байтам плеер воспроизвести не сможет. Поэтому таблицы
+сэмплов исходного файла разбираются один раз, и сэмплы перекладываются
+в файл-компаньон fMP4: init-сегмент (ftyp + moov с mvex) и фрагменты
+moof + mdat, каждый из которых начинается с ключевого кадра. Плейлист
+ссылается на этот файл через EXT-X-MAP и EXT-X-BYTERANGE, поэтому все
+сегменты — диапазоны одного статического файла, которые nginx отдаёт сам.
+"""
+import hashlib
+import logging
+import math
+import os
+import posixpath
+import struct
+import tempfile
+
+from django.core.files.storage import default_storage
+
+from .mp4 import MP4Error, box_bytes, copy_range, find_boxes, iter_payload, read_box, top_level_boxes, video_values
+
+logger = logging.getLogger(__name__)
+
+# Рекомендуемая длительность сегмента HLS
+SEGMENT_DURATION = 6.0
+
+HANDLER_TYPES = (b'vide', b'soun')
+# Атомы таблиц сэмплов, которые в init-сегменте пусты: сэмплы описывает moof
+SAMPLE_TABLE_BOXES = (b'stts', b'ctts', b'stss', b'stsz', b'stz2', b'stsc', b'stco', b'co64', b'sdtp', b'stps',
+                      b'sbgp', b'sgpd', b'cslg')
+
+# Флаги сэмплов в trun: ключевой кадр и кадр, зависящий от других
+SYNC_SAMPLE_FLAGS = 0x02000000
+NON_SYNC_SAMPLE_FLAGS = 0x01010000
+
+
+class Sample:
+    __slots__ = ('offset', 'size', 'dts', 'duration', 'cts_offset', 'sync')
+
+    def __init__(self, offset, size, dts, duration, cts_offset, sync):
+        self.offset = offset
+        self.size = size
+        self.dts = dts
+        self.duration = duration
+        self.cts_offset = cts_offset
+        self.sync = sync
+
+
+class Track:
+
+    def __init__(self, track_id, handler, timescale, samples, trak_start, trak_end):
+        self.track_id = track_id
+        self.handler = handler
+        self.timescale = timescale
+        self.samples = samples
+        # Границы атома trak внутри исходного moov
+        self.trak_start = trak_start
+        self.trak_end = trak_end
+
+    @property
+    def duration(self):
+        if not self.samples:
+            return 0
+        last = self.samples[-1]
+        return last.dts + last.duration
+
+
+def _full_box(moov, start, end, box_type):
+    boxes = find_boxes(moov, (box_type,), start, end)
+    return boxes[0] if boxes else None
+
+
+def _table(moov, stbl, box_type, item_format):
+    """Записи таблицы из полного атома: [(поля записи), ...]."""
+    box = _full_box(moov, stbl[0], stbl[1], box_type)
+    if box is None:
+        return None
+    version = moov[box[0]]
+    count, = struct.unpack_from('>I', moov, box[0] + 4)
+    item_format = item_format(version) if callable(item_format) else item_format
+    size = struct.calcsize('>' + item_format)
+    return [struct.unpack_from('>' + item_format, moov, box[0] + 8 + i * size) for i in range(count)]
+
+
+def _sample_sizes(moov, stbl):
+    box = _full_box(moov, stbl[0], stbl[1], b'stsz')
+    if box is None:
+        raise MP4Error('Нет таблицы stsz: поддерживаются только обычные размеры сэмплов')
+    sample_size, count = struct.unpack_from('>II', moov, box[0] + 4)
+    if sample_size:
+        return [sample_size] * count
+    return list(struct.unpack_from('>%dI' % count, moov, box[0] + 12))
+
+
+def _parse_track(moov, trak_start, trak_end):
+    hdlr = find_boxes(moov, (b'mdia', b'hdlr'), trak_start, trak_end)
+    handler = moov[hdlr[0][0] + 8:hdlr[0][0] + 12] if hdlr else None
+    if handler not in HANDLER_TYPES:
+        return None
+
+    tkhd = _full_box(moov, trak_start, trak_end, b'tkhd')
+    track_id, = struct.unpack_from('>I', moov, tkhd[0] + (20 if moov[tkhd[0]] == 1 else 12))
+    mdhd = find_boxes(moov, (b'mdia', b'mdhd'), trak_start, trak_end)[0]
+    timescale, = struct.unpack_from('>I', moov, mdhd[0] + (20 if moov[mdhd[0]] == 1 else 12))
+
+    stbl = find_boxes(moov, (b'mdia', b'minf', b'stbl'), trak_start, trak_end)[0]
+    stsd = _full_box(moov, stbl[0], stbl[1], b'stsd')
+    if stsd is None or struct.unpack_from('>I', moov, stsd[0] + 4)[0] != 1:
+        raise MP4Error('Поддерживаются только дорожки с одним описанием сэмплов')
+
+    sizes = _sample_sizes(moov, stbl)
+    chunk_offsets = _table(moov, stbl, b'stco', 'I') or _table(moov, stbl, b'co64', 'Q')
+    if chunk_offsets is None:
+        raise MP4Error('Нет таблицы смещений чанков')
+    stsc = _table(moov, stbl, b'stsc', 'III') or []
+    stts = _table(moov, stbl, b'stts', 'II') or []
+    # В ctts версии 0 смещение формально беззнаковое, но кодировщики пишут туда
+    # и отрицательные (B-кадры с edit list) в дополнительном коде. trun ниже
+    # версии 1 со знаковым смещением, поэтому обе версии читаются со знаком
+    ctts = _table(moov, stbl, b'ctts', 'Ii') or []
+    stss = _table(moov, stbl, b'stss', 'I')
+    sync_numbers = None if stss is None else {number for number, in stss}
+
+    durations = [delta for count, delta in stts for _ in range(count)]
+    cts_offsets = [offset for count, offset in ctts for _ in range(count)]
+
+    samples = []
+    index = 0
+    dts = 0
+    for entry, (first_chunk, per_chunk, _description) in enumerate(stsc):
+        last_chunk = stsc[entry + 1][0] - 1 if entry + 1 < len(stsc) else len(chunk_offsets)
+        for chunk in range(first_chunk, last_chunk + 1):
+            offset = chunk_offsets[chunk - 1][0]
+            for _ in range(per_chunk):
+                if index >= len(sizes):
+                    break
+                duration = durations[index] if index < len(durations) else 0
+                samples.append(Sample(
+                    offset=offset,
+                    size=sizes[index],
+                    dts=dts,
+                    duration=duration,
+                    cts_offset=cts_offsets[index] if index < len(cts_offsets) else 0,
+                    sync=sync_numbers is None or index + 1 in sync_numbers,
+                ))
+                offset += sizes[index]
+                dts += duration
+                index += 1
+    if index != len(sizes):
+        raise MP4Error('Таблицы сэмплов дорожки %d не согласованы' % track_id)
+    return Track(track_id, handler, timescale, samples, trak_start, trak_end)
+
+
+def parse_tracks(moov):
+    tracks = []
+    for trak_start, trak_end in find_boxes(moov, (b'moov', b'trak')):
+        track = _parse_track(moov, trak_start, trak_end)
+        if track is not None and track.samples:
+            tracks.append(track)
+    if not tracks:
+        raise MP4Error('В файле нет видео- или аудиодорожек')
+    return tracks
+
+
+def _segment_bounds(tracks, segment_duration):
+    """Границы сегментов в секундах: по ключевым кадрам видео (или первой дорожки)."""
+    main = next((track for track in tracks if track.handler == b'vide'), tracks[0])
+    bounds = [0.0]
+    for sample in main.samples[1:]:
+        time = sample.dts / main.timescale
+        if sample.sync and time - bounds[-1] >= segment_duration:
+            bounds.append(time)
+    bounds.append(max(track.duration / track.timescale for track in tracks))
+    return bounds
+
+
+def _strip_sample_tables(moov, start, end):
+    """Копия содержимого контейнера с пустыми таблицами сэмплов."""
+    parts = []
+    for box_type, offset, size, header_size in iter_payload(moov, start, end):
+        if box_type in (b'trak', b'mdia', b'minf', b'stbl'):
+            parts.append(box_bytes(box_type, _strip_sample_tables(moov, offset + header_size, offset + size)))
+        elif box_type in SAMPLE_TABLE_BOXES:
+            if box_type in (b'stts', b'stsc', b'stco'):
+                parts.append(box_bytes(box_type, b'\x00' * 8))
+            elif box_type == b'stsz':
+                parts.append(box_bytes(box_type, b'\x00' * 12))
+            elif box_type == b'co64':
+                parts.append(box_bytes(b'stco', b'\x00' * 8))
+        else:
+            parts.append(moov[offset:offset + size])
+    return b''.join(parts)
+
+
+def _init_segment(moov, tracks):
+    ftyp = box_bytes(b'ftyp', b'iso6' + struct.pack('>I', 0) + b'iso6isommp41')
+    kept = {(track.trak_start, track.trak_end) for track in tracks}
+    parts = []
+    moov_start, moov_end = find_boxes(moov, (b'moov',))[0]
+    for box_type, offset, size, header_size in iter_payload(moov, moov_start, moov_end):
+        payload = (offset + header_size, offset + size)
+        if box_type == b'trak':
+            if payload in kept:
+                parts.append(box_bytes(b'trak', _strip_sample_tables(moov, *payload)))
+        elif box_type != b'mvex':
+            parts.append(moov[offset:offset + size])
+    trex = b''.join(
+        box_bytes(b'trex', struct.pack('>IIIIII', 0, track.track_id, 1, 0, 0, 0)) for track in tracks
+    )
+    parts.append(box_bytes(b'mvex', trex))
+    return ftyp + box_bytes(b'moov', b''.join(parts))
+
+
+def _fragment_header(sequence, runs):
+    """
+    moof для фрагмента: runs — [(дорожка, сэмплы)]. Данные дорожек лежат
+    в mdat подряд, data_offset считается от начала moof.
+    """
+    def build(data_offsets):
+        trafs = []
+        for (track, samples), data_offset in zip(runs, data_offsets):
+            tfhd = box_bytes(b'tfhd', struct.pack('>II', 0x020000, track.track_id))
+            tfdt = box_bytes(b'tfdt', struct.pack('>IQ', 0x01000000, samples[0].dts))
+            entries = b''.join(
+                struct.pack('>IIIi', sample.duration, sample.size,
+                            SYNC_SAMPLE_FLAGS if sample.sync else NON_SYNC_SAMPLE_FLAGS, sample.cts_offset)
+                for sample in samples
+            )
+            trun = box_bytes(b'trun', struct.pack('>IIi', 0x01000F01, len(samples), data_offset) + entries)
+            trafs.append(box_bytes(b'traf', tfhd + tfdt + trun))
+        mfhd = box_bytes(b'mfhd', struct.pack('>II', 0, sequence))
+        return box_bytes(b'moof', mfhd + b''.join(trafs))
+
+    # Размер moof от значений data_offset не зависит: считаем его с нулями
+    moof_size = len(build([0] * len(runs)))
+    data_offsets = []
+    position = moof_size + 8
+    for _track, samples in runs:
+        data_offsets.append(position)
+        position += sum(sample.size for sample in samples)
+    return build(data_offsets), position - moof_size
+
+
+def _copy_samples(src, dst, samples):
+    # Соседние сэмплы одного чанка лежат подряд: копируем их одним куском
+    start = None
+    length = 0
+    for sample in samples:
+        if start is not None and sample.offset == start + length:
+            length += sample.size
+            continue
+        if start is not None:
+            copy_range(src, dst, start, length)
+        start, length = sample.offset, sample.size
+    if start is not None:
+        copy_range(src, dst, start, length)
+
+
+def build_fragmented(source, target, segment_duration=SEGMENT_DURATION):
+    """
+    Пишет fMP4 из source в target. Возвращает (init_size, segments), где
+    segments — [(длительность в секундах, смещение, длина), ...].
+    """
+    with open(source, 'rb') as src:
+        boxes = top_level_boxes(src)
+        moov_box = next((box for box in boxes if box.type == b'moov'), None)
+        if moov_box is None:
+            raise MP4Error('В файле нет атома moov')
+        if any(box.type == b'moof' for box in boxes):
+            raise MP4Error('Файл уже фрагментирован')
+        moov = read_box(src, moov_box)
+        tracks = parse_tracks(moov)
+        bounds = _segment_bounds(tracks, segment_duration)
+
+        directory = os.path.dirname(os.path.abspath(target))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.hls-', suffix='.mp4')
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                init = _init_segment(moov, tracks)
+                dst.write(init)
+                segments = []
+                position = len(init)
+                positions = {track.track_id: 0 for track in tracks}
+                for number, (start, end) in enumerate(zip(bounds, bounds[1:]), 1):
+                    runs = []
+                    for track in tracks:
+                        limit = end * track.timescale if end < bounds[-1] else math.inf
+                        first = positions[track.track_id]
+                        last = first
+                        while last < len(track.samples) and track.samples[last].dts < limit:
+                            last += 1
+                        positions[track.track_id] = last
+                        if last > first:
+                            runs.append((track, track.samples[first:last]))
+                    if not runs:
+                        continue
+                    moof, mdat_size = _fragment_header(number, runs)
+                    dst.write(moof)
+                    dst.write(struct.pack('>I4s', mdat_size, b'mdat'))
+                    for _track, samples in runs:
+                        _copy_samples(src, dst, samples)
+                    length = len(moof) + mdat_size
+                    segments.append((end - start, position, length))
+                    position += length
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return len(init), segments
+
+
+def playlist(url, init_size, segments):
+    """Плейлист HLS (VOD) с сегментами-диапазонами одного файла url."""
+    target = max(math.ceil(duration) for duration, _, _ in segments)
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        '#EXT-X-TARGETDURATION:%d' % target,
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+        '#EXT-X-MAP:URI="%s",BYTERANGE="%d@0"' % (url, init_size),
+    ]
+    for duration, offset, length in segments:
+        lines.append('#EXTINF:%.3f,' % duration)
+        lines.append('#EXT-X-BYTERANGE:%d@%d' % (length, offset))
+        lines.append(url)
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def _hls_name(name):
+    # Имя зависит от содержимого исходника: файл можно кэшировать навсегда
+    st = os.stat(default_storage.path(name))
+    digest = hashlib.sha1(('%s:%d:%d' % (name, st.st_size, st.st_mtime_ns)).encode('utf-8')).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return posixpath.join('hls', '%s-%s.mp4' % (stem, digest))
+
+
+def trailer_hls_values(trailer):
+    """
+    fMP4-копия локального видео трейлера и плейлист HLS: значения полей
+    video_hls и video_hls_playlist или {}, если копия уже готова. Для
+    большого файла это долго, поэтому вызывается не в запросе админки.
+    """
+    name = trailer.local_video.name
+    hls_name = _hls_name(name)
+    if trailer.video_hls.name == hls_name and trailer.video_hls_playlist and default_storage.exists(hls_name):
+        return {}
+    try:
+        init_size, segments = build_fragmented(default_storage.path(name), default_storage.path(hls_name))
+    except MP4Error as exc:
+        # Видео всё равно доступно целиком, просто без HLS
+        logger.warning('Не удалось построить HLS для %s: %s', name, exc)
+        values = {'video_hls': '', 'video_hls_playlist': ''}
+    else:
+        values = {
+            'video_hls': hls_name,
+            'video_hls_playlist': playlist(default_storage.url(hls_name), init_size, segments),
+        }
+    if trailer.video_hls and trailer.video_hls.name != values['video_hls']:
+        default_storage.delete(trailer.video_hls.name)
+    return values
+
+
+def trailer_video_values(trailer):
+    """Сведения о локальном видео трейлера и HLS к нему: значения полей Trailer."""
+    values = video_values(default_storage.path(trailer.local_video.name))
+    values.update(trailer_hls_values(trailer))
+    return values
@@ -0,0 +1,240 @@
+"""
+Уменьшенные копии изображений для srcset.
+
+При сохранении модели для каждого поля из responsive_images строятся копии
+фиксированной ширины (IMAGE_RENDITION_WIDTHS) в WebP и JPEG и записываются
+в ImageRendition. Шаблонный тег {% picture %} выводит их как <picture>.
+
+Там же считаются метаданные, которые хранятся прямо в модели рядом с полем:
+<поле>_width, <поле>_height, <поле>_color (основной цвет) и <поле>_lqip
+(крошечное размытое превью в виде data URI) — по ним шаблоны выводят
+размеры и заглушку до загрузки картинки.
+"""
+import base64
+import io
+import posixpath
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .cache import memoize_for_version
+from .singleflight import single_flight
+from .snapshot import get_snapshot
+from .storage import delete_unreferenced, media_storage
+
+RENDITIONS_LABEL = 'landing.imagerendition'
+
+# Формат: (расширение, формат Pillow, MIME-тип, параметры сохранения)
+RENDITION_FORMATS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+FORMAT_MIME_TYPES = {ext: mime for ext, _, mime, _ in RENDITION_FORMATS}
+
+
+def rendition_widths(original_width):
+    """Ширины копий: все стандартные меньше оригинала плюс сам оригинал, если он меньше максимальной."""
+    widths = [width for width in settings.IMAGE_RENDITION_WIDTHS if width < original_width]
+    if original_width <= max(settings.IMAGE_RENDITION_WIDTHS):
+        widths.append(original_width)
+    return widths
+
+
+def _encode(image, pillow_format, options):
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+# Ширина превью-заглушки: ~400 байт в base64, браузер растягивает её с размытием
+LQIP_WIDTH = 16
+METADATA_SUFFIXES = ('width', 'height', 'color', 'lqip')
+
+
+def _open_image(source):
+    """Открывает изображение по имени в default_storage или из файлового объекта."""
+    if isinstance(source, str):
+        with default_storage.open(source, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+    else:
+        # Ещё не сохранённый файл из формы: читаем и возвращаем указатель на начало
+        source.seek(0)
+        image = Image.open(source)
+        image.load()
+        source.seek(0)
+    return ImageOps.exif_transpose(image)
+
+
+def dominant_color(image):
+    """Самый частый цвет после квантования до 5 цветов, в виде #rrggbb."""
+    small = image.convert('RGB')
+    small.thumbnail((64, 64))
+    paletted = small.quantize(colors=5)
+    _, index = max(paletted.getcolors())
+    r, g, b = paletted.getpalette()[index * 3:index * 3 + 3]
+    return '#%02x%02x%02x' % (r, g, b)
+
+
+def lqip_data_uri(image):
+    small = image.convert('RGB')
+    small.thumbnail((LQIP_WIDTH, LQIP_WIDTH * 4))
+    buffer = io.BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def image_metadata(source):
+    image = _open_image(source)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'color': dominant_color(image),
+        'lqip': lqip_data_uri(image),
+    }
+
+
+EMPTY_METADATA = {'width': None, 'height': None, 'color': '', 'lqip': ''}
+
+
+def fill_image_metadata(instance, force=False):
+    """
+    Заполняет метаданные полей responsive_images у объекта, не сохраняя его.
+    Пересчитывает поля без метаданных и поля, куда загружен другой файл.
+    Возвращает список изменённых атрибутов.
+    """
+    field_names = getattr(instance, 'responsive_images', ())
+    stored = {}
+    if field_names and instance.pk is not None and not force:
+        stored = type(instance).objects.filter(pk=instance.pk).values(*field_names).first() or {}
+    values = {}
+    for field_name in field_names:
+        file = getattr(instance, field_name)
+        if not file:
+            metadata = EMPTY_METADATA
+        elif force or not file._committed or stored.get(field_name) != file.name \
+                or not getattr(instance, '%s_lqip' % field_name):
+            metadata = image_metadata(file.name if file._committed else file.file)
+        else:
+            continue
+        for suffix, value in metadata.items():
+            name = '%s_%s' % (field_name, suffix)
+            if getattr(instance, name) != value:
+                values[name] = value
+    for name, value in values.items():
+        setattr(instance, name, value)
+    return list(values)
+
+
+def metadata_for(image):
+    """Метаданные для FieldFile из поля модели или None, если они ещё не посчитаны."""
+    instance = getattr(image, 'instance', None)
+    field = getattr(image, 'field', None)
+    if instance is None or field is None or not getattr(instance, '%s_lqip' % field.name, ''):
+        return None
+    return {suffix: getattr(instance, '%s_%s' % (field.name, suffix)) for suffix in METADATA_SUFFIXES}
+
+
+def generate_renditions(source, force=False):
+    """Строит копии для файла source из default_storage. Возвращает число созданных."""
+    from .models import ImageRendition
+
+    def already_built():
+        return 0 if ImageRendition.objects.filter(source=source).exists() else None
+
+    if not force and already_built() is not None:
+        return 0
+    # Один файл могут одновременно сохранить админка и build_renditions: строит один,
+    # второй дожидается его и ничего не делает
+    return single_flight(
+        'renditions:%s' % source,
+        lambda: _build_renditions(source),
+        fresh=None if force else already_built,
+    )
+
+
+def _build_renditions(source):
+    from .models import ImageRendition
+
+    original = _open_image(source)
+
+    renditions = []
+    for width in rendition_widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for ext, pillow_format, _, options in RENDITION_FORMATS:
+            # Имя файла даёт хэш содержимого (ContentAddressedStorage)
+            name = media_storage.save(
+                posixpath.join('renditions', '%d.%s' % (width, ext)),
+                ContentFile(_encode(resized, pillow_format, options)),
+            )
+            renditions.append(ImageRendition(source=source, format=ext, width=width, height=height, file=name))
+
+    previous = set(ImageRendition.objects.filter(source=source).values_list('file', flat=True))
+    ImageRendition.objects.filter(source=source).delete()
+    ImageRendition.objects.bulk_create(renditions)
+    # Старые файлы удаляем, только когда новые строки точно записаны
+    transaction.on_commit(partial(delete_unreferenced, previous))
+    # Версию RENDITIONS_LABEL повышает вызывающий код после коммита
+    return len(renditions)
+
+
+def delete_renditions(source):
+    from .models import ImageRendition
+
+    names = set(ImageRendition.objects.filter(source=source).values_list('file', flat=True))
+    ImageRendition.objects.filter(source=source).delete()
+    transaction.on_commit(partial(delete_unreferenced, names))
+    return len(names)
+
+
+def _load_renditions():
+    from .models import ImageRendition
+
+    index = {}
+    for source, ext, width, name in ImageRendition.objects.values_list('source', 'format', 'width', 'file'):
+        index.setdefault(source, {}).setdefault(ext, []).append((width, default_storage.url(name)))
+    return index
+
+
+def renditions_for(source):
+    """{расширение: [(ширина, url), ...]} по возрастанию ширины; пусто, если копий нет."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.renditions.get(source, {})
+    index = memoize_for_version('renditions', RENDITIONS_LABEL, _load_renditions)
+    return index.get(source, {})
+
+
+def image_payload(image):
+    """Данные изображения для JSON API галереи: src, srcset JPEG и WebP-источники."""
+    renditions = renditions_for(image.name)
+    payload = {'src': image.url, 'srcset': '', 'sources': [], **EMPTY_METADATA}
+    payload.update(metadata_for(image) or {})
+    jpeg = renditions.get('jpeg')
+    if jpeg:
+        payload['src'] = jpeg[-1][1]
+        payload['srcset'] = ', '.join('%s %dw' % (url, width) for width, url in jpeg)
+    webp = renditions.get('webp')
+    if webp:
+        payload['sources'].append({
+            'type': FORMAT_MIME_TYPES['webp'],
+            'srcset': ', '.join('%s %dw' % (url, width) for width, url in webp),
+        })
+    return payload
+
+
+def responsive_image_sources(instance):
+    """Имена файлов из полей responsive_images объекта модели."""
+    for field_name in getattr(instance, 'responsive_images', ()):
+        file = getattr(instance, field_name)
+        if file:
+            yield file.name
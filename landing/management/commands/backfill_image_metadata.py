@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from landing.images import fill_image_metadata
+from landing.publish import content_changed
+
+
+class Command(BaseCommand):
+    help = 'Считает размеры, основной цвет и превью-заглушки для уже загруженных изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересчитать уже заполненные метаданные')
+
+    def handle(self, *args, **options):
+        updated = 0
+        labels = set()
+        for model in apps.get_app_config('landing').get_models():
+            if not getattr(model, 'responsive_images', ()):
+                continue
+            for instance in model.objects.all():
+                try:
+                    fields = fill_image_metadata(instance, force=options['force'])
+                except Exception as exc:
+                    self.stderr.write('%s #%s: %s' % (model._meta.label, instance.pk, exc))
+                    continue
+                if fields:
+                    # update() без сигналов и без смены updated_at
+                    model.objects.filter(pk=instance.pk).update(**{name: getattr(instance, name) for name in fields})
+                    updated += 1
+                    labels.add(model._meta.label_lower)
+
+        if labels:
+            content_changed(*labels)
+        self.stdout.write(self.style.SUCCESS('Обновлено объектов: %d' % updated))
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from landing.cache_backend import SharedMemoryCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость SharedMemoryCache, LocMemCache и FileBasedCache на типичных операциях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Операций на каждый замер')
+        parser.add_argument(
+            '--page-size', type=int, default=60 * 1024,
+            help='Размер значения «страница» в байтах (HTML главной страницы)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        small = {'version': 1, 'labels': ['landing.aboutblock']}
+        page = (1, b'x' * options['page_size'], 'text/html; charset=utf-8')
+        directory = tempfile.mkdtemp(prefix='bench-cache-')
+        try:
+            backends = [
+                ('SharedMemoryCache', SharedMemoryCache(os.path.join(directory, 'bench.arena'), {
+                    'OPTIONS': {'SIZE': 64 * 1024 * 1024, 'BLOCK_SIZE': 64 * 1024},
+                })),
+                ('LocMemCache', LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': iterations * 2}})),
+                ('FileBasedCache', FileBasedCache(os.path.join(directory, 'files'), {
+                    'OPTIONS': {'MAX_ENTRIES': iterations * 2},
+                })),
+            ]
+            operations = [
+                ('set small', lambda cache, i: cache.set('small:%d' % (i % 1000), small)),
+                ('get small (hit)', lambda cache, i: cache.get('small:%d' % (i % 1000))),
+                ('get (miss)', lambda cache, i: cache.get('missing:%d' % i)),
+                ('set page', lambda cache, i: cache.set('page:%d' % (i % 50), page)),
+                ('get page (hit)', lambda cache, i: cache.get('page:%d' % (i % 50))),
+                ('incr', lambda cache, i: cache.incr('counter')),
+            ]
+            self.stdout.write('%-18s' % 'операция' + ''.join('%20s' % name for name, _ in backends))
+            for label, operation in operations:
+                row = []
+                for _name, cache in backends:
+                    cache.set('counter', 0)
+                    # Файловый кэш на порядки медленнее: хватит десятой части замеров
+                    count = iterations // 10 if isinstance(cache, FileBasedCache) else iterations
+                    started = time.perf_counter()
+                    for i in range(count):
+                        operation(cache, i)
+                    elapsed = time.perf_counter() - started
+                    row.append('%14.0f оп/с' % (count / elapsed))
+                self.stdout.write('%-18s' % label + ''.join('%20s' % value for value in row))
+            self.stdout.write(
+                'LocMemCache быстрее, но у каждого воркера своя копия и свой сброс; '
+                'SharedMemoryCache и FileBasedCache общие для всех процессов.'
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,98 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from landing.benchmark import SCENARIOS, bench_settings, compare, config_differences, run_benchmark, seed_content
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер index, privacy_policy и stream_video (целиком, Range, суффикс) '
+        'через WSGI-обработчик на тестовой БД. Печатает JSON с пропускной способностью, '
+        'p50/p95/p99, запросами к БД и пиковым RSS; сравнивает с базовым отчётом'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Одновременных потоков')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='Прогревочных запросов перед замером')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Только эти сценарии')
+        parser.add_argument('--albums', type=int, default=12, help='Альбомов (первые — из fixtures/albums.json)')
+        parser.add_argument('--screenshots', type=int, default=300, help='Скриншотов локаций')
+        parser.add_argument('--video-size', type=int, default=16, help='Размер видео, МБ')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Без кэшей и снимка контента: полный рендер и запросы к БД на каждый запрос',
+        )
+        parser.add_argument('--output', help='Записать отчёт в файл вместо вывода')
+        parser.add_argument('--baseline', help='Сравнить с базовым отчётом')
+        parser.add_argument('--save-baseline', help='Сохранить отчёт как базовый')
+        parser.add_argument(
+            '--threshold', type=float, default=0.15,
+            help='Допустимое ухудшение относительно базового, доля (0.15 — 15%%)',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests должны быть больше нуля')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError('Не удалось прочитать базовый отчёт: %s' % exc)
+
+        config = {
+            'albums': options['albums'],
+            'screenshots': options['screenshots'],
+            'video_size_mb': options['video_size'],
+            'cache': not options['no_cache'],
+        }
+        with tempfile.TemporaryDirectory(prefix='bench-site-') as directory, override_settings(
+            **bench_settings(directory, cache=config['cache'], concurrency=options['concurrency'])
+        ):
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                seed_content(
+                    albums=options['albums'], screenshots=options['screenshots'],
+                    video_size=options['video_size'] * 1024 * 1024,
+                )
+                report = run_benchmark(
+                    options['scenario'] or SCENARIOS, config=config,
+                    requests=options['requests'], concurrency=options['concurrency'], warmup=options['warmup'],
+                )
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+
+        regressions = []
+        if baseline is not None:
+            differences = config_differences(report, baseline)
+            if differences:
+                self.stderr.write('Параметры прогона отличаются от базового: %s' % ', '.join(differences))
+            regressions = compare(report, baseline, options['threshold'])
+            report['regressions'] = regressions
+
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data + '\n')
+        else:
+            self.stdout.write(data)
+
+        if options['verbosity'] > 1 or options['output']:
+            for name, result in report['scenarios'].items():
+                latency = result['latency_ms'] or {}
+                self.stderr.write('%-20s %8.1f запросов/с  p50 %7.2f  p95 %7.2f  p99 %7.2f мс  БД %.2f' % (
+                    name, result['throughput'] or 0, latency.get('p50', 0), latency.get('p95', 0),
+                    latency.get('p99', 0), result['queries_per_request'],
+                ))
+        if regressions:
+            raise CommandError('Регрессии относительно базового отчёта:\n%s' % '\n'.join(regressions))
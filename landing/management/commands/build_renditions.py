@@ -0,0 +1,39 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from landing.images import RENDITIONS_LABEL, delete_renditions, generate_renditions, responsive_image_sources
+from landing.models import ImageRendition
+from landing.publish import content_changed
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии для уже загруженных изображений и удаляет копии удалённых'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перестроить существующие копии')
+
+    def handle(self, *args, **options):
+        sources = set()
+        for model in apps.get_app_config('landing').get_models():
+            if not getattr(model, 'responsive_images', ()):
+                continue
+            for instance in model.objects.all():
+                sources.update(responsive_image_sources(instance))
+
+        created = 0
+        for source in sorted(sources):
+            try:
+                created += generate_renditions(source, force=options['force'])
+            except Exception as exc:
+                self.stderr.write('%s: %s' % (source, exc))
+
+        removed = 0
+        orphans = set(ImageRendition.objects.values_list('source', flat=True)) - sources
+        for source in orphans:
+            removed += delete_renditions(source)
+
+        if created or removed:
+            content_changed(RENDITIONS_LABEL)
+        self.stdout.write(self.style.SUCCESS(
+            'Создано копий: %d, удалено лишних: %d' % (created, removed)
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from landing.vendor_assets import OUTPUT_DIR, VendorSourceError, build_vendor_assets
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает Bootstrap только с используемыми в шаблонах классами и CSS '
+        'с используемыми иконками Font Awesome из исходников в VENDOR_SOURCE_DIR'
+    )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = build_vendor_assets()
+        except VendorSourceError as exc:
+            raise CommandError('%s. Откуда взять исходники — см. vendor/README.txt' % exc)
+        for name, size in sorted(sizes.items()):
+            self.stdout.write('%s: %.1f КБ' % (name, size / 1024))
+        self.stdout.write(self.style.SUCCESS('Файлы записаны в %s' % OUTPUT_DIR))
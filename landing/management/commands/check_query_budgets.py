@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+BUDGET_TESTS = 'landing.tests.test_query_budgets'
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет бюджеты запросов к БД страниц лендинга, отдачи видео и changelist '
+        'админки: запускает %s на тестовой БД' % BUDGET_TESTS
+    )
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=options['verbosity'], interactive=False)
+        if runner.run_tests([BUDGET_TESTS]):
+            raise CommandError('Бюджеты запросов превышены')
@@ -0,0 +1,90 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.models import Trailer
+from landing.hls import trailer_video_values
+from landing.mp4 import MP4Error, analyze, faststart
+from landing.publish import content_changed
+from landing.storage import is_content_addressed, media_storage
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит индекс (moov) видео в начало файла, чтобы воспроизведение начиналось '
+        'без лишних запросов, сохраняет длительность, разрешение и битрейт трейлера '
+        'и строит для него плейлист HLS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только показать, какие файлы нужно переписать')
+
+    def handle(self, *args, **options):
+        videos_dir = os.path.join(settings.MEDIA_ROOT, 'videos')
+        paths = set()
+        if os.path.isdir(videos_dir):
+            paths.update(
+                os.path.join(videos_dir, name) for name in os.listdir(videos_dir)
+                if name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        trailer = Trailer.objects.filter(pk=1).first()
+        trailer_path = trailer.local_video.path if trailer and trailer.local_video else None
+        if trailer_path:
+            paths.add(trailer_path)
+
+        for path in sorted(paths):
+            name = os.path.relpath(path, settings.MEDIA_ROOT)
+            try:
+                info = analyze(path)
+                rewritten = False
+                if not info['faststart'] and not options['check']:
+                    if is_content_addressed(name):
+                        # Имя из хэша обещает неизменные байты: переписанный файл
+                        # сохраняется под новым именем, старый удалит gc_media
+                        new_path = self.resave(name)
+                        rewritten = new_path is not None
+                        path = new_path or path
+                    else:
+                        rewritten = faststart(path)
+                if rewritten:
+                    info = analyze(path)
+            except (OSError, MP4Error) as exc:
+                self.stderr.write('%s: %s' % (name, exc))
+                continue
+            if rewritten:
+                status = 'moov перенесён в начало'
+            elif info['faststart']:
+                status = 'faststart'
+            else:
+                status = 'moov в конце файла'
+            self.stdout.write('%s: %s, %.1f с, %sx%s, %d кбит/с' % (
+                name, status, info['duration'] or 0, info['width'], info['height'], (info['bitrate'] or 0) // 1000,
+            ))
+
+        if trailer_path and not options['check']:
+            trailer.refresh_from_db()
+            try:
+                values = trailer_video_values(trailer)
+            except (OSError, MP4Error):
+                return
+            if all(getattr(trailer, field) == value for field, value in values.items()):
+                return
+            # update() без сигналов: кэши сбрасываем сами
+            Trailer.objects.filter(pk=trailer.pk).update(**values)
+            content_changed(Trailer._meta.label_lower)
+
+    def resave(self, name):
+        """
+        Сохраняет файл заново (moov в начале, новое имя) и переводит на него
+        трейлер. Путь нового файла или None, если moov перенести не удалось.
+        """
+        with media_storage.open(name) as f:
+            new_name = media_storage.save(name, f)
+        if new_name == name:
+            return None
+        Trailer.objects.filter(local_video=name).update(local_video=new_name, video_faststart=None)
+        self.stdout.write('%s -> %s' % (name, new_name))
+        return media_storage.path(new_name)
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.storage import is_content_addressed, referenced_media
+
+# Папки, куда файлы пишет только сам сайт
+GENERATED_DIRS = ('renditions', 'hls')
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одна модель: загрузки '
+        'с именем из хэша, копии изображений и HLS. Файлы с исходными именами не трогает'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд (загрузка могла ещё не попасть в базу)',
+        )
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        referenced = referenced_media()
+        deadline = time.time() - options['min_age']
+        removed = 0
+        freed = 0
+        for directory, _dirs, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name in referenced or filename.startswith('.'):
+                    continue
+                if not is_content_addressed(name) and name.split('/', 1)[0] not in GENERATED_DIRS:
+                    continue
+                stat = os.stat(path)
+                if stat.st_mtime > deadline:
+                    continue
+                self.stdout.write(name)
+                removed += 1
+                freed += stat.st_size
+                if not options['dry_run']:
+                    os.unlink(path)
+        self.stdout.write(self.style.SUCCESS('%s файлов: %d, %.1f МБ' % (
+            'Можно удалить' if options['dry_run'] else 'Удалено', removed, freed / 2 ** 20,
+        )))
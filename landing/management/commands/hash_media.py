@@ -0,0 +1,47 @@
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from landing.models import ImageRendition
+from landing.publish import content_changed
+from landing.storage import is_content_addressed, media_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает загруженные ранее файлы по хэшу содержимого. Старые файлы '
+        'остаются на месте: на некоторые из них шаблоны ссылаются напрямую'
+    )
+
+    def handle(self, *args, **options):
+        renamed = 0
+        labels = set()
+        for model in apps.get_app_config('landing').get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, models.FileField) or field.storage is not media_storage:
+                    continue
+                rows = model._base_manager.exclude(**{field.name: ''}).exclude(
+                    **{'%s__isnull' % field.name: True},
+                ).values_list('pk', field.name)
+                for pk, name in rows:
+                    if is_content_addressed(name):
+                        continue
+                    if not media_storage.exists(name):
+                        self.stderr.write('%s #%s: нет файла %s' % (model._meta.label, pk, name))
+                        continue
+                    with media_storage.open(name, 'rb') as f:
+                        new_name = media_storage.save(name, File(f, name))
+                    with transaction.atomic():
+                        # update() без сигналов: метаданные и копии остаются прежними
+                        model._base_manager.filter(pk=pk).update(**{field.name: new_name})
+                        if field.name in getattr(model, 'responsive_images', ()):
+                            ImageRendition.objects.filter(source=name).update(source=new_name)
+                            labels.add(ImageRendition._meta.label_lower)
+                    self.stdout.write('%s → %s' % (name, new_name))
+                    renamed += 1
+                    labels.add(model._meta.label_lower)
+
+        if labels:
+            content_changed(*labels)
+        self.stdout.write(self.style.SUCCESS('Переименовано файлов: %d' % renamed))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from landing.shm import media_arena
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики общего кэша горячих диапазонов медиа или очищает его'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Удалить все блоки из кэша')
+
+    def handle(self, *args, **options):
+        arena = media_arena()
+        if arena is None:
+            raise CommandError('Кэш выключен (MEDIA_HOT_CACHE_SIZE = 0) или не поддерживается системой')
+        if options['clear']:
+            arena.clear()
+            self.stdout.write(self.style.SUCCESS('Кэш очищен'))
+        stats = arena.stats()
+        lookups = stats['hits'] + stats['misses']
+        self.stdout.write('Попаданий: %d, промахов: %d (%.1f%% из памяти)' % (
+            stats['hits'], stats['misses'], 100 * stats['hits'] / lookups if lookups else 0,
+        ))
+        self.stdout.write('Занято блоков: %d из %d, %.1f из %.1f МБ' % (
+            stats['slots_used'], stats['slots'], stats['bytes_used'] / 2 ** 20, stats['capacity'] / 2 ** 20,
+        ))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.streams import nginx_limits
+from landing.utils import write_atomic
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает лимит одновременных отдач видео на клиента для nginx '
+        '(MEDIA_STREAM_NGINX_CONF, include в /protected-media/) из MEDIA_STREAM_MAX_PER_CLIENT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--print', action='store_true', help='Вывести настройки, а не записать файл')
+
+    def handle(self, *args, **options):
+        if options['print']:
+            self.stdout.write(nginx_limits(), ending='')
+            return
+        write_atomic(settings.MEDIA_STREAM_NGINX_CONF, nginx_limits())
+        self.stdout.write(self.style.SUCCESS('Записан %s' % settings.MEDIA_STREAM_NGINX_CONF))
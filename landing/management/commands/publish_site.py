@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from landing.publish import clear_site, publish_site
+from landing.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Публикует снимок контента и статические снимки страниц для отдачи через nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить снимки, чтобы страницы снова отдавал Django',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_site()
+            self.stdout.write(self.style.SUCCESS('Снимки страниц удалены'))
+            return
+        if settings.SERVE_FROM_SNAPSHOT:
+            # Страницы рендерятся уже из нового снимка контента
+            write_snapshot()
+            self.stdout.write('Записан %s' % settings.CONTENT_SNAPSHOT_FILE)
+        for path in publish_site():
+            self.stdout.write('Записан %s' % path)
+        self.stdout.write(self.style.SUCCESS('Страницы опубликованы'))
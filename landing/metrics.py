@@ -0,0 +1,440 @@
+"""
+Метрики запросов в формате Prometheus (/metrics).
+
+Каждый воркер считает в памяти процесса: время ответа по имени URL,
+число и время запросов к БД, время рендера шаблонов, попадания в кэш
+страниц и секций, байты и длительность отдачи файлов. Раз в
+METRICS_FLUSH_INTERVAL секунд воркер записывает свои счётчики в файл
+METRICS_DIR/<pid>.metrics (JSON), а /metrics складывает файлы всех
+воркеров. Каталог закрыт для других пользователей (utils.private_directory),
+а из файлов берутся только известные метрики нужной формы.
+Счётчики завершившихся воркеров переносятся в общий файл, поэтому суммы
+не уменьшаются при перезапуске воркеров.
+
+Учёт одного запроса — несколько обращений к словарю под блокировкой,
+без системных вызовов, кроме записи файла раз в секунду. Страницы,
+которые nginx отдаёт из PUBLISH_ROOT, до Django не доходят и здесь не
+видны (их видно в access log nginx).
+"""
+import contextvars
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+from .utils import private_directory, write_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows: только метрики текущего процесса
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+STREAM_BUCKETS = (0.1, 1, 5, 15, 60, 300, 900, 3600)
+
+# имя: (тип, описание, имена меток, границы гистограммы)
+METRICS = {
+    'dron_http_request_duration_seconds': (
+        'histogram', 'Время ответа view до отдачи заголовков', ('view', 'method', 'status'), LATENCY_BUCKETS,
+    ),
+    'dron_db_queries_per_request': (
+        'histogram', 'Число запросов к БД за один HTTP-запрос', ('view',), QUERY_COUNT_BUCKETS,
+    ),
+    'dron_db_query_duration_seconds_total': (
+        'counter', 'Суммарное время запросов к БД', ('view',), None,
+    ),
+    'dron_template_render_duration_seconds': (
+        'histogram', 'Время рендера шаблона', ('template',), LATENCY_BUCKETS,
+    ),
+    'dron_page_cache_total': (
+        'counter', 'Ответы кэша страниц: hit, stale, fresh (готово после ожидания), render', ('result',), None,
+    ),
+    'dron_section_cache_total': (
+        'counter', 'Обращения к кэшу секций страницы', ('section', 'result'), None,
+    ),
+    'dron_stream_duration_seconds': (
+        'histogram', 'Длительность отдачи файла от ответа до закрытия', ('view',), STREAM_BUCKETS,
+    ),
+    'dron_stream_bytes_total': (
+        'counter', 'Байты тел потоковых ответов, которые забрал сервер (без отдачи через sendfile)', ('view',),
+        None,
+    ),
+}
+
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+DEAD_WORKERS_FILE = 'dead.metrics'
+
+_lock = threading.Lock()
+# (имя, значения меток) -> число для счётчиков или [по корзинам..., сумма] для гистограмм
+_values = {}
+_state = {'pid': None, 'flushed': 0.0}
+# [число запросов к БД, их время] текущего HTTP-запроса
+_request_db = contextvars.ContextVar('landing_metrics_db', default=None)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _check_fork():
+    # Счётчики, унаследованные от мастер-процесса, не считаются дважды
+    pid = os.getpid()
+    if _state['pid'] != pid:
+        _values.clear()
+        _state.update(pid=pid, flushed=time.monotonic())
+
+
+def inc(name, labels=(), value=1):
+    if not settings.METRICS_ENABLED:
+        return
+    key = (name, labels)
+    with _lock:
+        _check_fork()
+        _values[key] = _values.get(key, 0) + value
+
+
+def observe(name, labels, value):
+    if not settings.METRICS_ENABLED:
+        return
+    buckets = METRICS[name][3]
+    key = (name, labels)
+    with _lock:
+        _check_fork()
+        histogram = _values.get(key)
+        if histogram is None:
+            histogram = _values[key] = [0] * (len(buckets) + 1) + [0.0]
+        histogram[bisect_left(buckets, value)] += 1
+        histogram[-1] += value
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(current, value)]
+        else:
+            target[key] = current + value
+
+
+def _worker_file(pid):
+    return os.path.join(settings.METRICS_DIR, '%d.metrics' % pid)
+
+
+def _dump(values):
+    return json.dumps([[name, list(labels), value] for (name, labels), value in values.items()])
+
+
+def _valid(name, labels, value):
+    metric = METRICS.get(name)
+    if metric is None or not isinstance(labels, list) or len(labels) != len(metric[2]):
+        return False
+    if not all(isinstance(label, str) for label in labels):
+        return False
+    if metric[3] is None:
+        return isinstance(value, (int, float))
+    return (
+        isinstance(value, list) and len(value) == len(metric[3]) + 2
+        and all(isinstance(number, (int, float)) for number in value)
+    )
+
+
+def _load(path):
+    """Счётчики из файла воркера; повреждённые или чужие записи пропускаются."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            items = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(items, list):
+        return {}
+    return {
+        (item[0], tuple(item[1])): item[2]
+        for item in items
+        if isinstance(item, list) and len(item) == 3 and _valid(*item)
+    }
+
+
+def flush():
+    """Записывает счётчики процесса в его файл."""
+    with _lock:
+        _check_fork()
+        data = _dump(_values)
+        _state['flushed'] = time.monotonic()
+    private_directory(settings.METRICS_DIR)
+    write_atomic(_worker_file(os.getpid()), data, mode=0o600)
+
+
+def _maybe_flush():
+    if time.monotonic() - _state['flushed'] >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def collect():
+    """Сумма счётчиков всех воркеров, живых и завершившихся."""
+    flush()
+    if fcntl is None:
+        with _lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in _values.items()}
+    directory = settings.METRICS_DIR
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        dead_path = os.path.join(directory, DEAD_WORKERS_FILE)
+        dead = _load(dead_path)
+        total = {}
+        finished = []
+        for path in glob.glob(os.path.join(directory, '*.metrics')):
+            name = os.path.basename(path)
+            if name == DEAD_WORKERS_FILE:
+                continue
+            values = _load(path)
+            if _pid_alive(int(name.split('.')[0])):
+                _merge(total, values)
+            else:
+                _merge(dead, values)
+                finished.append(path)
+        if finished:
+            # Сначала сохраняем сумму, потом удаляем файлы: счётчики не теряются
+            write_atomic(dead_path, _dump(dead), mode=0o600)
+            for path in finished:
+                os.unlink(path)
+        _merge(total, dead)
+    return total
+
+
+def _cache_stats():
+    """Статистика арен в разделяемой памяти: кэш Django и горячие диапазоны медиа."""
+    from .cache_backend import SharedMemoryCache
+    from .shm import media_arena
+
+    arenas = []
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        if isinstance(backend, SharedMemoryCache):
+            arenas.append((alias, backend._arena))
+    arena = media_arena()
+    if arena is not None:
+        arenas.append(('media', arena))
+    return [(name, arena.stats()) for name, arena in arenas]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    pairs.extend('%s="%s"' % pair for pair in extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(values):
+    """Текст в формате Prometheus exposition 0.0.4."""
+    lines = []
+    for name, (kind, description, label_names, buckets) in METRICS.items():
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, kind))
+        samples = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        for labels, value in samples:
+            if kind != 'histogram':
+                lines.append('%s%s %s' % (name, _labels(label_names, labels), _number(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append('%s_bucket%s %d' % (name, _labels(label_names, labels, [('le', le)]), cumulative))
+            lines.append('%s_sum%s %s' % (name, _labels(label_names, labels), _number(value[-1])))
+            lines.append('%s_count%s %d' % (name, _labels(label_names, labels), cumulative))
+    cache_metrics = (
+        ('dron_cache_hits_total', 'counter', 'Попадания в арену разделяемой памяти', 'hits'),
+        ('dron_cache_misses_total', 'counter', 'Промахи арены разделяемой памяти', 'misses'),
+        ('dron_cache_stores_total', 'counter', 'Записи в арену разделяемой памяти', 'stores'),
+        ('dron_cache_slots_used', 'gauge', 'Занятые слоты арены', 'slots_used'),
+        ('dron_cache_slots', 'gauge', 'Всего слотов арены', 'slots'),
+    )
+    stats = _cache_stats()
+    for name, kind, description, field in cache_metrics:
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, kind))
+        for cache_name, cache_stats in stats:
+            lines.append('%s%s %d' % (name, _labels(('cache',), (cache_name,)), cache_stats[field]))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Метрики для Prometheus. Доступ по заголовку Authorization: Bearer
+    <METRICS_TOKEN> или сотрудникам, вошедшим в админку; остальным — 404.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = bool(token) and hmac.compare_digest(authorization.encode(), ('Bearer %s' % token).encode())
+    user = getattr(request, 'user', None)
+    if not allowed and not (user is not None and user.is_active and user.is_staff):
+        raise Http404()
+    response = HttpResponse(render_metrics(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    counters = _request_db.get()
+    if counters is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counters[0] += 1
+        counters[1] += time.perf_counter() - start
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created: считает запросы к БД каждого соединения."""
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+class _StreamStats:
+    """Отдача тела потокового ответа: сколько байт забрал сервер и когда она закончилась."""
+    __slots__ = ('view', 'started', 'sent', 'reported')
+
+    def __init__(self, view):
+        self.view = view
+        self.started = time.perf_counter()
+        self.sent = 0
+        self.reported = False
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        observe('dron_stream_duration_seconds', (self.view,), time.perf_counter() - self.started)
+        if self.sent:
+            inc('dron_stream_bytes_total', (self.view,), self.sent)
+
+
+def _count_sent(chunks, stats, make_bytes):
+    for chunk in chunks:
+        yield chunk
+        # Сервер попросил следующий кусок, значит предыдущий он уже отправил;
+        # при обрыве соединения неотправленный кусок не считается
+        stats.sent += len(chunk if isinstance(chunk, bytes) else make_bytes(chunk))
+
+
+async def _acount_sent(chunks, stats, make_bytes):
+    try:
+        async for chunk in chunks:
+            yield chunk
+            stats.sent += len(chunk if isinstance(chunk, bytes) else make_bytes(chunk))
+    finally:
+        # При обрыве соединения Django под ASGI закрывает итератор, но не ответ
+        stats.report()
+
+
+def _record(request, response, started, db):
+    elapsed = time.perf_counter() - started
+    match = request.resolver_match
+    view = match.view_name if match is not None else 'unmatched'
+    method = request.method if request.method in KNOWN_METHODS else 'other'
+    observe('dron_http_request_duration_seconds', (view, method, '%dxx' % (response.status_code // 100)), elapsed)
+    observe('dron_db_queries_per_request', (view,), db[0])
+    if db[0]:
+        inc('dron_db_query_duration_seconds_total', (view,), db[1])
+    if response.streaming:
+        # Длительность отдачи — до закрытия ответа сервером (конец передачи или
+        # обрыв), байты — те, что сервер забрал из тела. Заменяется итератор,
+        # а не streaming_content: иначе FileResponse потерял бы file_to_stream
+        # и gunicorn не смог бы отдать файл через sendfile
+        stats = _StreamStats(view)
+        count = _acount_sent if response.is_async else _count_sent
+        response._iterator = count(response._iterator, stats, response.make_bytes)
+        response._resource_closers.append(stats.report)
+    _maybe_flush()
+
+
+def metrics_middleware(get_response):
+    """Учитывает время ответа, запросы к БД и отдачу файлов по имени URL."""
+    if not settings.METRICS_ENABLED:
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            db = [0, 0.0]
+            reset = _request_db.set(db)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_db.reset(reset)
+            _record(request, response, started, db)
+            return response
+
+        return markcoroutinefunction(middleware)
+
+    def middleware(request):
+        started = time.perf_counter()
+        db = [0, 0.0]
+        reset = _request_db.set(db)
+        try:
+            response = get_response(request)
+        finally:
+            _request_db.reset(reset)
+        _record(request, response, started, db)
+        return response
+
+    return middleware
+
+
+metrics_middleware.sync_capable = True
+metrics_middleware.async_capable = True
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который замеряет время рендера каждого шаблона."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code), '<string>')
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name), template_name)
+
+
+class TimedTemplate:
+
+    def __init__(self, template, name):
+        self.template = template
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            observe('dron_template_render_duration_seconds', (self.name,), time.perf_counter() - started)
@@ -0,0 +1,27 @@
+# Миграции 0006–0012 и слияние 0013 применены на сервере, но не попали в
+# репозиторий, а 0014 зависит от этого слияния. Файл восстанавливает узел
+# графа: на сервере 0013 уже отмечена применённой и не выполняется, на
+# новой базе (тесты, bench_site) она доводит схему 0005 до состояния, от
+# которого считают 0014 и следующие, — модели формы обратной связи и
+# вариантов покупки/версий удалены из landing.models.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0005_pagesettings_purchaseoptionsblock_versionsblock_and_more'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ContactForm',
+        ),
+        migrations.DeleteModel(
+            name='PurchaseOption',
+        ),
+        migrations.DeleteModel(
+            name='Version',
+        ),
+    ]
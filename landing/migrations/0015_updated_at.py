@@ -0,0 +1,80 @@
+# Generated by Django 5.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0014_fix_hero_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aboutblock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='appscreenshot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='footer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='fpvmode',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='pagesettings',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='purchaseoptionsblock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='screenshotalbum',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='versionsblock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Последнее изменение'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0016_imagerendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aboutblock',
+            name='hero_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='aboutblock',
+            name='hero_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='aboutblock',
+            name='hero_image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет изображения'),
+        ),
+        migrations.AddField(
+            model_name='aboutblock',
+            name='hero_image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='appscreenshot',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='appscreenshot',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='appscreenshot',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет изображения'),
+        ),
+        migrations.AddField(
+            model_name='appscreenshot',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='fpvmode',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='fpvmode',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='fpvmode',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет изображения'),
+        ),
+        migrations.AddField(
+            model_name='fpvmode',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет изображения'),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота изображения'),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет изображения'),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью изображения (data URI)'),
+        ),
+    ]
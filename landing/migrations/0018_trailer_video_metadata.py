@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0017_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trailer',
+            name='video_duration',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Длительность видео, с'),
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='video_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина видео'),
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='video_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота видео'),
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='video_bitrate',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Битрейт видео, бит/с'),
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='video_faststart',
+            field=models.BooleanField(editable=False, null=True, verbose_name='Индекс видео в начале файла'),
+        ),
+    ]
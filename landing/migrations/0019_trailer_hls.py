@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0018_trailer_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trailer',
+            name='video_hls',
+            field=models.FileField(blank=True, editable=False, upload_to='hls/', verbose_name='Видео для HLS'),
+        ),
+        migrations.AddField(
+            model_name='trailer',
+            name='video_hls_playlist',
+            field=models.TextField(blank=True, editable=False, verbose_name='Плейлист HLS'),
+        ),
+    ]
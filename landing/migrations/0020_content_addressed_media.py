@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import landing.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0019_trailer_hls'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aboutblock',
+            name='hero_image',
+            field=models.ImageField(blank=True, null=True, storage=landing.storage.get_media_storage, upload_to='backgrounds/', verbose_name='Изображение фона Hero (верхняя секция)'),
+        ),
+        migrations.AlterField(
+            model_name='trailer',
+            name='local_video',
+            field=models.FileField(blank=True, help_text='Либо загрузите видеофайл', null=True, storage=landing.storage.get_media_storage, upload_to='videos/', verbose_name='Локальное видео'),
+        ),
+        migrations.AlterField(
+            model_name='productinfo',
+            name='image',
+            field=models.ImageField(storage=landing.storage.get_media_storage, upload_to='product_images/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='screenshot',
+            name='image',
+            field=models.ImageField(storage=landing.storage.get_media_storage, upload_to='screenshots/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='appscreenshot',
+            name='image',
+            field=models.ImageField(storage=landing.storage.get_media_storage, upload_to='app_screenshots/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='fpvmode',
+            name='image',
+            field=models.ImageField(storage=landing.storage.get_media_storage, upload_to='fpv_images/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='footer',
+            name='our_logo',
+            field=models.ImageField(blank=True, null=True, storage=landing.storage.get_media_storage, upload_to='logos/', verbose_name='Наш логотип (в футере)'),
+        ),
+        migrations.AlterField(
+            model_name='footer',
+            name='partner_logo',
+            field=models.ImageField(blank=True, null=True, storage=landing.storage.get_media_storage, upload_to='logos/', verbose_name='Логотип партнера (в футере)'),
+        ),
+        migrations.AlterField(
+            model_name='pagesettings',
+            name='favicon',
+            field=models.ImageField(blank=True, null=True, storage=landing.storage.get_media_storage, upload_to='favicons/', verbose_name='Фавикон (иконка сайта)'),
+        ),
+        migrations.AlterField(
+            model_name='imagerendition',
+            name='file',
+            field=models.ImageField(storage=landing.storage.get_media_storage, upload_to='renditions/', verbose_name='Файл'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.html import linebreaks
+
+from landing.utils import split_lines, tel_link
+
+
+def fill_render_fields(apps, schema_editor):
+    # Исторические модели без методов: те же вычисления, что в update_render_fields()
+    ProductInfo = apps.get_model('landing', 'ProductInfo')
+    PurchaseOptionsBlock = apps.get_model('landing', 'PurchaseOptionsBlock')
+    Footer = apps.get_model('landing', 'Footer')
+    PrivacyPolicy = apps.get_model('landing', 'PrivacyPolicy')
+    for obj in ProductInfo.objects.all():
+        obj.description_html = linebreaksbr(obj.description)
+        obj.save(update_fields=['description_html'])
+    for obj in PurchaseOptionsBlock.objects.all():
+        obj.basic_features_list = split_lines(obj.basic_features)
+        obj.custom_features_list = split_lines(obj.custom_features)
+        obj.save(update_fields=['basic_features_list', 'custom_features_list'])
+    for obj in Footer.objects.all():
+        obj.phone_link = tel_link(obj.phone)
+        obj.save(update_fields=['phone_link'])
+    for obj in PrivacyPolicy.objects.all():
+        obj.content_html = linebreaks(obj.content, autoescape=True)
+        obj.save(update_fields=['content_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0020_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinfo',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Описание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='purchaseoptionsblock',
+            name='basic_features_list',
+            field=models.JSONField(default=list, editable=False, verbose_name='Список особенностей (Базовый)'),
+        ),
+        migrations.AddField(
+            model_name='purchaseoptionsblock',
+            name='custom_features_list',
+            field=models.JSONField(default=list, editable=False, verbose_name='Список особенностей (Кастомный)'),
+        ),
+        migrations.AddField(
+            model_name='footer',
+            name='phone_link',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Ссылка tel:'),
+        ),
+        migrations.AddField(
+            model_name='privacypolicy',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Содержание (HTML)'),
+        ),
+        migrations.RunPython(fill_render_fields, migrations.RunPython.noop),
+    ]
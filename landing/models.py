@@ -1,26 +1,65 @@
 from django.db import models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.html import linebreaks
+
+from .cache import memoize_for_version
+from .snapshot import get_snapshot
+from .storage import get_media_storage
+from .utils import split_lines, tel_link
 
 class SingletonModel(models.Model):
+    # Поля-изображения, для которых при сохранении строятся уменьшенные копии
+    responsive_images = ()
+
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs):
         self.pk = 1
+        self.update_render_fields()
         super(SingletonModel, self).save(*args, **kwargs)
 
+    def update_render_fields(self):
+        """
+        Заполняет поля с готовыми для шаблона данными (списки, HTML, ссылки),
+        чтобы при рендере оставалась только подстановка значений.
+        """
+
     def delete(self, *args, **kwargs):
         pass
 
     @classmethod
     def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
+        # Только чтение: при отсутствии записи возвращаем несохранённый объект
+        # со значениями по умолчанию, запись в БД создаётся из админки.
+        # Объект кэшируется в процессе до изменения версии модели, а если
+        # опубликован снимок контента — берётся из него без обращения к БД.
+        snapshot = get_snapshot()
+        if snapshot is not None and snapshot.singleton(cls) is not None:
+            return snapshot.singleton(cls)
+        label = cls._meta.label_lower
+        return memoize_for_version(('singleton', label), label, cls._load_from_db)
+
+    @classmethod
+    def _load_from_db(cls):
+        obj = cls.objects.filter(pk=1).first()
+        if obj is None:
+            obj = cls(pk=1)
+            obj.update_render_fields()
         return obj
 
 class AboutBlock(SingletonModel):
+    responsive_images = ('hero_image',)
+
     title = models.CharField(max_length=200, default="Тренажер БПЛА с реалистичной физикой и режимом от первого лица", verbose_name="Заголовок на главном экране")
     text_in_frame = models.TextField(default="Отрабатывайте пилотирование в реальных полетных условиях и на разнообразных картах в режиме свободного полета. Усложните задачу: выследите и найдите подвижную цель на локациях с помощью специального режима «Поиск».", verbose_name="Текст в рамке")
     subtitle = models.CharField(max_length=200, default="Симулятор FPV дронов с детально проработанной физикой", verbose_name="Подзаголовок (не используется)")
-    hero_image = models.ImageField(upload_to='backgrounds/', blank=True, null=True, verbose_name="Изображение фона Hero (верхняя секция)")
+    hero_image = models.ImageField(upload_to='backgrounds/', storage=get_media_storage, blank=True, null=True, verbose_name="Изображение фона Hero (верхняя секция)")
+    hero_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина изображения")
+    hero_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота изображения")
+    hero_image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет изображения")
+    hero_image_lqip = models.TextField(blank=True, editable=False, verbose_name="Превью изображения (data URI)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "1. Главный блок"
@@ -33,7 +72,17 @@ class Trailer(SingletonModel):
     title = models.CharField(max_length=200, default="Трейлер симулятора", verbose_name="Заголовок секции")
     subtitle = models.TextField(default="Посмотрите видео, чтобы узнать больше о возможностях нашего симулятора", verbose_name="Подзаголовок секции")
     video_url = models.URLField(blank=True, null=True, help_text="URL видео с YouTube или другого видеохостинга", verbose_name="Ссылка на YouTube видео")
-    local_video = models.FileField(upload_to='videos/', blank=True, null=True, help_text="Либо загрузите видеофайл", verbose_name="Локальное видео")
+    local_video = models.FileField(upload_to='videos/', storage=get_media_storage, blank=True, null=True, help_text="Либо загрузите видеофайл", verbose_name="Локальное видео")
+    # Заполняются после загрузки видео (landing/mp4.py)
+    video_duration = models.FloatField(null=True, blank=True, editable=False, verbose_name="Длительность видео, с")
+    video_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина видео")
+    video_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота видео")
+    video_bitrate = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Битрейт видео, бит/с")
+    video_faststart = models.BooleanField(null=True, editable=False, verbose_name="Индекс видео в начале файла")
+    # Фрагментированная копия видео и плейлист HLS к ней (landing/hls.py)
+    video_hls = models.FileField(upload_to='hls/', blank=True, editable=False, verbose_name="Видео для HLS")
+    video_hls_playlist = models.TextField(blank=True, editable=False, verbose_name="Плейлист HLS")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "2. Секция 'Трейлер'"
@@ -43,9 +92,17 @@ class Trailer(SingletonModel):
         return "Трейлер"
 
 class ProductInfo(SingletonModel):
+    responsive_images = ('image',)
+
     title = models.CharField(max_length=200, default="О продукте", verbose_name="Заголовок")
-    image = models.ImageField(upload_to='product_images/', verbose_name="Изображение")
+    image = models.ImageField(upload_to='product_images/', storage=get_media_storage, verbose_name="Изображение")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина изображения")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота изображения")
+    image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет изображения")
+    image_lqip = models.TextField(blank=True, editable=False, verbose_name="Превью изображения (data URI)")
     description = models.TextField(default="...", verbose_name="Описание")
+    description_html = models.TextField(blank=True, editable=False, verbose_name="Описание (HTML)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "3. Блок 'О продукте'"
@@ -54,9 +111,13 @@ class ProductInfo(SingletonModel):
     def __str__(self):
         return "Блок информации о продукте"
 
+    def update_render_fields(self):
+        self.description_html = linebreaksbr(self.description)
+
 class ScreenshotAlbum(models.Model):
     title = models.CharField(max_length=100, unique=True, verbose_name="Название локации")
     order = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Порядок")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         ordering = ['order']
@@ -67,9 +128,16 @@ class ScreenshotAlbum(models.Model):
         return self.title
 
 class Screenshot(models.Model):
+    responsive_images = ('image',)
+
     album = models.ForeignKey(ScreenshotAlbum, on_delete=models.CASCADE, related_name='screenshots', verbose_name="Альбом")
-    image = models.ImageField(upload_to='screenshots/', verbose_name="Изображение")
+    image = models.ImageField(upload_to='screenshots/', storage=get_media_storage, verbose_name="Изображение")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина изображения")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота изображения")
+    image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет изображения")
+    image_lqip = models.TextField(blank=True, editable=False, verbose_name="Превью изображения (data URI)")
     caption = models.CharField(max_length=100, blank=True, verbose_name="Подпись")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "Скриншот локации"
@@ -79,10 +147,17 @@ class Screenshot(models.Model):
         return f"Скриншот для {self.album.title}"
 
 class AppScreenshot(models.Model):
+    responsive_images = ('image',)
+
     title = models.CharField(max_length=100, verbose_name="Название скриншота")
-    image = models.ImageField(upload_to='app_screenshots/', verbose_name="Изображение")
+    image = models.ImageField(upload_to='app_screenshots/', storage=get_media_storage, verbose_name="Изображение")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина изображения")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота изображения")
+    image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет изображения")
+    image_lqip = models.TextField(blank=True, editable=False, verbose_name="Превью изображения (data URI)")
     description = models.TextField(blank=True, verbose_name="Описание (не используется)")
     order = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Порядок")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         ordering = ['order']
@@ -101,6 +176,7 @@ class VersionsBlock(SingletonModel):
     custom_title = models.CharField(max_length=100, verbose_name="Название (Кастомная)", default="Кастомная версия")
     custom_description = models.TextField(verbose_name="Описание (Кастомная)", default="Разработка версии под ваши уникальные требования.")
     custom_supported_os = models.CharField(max_length=300, default="Linux, Windows, macOS, РЕД ОС, Astra Linux, uncomOS", verbose_name="Поддерживаемые ОС (Кастомная)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "6. Секция 'Версии симулятора'"
@@ -111,9 +187,16 @@ class VersionsBlock(SingletonModel):
 
 
 class FPVMode(SingletonModel):
+    responsive_images = ('image',)
+
     title = models.CharField(max_length=200, default="FPV режим", verbose_name="Заголовок")
-    image = models.ImageField(upload_to='fpv_images/', verbose_name="Изображение")
+    image = models.ImageField(upload_to='fpv_images/', storage=get_media_storage, verbose_name="Изображение")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Ширина изображения")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Высота изображения")
+    image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Основной цвет изображения")
+    image_lqip = models.TextField(blank=True, editable=False, verbose_name="Превью изображения (data URI)")
     description = models.TextField(default="Симулятор FPV дронов с детально проработанной физикой для тренировок в режиме от первого лица.", verbose_name="Описание")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "7. Блок 'FPV режим'"
@@ -131,6 +214,9 @@ class PurchaseOptionsBlock(SingletonModel):
     custom_name = models.CharField(max_length=100, verbose_name="Название тарифа (Кастомный)", default="Кастомная версия")
     custom_price = models.CharField(max_length=100, verbose_name="Цена (Кастомный)", default="Цена по запросу")
     custom_features = models.TextField(verbose_name="Особенности (Кастомный)", default="Индивидуальная разработка\nПерсональные настройки\nПриоритетная поддержка")
+    basic_features_list = models.JSONField(default=list, editable=False, verbose_name="Список особенностей (Базовый)")
+    custom_features_list = models.JSONField(default=list, editable=False, verbose_name="Список особенностей (Кастомный)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "8. Секция 'Варианты приобретения'"
@@ -139,11 +225,9 @@ class PurchaseOptionsBlock(SingletonModel):
     def __str__(self):
         return "Секция 'Варианты приобретения'"
 
-    def get_basic_features_list(self):
-        return [feature.strip() for feature in self.basic_features.split('\n') if feature.strip()]
-
-    def get_custom_features_list(self):
-        return [feature.strip() for feature in self.custom_features.split('\n') if feature.strip()]
+    def update_render_fields(self):
+        self.basic_features_list = split_lines(self.basic_features)
+        self.custom_features_list = split_lines(self.custom_features)
 
 
 class Footer(SingletonModel):
@@ -151,8 +235,10 @@ class Footer(SingletonModel):
     contact_subtitle = models.TextField(default="Мы всегда готовы ответить на ваши вопросы и обсудить сотрудничество.", verbose_name="Подзаголовок")
     email = models.EmailField(default="m.korovob@yandex.ru", verbose_name="Email")
     phone = models.CharField(max_length=20, default="8 900 478 43 84", verbose_name="Телефон")
-    our_logo = models.ImageField(upload_to='logos/', blank=True, null=True, verbose_name="Наш логотип (в футере)")
-    partner_logo = models.ImageField(upload_to='logos/', blank=True, null=True, verbose_name="Логотип партнера (в футере)")
+    phone_link = models.CharField(max_length=30, blank=True, editable=False, verbose_name="Ссылка tel:")
+    our_logo = models.ImageField(upload_to='logos/', storage=get_media_storage, blank=True, null=True, verbose_name="Наш логотип (в футере)")
+    partner_logo = models.ImageField(upload_to='logos/', storage=get_media_storage, blank=True, null=True, verbose_name="Логотип партнера (в футере)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "9. Контакты и футер"
@@ -161,9 +247,13 @@ class Footer(SingletonModel):
     def __str__(self):
         return "Футер и блок контактов"
 
+    def update_render_fields(self):
+        self.phone_link = tel_link(self.phone)
+
 class PrivacyPolicy(SingletonModel):
     title = models.CharField(max_length=200, default="Политика конфиденциальности", verbose_name="Заголовок")
     content = models.TextField(verbose_name="Содержание")
+    content_html = models.TextField(blank=True, editable=False, verbose_name="Содержание (HTML)")
     last_updated = models.DateTimeField(auto_now=True, verbose_name="Последнее обновление")
     
     class Meta:
@@ -173,9 +263,12 @@ class PrivacyPolicy(SingletonModel):
     def __str__(self):
         return self.title
 
+    def update_render_fields(self):
+        self.content_html = linebreaks(self.content, autoescape=True)
+
 
 class PageSettings(SingletonModel):
-    favicon = models.ImageField(upload_to='favicons/', blank=True, null=True, verbose_name="Фавикон (иконка сайта)")
+    favicon = models.ImageField(upload_to='favicons/', storage=get_media_storage, blank=True, null=True, verbose_name="Фавикон (иконка сайта)")
 
     gallery_title = models.CharField(max_length=200, default="Галерея скриншотов", verbose_name="Заголовок секции 'Галерея'")
     gallery_subtitle = models.TextField(default="Посмотрите на реалистичную графику и разнообразие локаций", verbose_name="Подзаголовок секции 'Галерея'")
@@ -188,6 +281,7 @@ class PageSettings(SingletonModel):
     
     purchase_options_title = models.CharField(max_length=200, default="Варианты приобретения", verbose_name="Заголовок секции 'Варианты приобретения'")
     purchase_options_subtitle = models.TextField(default="Выберите подходящий тариф для ваших потребностей", verbose_name="Подзаголовок секции 'Варианты приобретения'")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последнее изменение")
 
     class Meta:
         verbose_name = "0. Общие настройки страницы"
@@ -195,3 +289,21 @@ class PageSettings(SingletonModel):
 
     def __str__(self):
         return "Общие настройки страницы"
+
+
+class ImageRendition(models.Model):
+    """Уменьшенная копия загруженного изображения (см. landing/images.py)."""
+    source = models.CharField(max_length=255, db_index=True, verbose_name="Исходный файл")
+    format = models.CharField(max_length=10, verbose_name="Формат")
+    width = models.PositiveIntegerField(verbose_name="Ширина")
+    height = models.PositiveIntegerField(verbose_name="Высота")
+    file = models.ImageField(upload_to='renditions/', storage=get_media_storage, verbose_name="Файл")
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        unique_together = ('source', 'format', 'width')
+        verbose_name = "Вариант изображения"
+        verbose_name_plural = "Варианты изображений"
+
+    def __str__(self):
+        return f"{self.source} ({self.format}, {self.width}px)"
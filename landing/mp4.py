@@ -0,0 +1,298 @@
+"""
+Разбор структуры MP4 и перенос moov в начало файла (faststart).
+
+Если атом moov (индекс кадров) записан после mdat, браузер прежде чем
+показать первый кадр делает дополнительные range-запросы в конец файла.
+faststart() переписывает файл так, чтобы moov шёл сразу после ftyp,
+сдвигая смещения чанков в stco/co64. Данные mdat копируются блоками,
+в памяти держится только moov.
+"""
+import os
+import shutil
+import struct
+import tempfile
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Контейнеры на пути moov/trak/mdia/minf/stbl, внутри которых лежат stco/co64
+CHUNK_OFFSET_CONTAINERS = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+MAX_UINT32 = 0xFFFFFFFF
+
+
+class MP4Error(Exception):
+    pass
+
+
+class Box:
+    __slots__ = ('type', 'offset', 'size', 'header_size')
+
+    def __init__(self, type, offset, size, header_size):
+        self.type = type
+        self.offset = offset
+        self.size = size
+        self.header_size = header_size
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    @property
+    def payload_offset(self):
+        return self.offset + self.header_size
+
+    def __repr__(self):
+        return '<Box %s @%d size=%d>' % (self.type.decode('latin-1'), self.offset, self.size)
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise MP4Error('Файл обрывается внутри заголовка атома')
+    return data
+
+
+def iter_boxes(f, start, end):
+    """Атомы файла f между смещениями start и end (без вложенных)."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack('>I4s', _read_exact(f, 8))
+        header_size = 8
+        if size == 1:
+            size, = struct.unpack('>Q', _read_exact(f, 8))
+            header_size = 16
+        elif size == 0:
+            # Атом до конца файла (обычно последний mdat)
+            size = end - offset
+        if box_type == b'uuid':
+            header_size += 16
+        if size < header_size or offset + size > end:
+            raise MP4Error('Некорректный размер атома %r по смещению %d' % (box_type, offset))
+        yield Box(box_type, offset, size, header_size)
+        offset += size
+
+
+def iter_payload(data, start=0, end=None):
+    """То же, что iter_boxes, но по байтам уже прочитанного атома."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            size, = struct.unpack_from('>Q', data, offset + 8)
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise MP4Error('Некорректный размер атома %r внутри moov' % box_type)
+        yield box_type, offset, size, header_size
+        offset += size
+
+
+def find_boxes(data, path, start=0, end=None):
+    """Все атомы по пути вида (b'trak', b'mdia', b'hdlr') внутри data[start:end]."""
+    found = []
+    for box_type, offset, size, header_size in iter_payload(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            found.append((offset + header_size, offset + size))
+        else:
+            found.extend(find_boxes(data, path[1:], offset + header_size, offset + size))
+    return found
+
+
+def read_box(f, box):
+    f.seek(box.offset)
+    return _read_exact(f, box.size)
+
+
+def top_level_boxes(f):
+    f.seek(0, os.SEEK_END)
+    return list(iter_boxes(f, 0, f.tell()))
+
+
+def _movie_duration(moov):
+    for start, _ in find_boxes(moov, (b'moov', b'mvhd')):
+        version = moov[start]
+        if version == 1:
+            timescale, duration = struct.unpack_from('>IQ', moov, start + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', moov, start + 12)
+        if timescale:
+            return duration / timescale
+    return None
+
+
+def _video_dimensions(moov):
+    for trak_start, trak_end in find_boxes(moov, (b'moov', b'trak')):
+        handlers = find_boxes(moov, (b'mdia', b'hdlr'), trak_start, trak_end)
+        if not handlers or moov[handlers[0][0] + 8:handlers[0][0] + 12] != b'vide':
+            continue
+        for start, end in find_boxes(moov, (b'tkhd',), trak_start, trak_end):
+            # Ширина и высота — последние 8 байт tkhd, числа 16.16
+            width, height = struct.unpack_from('>II', moov, end - 8)
+            return width >> 16, height >> 16
+    return None, None
+
+
+def analyze(path):
+    """
+    Словарь со сведениями о файле: faststart (moov перед данными), duration
+    в секундах, width/height видеодорожки, bitrate в бит/с и size.
+    """
+    with open(path, 'rb') as f:
+        boxes = top_level_boxes(f)
+        moov = next((box for box in boxes if box.type == b'moov'), None)
+        if moov is None:
+            raise MP4Error('В файле нет атома moov')
+        moov_data = read_box(f, moov)
+    size = os.path.getsize(path)
+    first_media = next((box for box in boxes if box.type in (b'mdat', b'moof')), None)
+    duration = _movie_duration(moov_data)
+    width, height = _video_dimensions(moov_data)
+    return {
+        'faststart': first_media is None or moov.offset < first_media.offset,
+        'fragmented': any(box.type == b'moof' for box in boxes),
+        'duration': duration,
+        'width': width,
+        'height': height,
+        'bitrate': round(size * 8 / duration) if duration else None,
+        'size': size,
+    }
+
+
+def _rebuild_moov(data, start, end, shift, use_co64):
+    """
+    Собирает содержимое контейнера заново: смещения в stco/co64 сдвигаются
+    функцией shift, stco из use_co64 (по смещению в исходном moov)
+    переводятся в co64. Остальные атомы копируются как есть.
+    """
+    parts = []
+    for box_type, offset, size, header_size in iter_payload(data, start, end):
+        payload_start = offset + header_size
+        if box_type in CHUNK_OFFSET_CONTAINERS:
+            body = _rebuild_moov(data, payload_start, offset + size, shift, use_co64)
+            parts.append(box_bytes(box_type, body))
+        elif box_type in (b'stco', b'co64'):
+            version_flags, count = struct.unpack_from('>4sI', data, payload_start)
+            item = 'I' if box_type == b'stco' else 'Q'
+            offsets = struct.unpack_from('>%d%s' % (count, item), data, payload_start + 8)
+            offsets = [shift(value) for value in offsets]
+            if box_type == b'stco' and offset in use_co64:
+                box_type, item = b'co64', 'Q'
+            if item == 'I' and offsets and max(offsets) > MAX_UINT32:
+                raise OverflowError(offset)
+            body = version_flags + struct.pack('>I%d%s' % (count, item), count, *offsets)
+            parts.append(box_bytes(box_type, body))
+        else:
+            parts.append(data[offset:offset + size])
+    return b''.join(parts)
+
+
+def box_bytes(box_type, body):
+    if len(body) + 8 <= MAX_UINT32:
+        return struct.pack('>I4s', len(body) + 8, box_type) + body
+    return struct.pack('>I4sQ', 1, box_type, len(body) + 16) + body
+
+
+def copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length > 0:
+        block = src.read(min(COPY_BLOCK_SIZE, length))
+        if not block:
+            raise MP4Error('Файл обрывается при копировании данных')
+        dst.write(block)
+        length -= len(block)
+
+
+def faststart(path):
+    """
+    Переносит moov в начало файла на месте (через временный файл и os.replace).
+    Возвращает True, если файл переписан, и False, если moov уже в начале.
+    """
+    with open(path, 'rb') as src:
+        boxes = top_level_boxes(src)
+        moov = next((box for box in boxes if box.type == b'moov'), None)
+        if moov is None:
+            raise MP4Error('В файле нет атома moov')
+        if any(box.type == b'moof' for box in boxes):
+            # Во фрагментированных файлах смещения считаются от moof, а moov и так в начале
+            return False
+        media = [box for box in boxes if box.type == b'mdat']
+        if not media or moov.offset < media[0].offset:
+            return False
+        moov_data = read_box(src, moov)
+        if find_boxes(moov_data, (b'moov', b'cmov')):
+            raise MP4Error('Сжатый moov (cmov) не поддерживается')
+
+        # moov встаёт перед первым mdat, остальные атомы идут в прежнем порядке
+        insert_at = boxes.index(media[0])
+        order = boxes[:insert_at] + [moov] + [box for box in boxes[insert_at:] if box is not moov]
+
+        use_co64 = set()
+        while True:
+            # Размер нового moov не зависит от значений смещений, только от типов таблиц
+            new_moov_size = len(_rebuild_moov(moov_data, 0, len(moov_data), lambda value: 0, use_co64))
+            moves = []
+            position = 0
+            for box in order:
+                size = new_moov_size if box is moov else box.size
+                moves.append((box.offset, box.end, position - box.offset))
+                position += size
+
+            def shift(value):
+                for start, end, delta in moves:
+                    if start <= value < end:
+                        return value + delta
+                return value
+
+            try:
+                new_moov = _rebuild_moov(moov_data, 0, len(moov_data), shift, use_co64)
+            except OverflowError as exc:
+                # Смещения не влезли в 32 бита: эта таблица станет co64, размер moov изменится
+                use_co64.add(exc.args[0])
+                continue
+            break
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.faststart-', suffix='.mp4')
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                for box in order:
+                    if box is moov:
+                        dst.write(new_moov)
+                    else:
+                        copy_range(src, dst, box.offset, box.size)
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return True
+
+
+# Поля модели Trailer для сведений из analyze()
+VIDEO_FIELDS = {
+    'duration': 'video_duration',
+    'width': 'video_width',
+    'height': 'video_height',
+    'bitrate': 'video_bitrate',
+    'faststart': 'video_faststart',
+}
+
+
+def needs_faststart(f):
+    """moov в открытом файле f записан после данных и faststart() его перенесёт."""
+    boxes = top_level_boxes(f)
+    moov = next((box for box in boxes if box.type == b'moov'), None)
+    media = next((box for box in boxes if box.type in (b'mdat', b'moof')), None)
+    return moov is not None and media is not None and media.type == b'mdat' and media.offset < moov.offset
+
+
+def video_values(path):
+    """Значения полей модели по файлу (VIDEO_FIELDS); файл не меняется."""
+    info = analyze(path)
+    return {field: info[key] for key, field in VIDEO_FIELDS.items()}
@@ -0,0 +1,118 @@
+"""
+Публикация статических снимков страниц для nginx.
+
+Готовый HTML пишется в PUBLISH_ROOT, nginx отдаёт его через try_files и
+обращается к Django только если снимка нет (см. nginx.conf).
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest
+from django.urls import resolve, reverse
+
+from .cache import bump_content_version
+from .snapshot import remove_snapshot, write_snapshot
+from .utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Имя URL и путь снимка относительно PUBLISH_ROOT
+PUBLISHED_PAGES = (
+    ('index', 'index.html'),
+    ('privacy_policy', 'privacy-policy/index.html'),
+)
+
+# Правки текущей транзакции этого потока, ещё не опубликованные
+_pending = threading.local()
+
+
+def _snapshot_path(relative_path):
+    return os.path.join(settings.PUBLISH_ROOT, relative_path)
+
+
+def render_page(url_name):
+    path = reverse(url_name)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META.update(SERVER_NAME=settings.ALLOWED_HOSTS[0], SERVER_PORT='80')
+    match = resolve(path)
+    # Мимо кэша страниц: пока другой воркер пересчитывает страницу,
+    # кэш отдал бы прежнюю версию, и nginx раздавал бы её до следующей правки
+    view = getattr(match.func, 'uncached', match.func)
+    response = view(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise RuntimeError('Страница %s вернула статус %s' % (path, response.status_code))
+    return response.content
+
+
+def publish_site():
+    for url_name, relative_path in PUBLISHED_PAGES:
+        write_atomic(_snapshot_path(relative_path), render_page(url_name))
+    return [_snapshot_path(relative_path) for _, relative_path in PUBLISHED_PAGES]
+
+
+def clear_site():
+    """Удаляет снимки: nginx снова будет проксировать страницы в Django."""
+    for _, relative_path in PUBLISHED_PAGES:
+        try:
+            os.unlink(_snapshot_path(relative_path))
+        except FileNotFoundError:
+            pass
+
+
+def publish_after_change():
+    if not settings.PUBLISH_ON_SAVE:
+        return
+    try:
+        publish_site()
+    except Exception:
+        # Устаревший снимок хуже, чем рендер через Django
+        logger.exception('Не удалось опубликовать страницы, снимки удалены')
+        clear_site()
+
+
+def content_changed(*labels, modified=None):
+    """
+    Всё, что нужно после правки контента: снимок, версия моделей labels и
+    публикация страниц. Снимок пишется до повышения версии: запрос с новой
+    версией уже видит новые данные.
+    """
+    if settings.SERVE_FROM_SNAPSHOT:
+        try:
+            write_snapshot()
+        except Exception:
+            # Без снимка страницы читают БД, со старым — показывают устаревшие данные
+            logger.exception('Не удалось записать снимок контента, снимок удалён')
+            remove_snapshot()
+    bump_content_version(*labels, modified=modified)
+    publish_after_change()
+
+
+def content_changed_on_commit(*labels, modified=None):
+    """
+    content_changed() после коммита текущей транзакции, один раз на
+    транзакцию: сохранение альбома с N инлайнами — это N сигналов, а
+    снимок и страницы пишутся один раз со всеми изменёнными моделями.
+    Вне транзакции выполняется сразу.
+    """
+    batch = getattr(_pending, 'batch', None)
+    if batch is None:
+        batch = _pending.batch = {'labels': set(), 'modified': None}
+    batch['labels'].update(labels)
+    if modified is not None and (batch['modified'] is None or modified > batch['modified']):
+        batch['modified'] = modified
+    # Каждый сигнал регистрирует обработчик, но работу делает первый из них:
+    # он забирает все правки транзакции, остальные видят пустой набор.
+    # Если транзакцию откатят, её правки уйдут со следующей — лишний сброс
+    # кэша безопасен, потерянный — нет
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    batch = _pending.__dict__.pop('batch', None)
+    if batch is not None:
+        content_changed(*sorted(batch['labels']), modified=batch['modified'])
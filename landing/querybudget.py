@@ -0,0 +1,175 @@
+"""
+Бюджет запросов к БД для view и поиск N+1.
+
+Бюджет объявляется декоратором @query_budget(n) или в QUERY_BUDGETS по
+имени URL (view_name, можно с шаблонами fnmatch — так задаются бюджеты
+для changelist админки). При QUERY_BUDGET_ENABLED middleware считает
+запросы каждого HTTP-запроса и сообщает, если:
+  * запросов больше бюджета;
+  * один и тот же запрос (SQL с точностью до параметров и длины IN (...))
+    выполнен QUERY_REPEAT_THRESHOLD раз и больше — типичный N+1.
+Сообщение со стеком вызова из кода проекта пишется в лог или, при
+QUERY_BUDGET_RAISE, поднимается как QueryBudgetExceeded. Для тестов и CI —
+landing/testing.py и команда check_query_budgets.
+"""
+import contextvars
+import logging
+import os
+import re
+import traceback
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+_request_queries = contextvars.ContextVar('landing_query_budget', default=None)
+
+# Разное число параметров в IN (%s, %s, ...) — та же форма запроса
+_IN_PARAMS_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Кадры стека из этих путей не показываем: интересен код проекта, а не
+# библиотек и обёрток учёта запросов
+_SKIP_PATHS = (
+    os.sep + 'site-packages' + os.sep,
+    os.sep + 'django' + os.sep,
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics.py'),
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """
+    Объявляет наибольшее число запросов к БД за один вызов view:
+
+        @query_budget(3)
+        @condition(...)
+        def index(request): ...
+    """
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+
+    return decorator
+
+
+def query_shape(sql):
+    return _IN_PARAMS_RE.sub('IN (%s...)', sql)
+
+
+def _project_stack():
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_PROJECT_ROOT) and not any(path in frame.filename for path in _SKIP_PATHS)
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryLog:
+    """Запросы одного HTTP-запроса: число, повторы по форме и стеки."""
+
+    def __init__(self, budget=None, repeat_threshold=None):
+        self.budget = budget
+        self.repeat_threshold = repeat_threshold or settings.QUERY_REPEAT_THRESHOLD
+        self.count = 0
+        self.shapes = {}
+        self.over_budget_stack = None
+        self.repeated = {}
+
+    def record(self, sql):
+        self.count += 1
+        shape = query_shape(sql)
+        seen = self.shapes.get(shape, 0) + 1
+        self.shapes[shape] = seen
+        # Стек берём один раз, в момент нарушения: сбор стека на каждый запрос дорог
+        if seen == self.repeat_threshold:
+            self.repeated[shape] = _project_stack()
+        if self.budget is not None and self.count == self.budget + 1:
+            self.over_budget_stack = _project_stack()
+
+    def problems(self):
+        messages = []
+        if self.budget is not None and self.count > self.budget:
+            messages.append('%d запросов к БД при бюджете %d; лишний запрос из:\n%s' % (
+                self.count, self.budget, self.over_budget_stack or '',
+            ))
+        for shape, stack in self.repeated.items():
+            messages.append('Запрос выполнен %d раз (N+1?): %s\n%s' % (self.shapes[shape], shape, stack))
+        return messages
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    log = _request_queries.get()
+    if log is not None:
+        log.record(sql)
+    return execute(sql, params, many, context)
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created: учитывает запросы для QueryLog текущего запроса."""
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def view_budget(match):
+    """Бюджет view: из декоратора @query_budget или из QUERY_BUDGETS."""
+    if match is None:
+        return None
+    budget = getattr(match.func, 'query_budget', None)
+    if budget is not None:
+        return budget
+    for pattern, limit in settings.QUERY_BUDGETS.items():
+        if fnmatchcase(match.view_name, pattern):
+            return limit
+    return None
+
+
+class track_queries:
+    """Контекст, в котором запросы к БД попадают в QueryLog (см. landing/testing.py)."""
+
+    def __init__(self, budget=None, repeat_threshold=None):
+        self.log = QueryLog(budget, repeat_threshold)
+
+    def __enter__(self):
+        self.token = _request_queries.set(self.log)
+        return self.log
+
+    def __exit__(self, *exc_info):
+        _request_queries.reset(self.token)
+
+
+def report(request, log):
+    problems = log.problems()
+    if not problems:
+        return
+    message = '%s %s:\n%s' % (request.method, request.path, '\n'.join(problems))
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryBudgetMiddleware:
+    """Проверяет бюджет запросов и повторы в режиме разработки и тестов."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as log:
+            response = self.get_response(request)
+        report(request, log)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Бюджет известен после разрешения URL: со следующего запроса к БД
+        # превышение будет замечено вместе со стеком
+        log = _request_queries.get()
+        if log is not None:
+            log.budget = view_budget(request.resolver_match)
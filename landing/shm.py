@@ -0,0 +1,431 @@
+"""
+Общий для всех воркеров кэш в разделяемой памяти.
+
+SharedArena — файл фиксированного размера в закрытом каталоге сайта
+(RUN_DIR), который каждый процесс отображает в память через mmap. Файл разбит на
+слоты одинакового размера; слоты сгруппированы в наборы по WAYS штук,
+ключ попадает в набор по хэшу, внутри набора вытесняется слот, к
+которому дольше всех не обращались (LRU). Объём памяти ограничен
+размером файла и не растёт.
+
+Чтение не берёт блокировок: у каждого слота есть счётчик поколений,
+нечётный на время записи (seqlock). Если поколение изменилось, пока
+данные копировались, чтение считается промахом. Запись идёт под flock
+на файл арены и под RLock внутри процесса (см. locked()).
+
+Счётчики попаданий и промахов ведёт каждый процесс в своей строке
+таблицы воркеров, stats() суммирует их по всем строкам.
+
+MediaReader поверх арены читает горячие диапазоны медиафайлов (начало
+файла с moov и конец) блоками по block_size: первый посетитель читает
+блок с диска, остальные получают его из памяти без системных вызовов.
+Ключ блока включает inode, размер и mtime файла, поэтому после замены
+файла старые блоки больше не находятся и вытесняются как неиспользуемые.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .utils import private_directory
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: разделяемый кэш не используется
+    fcntl = None
+
+MAGIC = b'DRONSHM1'
+# magic, block_size, slot_count, ways
+HEADER = struct.Struct('>8sIII')
+HEADER_SIZE = 64
+MAX_WORKERS = 128
+# pid, hits, misses, stores
+WORKER = struct.Struct('>QQQQ')
+# поколение, группа, ключ, длина данных, время последнего обращения
+SLOT = struct.Struct('>Q8s16sIQ')
+SLOT_USED_OFFSET = 8 + 8 + 16 + 4
+WAYS = 8
+
+
+def _digest(value, size):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.blake2b(value, digest_size=size).digest()
+
+
+def _is_own_file(fd):
+    """Файл текущего пользователя, закрытый для остальных."""
+    st = os.fstat(fd)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedArena:
+
+    def __init__(self, path, size, block_size):
+        if fcntl is None:
+            raise OSError('Разделяемая арена требует fcntl.flock')
+        self.path = path
+        self.block_size = block_size
+        sets = max(size // block_size // WAYS, 1)
+        self.slot_count = sets * WAYS
+        self.sets = sets
+        self.slots_offset = HEADER_SIZE + MAX_WORKERS * WORKER.size
+        data_offset = self.slots_offset + self.slot_count * SLOT.size
+        self.data_offset = -(-data_offset // mmap.PAGESIZE) * mmap.PAGESIZE
+        self.size = self.data_offset + self.slot_count * block_size
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._worker = None
+        self._open()
+
+    def _open(self):
+        # Содержимое арены воркеры считают своим (кэш Django делает из него
+        # pickle.loads), поэтому каталог закрыт для других пользователей, ссылки
+        # не разыменовываются, а файл не нашего пользователя не используется
+        directory = private_directory(os.path.dirname(self.path))
+        header = HEADER.pack(MAGIC, self.block_size, self.slot_count, WAYS)
+        lock_fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_NOFOLLOW)
+            except OSError:
+                # Файла нет или на его месте символическая ссылка (ELOOP)
+                fd = None
+            if fd is not None and (
+                not _is_own_file(fd)
+                or os.pread(fd, HEADER.size, 0) != header
+                or os.fstat(fd).st_size != self.size
+            ):
+                os.close(fd)
+                fd = None
+            if fd is None:
+                # Новый файл, чужой файл или другие настройки. Старый файл не обрезаем,
+                # а подменяем: процессы, которые его ещё отображают, не получат SIGBUS
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.arena-')
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, header, 0)
+                os.replace(tmp_path, self.path)
+        finally:
+            os.close(lock_fd)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def locked(self):
+        """Эксклюзивная блокировка арены; вложенные вызовы в одном потоке допустимы."""
+        return _ArenaLock(self)
+
+    def _slot_offset(self, index):
+        return self.slots_offset + index * SLOT.size
+
+    def _set_slots(self, key_digest):
+        first = int.from_bytes(key_digest[:8], 'big') % self.sets * WAYS
+        return range(first, first + WAYS)
+
+    def _worker_offset(self):
+        """Строка счётчиков этого процесса, занимается при первом обращении."""
+        pid = os.getpid()
+        if self._worker is not None and self._worker[0] == pid:
+            return self._worker[1]
+        with self.locked():
+            chosen = None
+            for row in range(MAX_WORKERS):
+                offset = HEADER_SIZE + row * WORKER.size
+                row_pid = WORKER.unpack_from(self._mm, offset)[0]
+                if row_pid == pid:
+                    chosen = offset
+                    break
+                if chosen is None and (row_pid == 0 or not _pid_alive(row_pid)):
+                    chosen = offset
+            if chosen is None:
+                # Все строки заняты живыми процессами: делим первую
+                chosen = HEADER_SIZE
+            # Счётчики завершившегося процесса остаются в сумме
+            struct.pack_into('>Q', self._mm, chosen, pid)
+        self._worker = (pid, chosen)
+        return chosen
+
+    def _count(self, field):
+        offset = self._worker_offset() + 8 * field
+        with self._lock:
+            value, = struct.unpack_from('>Q', self._mm, offset)
+            struct.pack_into('>Q', self._mm, offset, value + 1)
+
+    def get(self, key, count_miss=True):
+        """Данные по ключу или None. Блокировок не берёт."""
+        key_digest = _digest(key, 16)
+        mm = self._mm
+        for index in self._set_slots(key_digest):
+            offset = self._slot_offset(index)
+            generation, _group, slot_key, length, _used = SLOT.unpack_from(mm, offset)
+            if slot_key != key_digest or generation % 2 or not generation:
+                continue
+            start = self.data_offset + index * self.block_size
+            data = mm[start:start + length]
+            if struct.unpack_from('>Q', mm, offset)[0] != generation:
+                # Слот перезаписали, пока мы копировали данные
+                break
+            struct.pack_into('>Q', mm, offset + SLOT_USED_OFFSET, time.monotonic_ns())
+            self._count(1)
+            return data
+        if count_miss:
+            self._count(2)
+        return None
+
+    def set(self, key, data, group=b''):
+        """Кладёт данные не больше block_size. Возвращает False, если они не влезают."""
+        if len(data) > self.block_size:
+            return False
+        key_digest = _digest(key, 16)
+        group_digest = _digest(group, 8)
+        mm = self._mm
+        with self.locked():
+            victim = None
+            victim_used = None
+            for index in self._set_slots(key_digest):
+                generation, _group, slot_key, _length, used = SLOT.unpack_from(mm, self._slot_offset(index))
+                if slot_key == key_digest or not generation:
+                    victim = index
+                    break
+                if victim is None or used < victim_used:
+                    victim, victim_used = index, used
+            offset = self._slot_offset(victim)
+            generation = SLOT.unpack_from(mm, offset)[0]
+            # Нечётное поколение: читатели пропускают слот, пока идёт запись
+            struct.pack_into('>Q', mm, offset, generation | 1)
+            start = self.data_offset + victim * self.block_size
+            mm[start:start + len(data)] = data
+            SLOT.pack_into(mm, offset, generation | 1, group_digest, key_digest, len(data), time.monotonic_ns())
+            # Чётное поколение — последней отдельной записью: читатель, увидевший
+            # его, видит и новые ключ с длиной
+            struct.pack_into('>Q', mm, offset, (generation | 1) + 1)
+        self._count(3)
+        return True
+
+    def delete(self, key):
+        """Удаляет запись; True, если она была."""
+        key_digest = _digest(key, 16)
+        with self.locked():
+            for index in self._set_slots(key_digest):
+                offset = self._slot_offset(index)
+                if SLOT.unpack_from(self._mm, offset)[2] == key_digest:
+                    self._free(offset)
+                    return True
+        return False
+
+    def delete_group(self, group):
+        """Удаляет все записи группы (например, все блоки одного файла)."""
+        group_digest = _digest(group, 8)
+        with self.locked():
+            for index in range(self.slot_count):
+                offset = self._slot_offset(index)
+                if SLOT.unpack_from(self._mm, offset)[1] == group_digest:
+                    self._free(offset)
+
+    def clear(self):
+        with self.locked():
+            for index in range(self.slot_count):
+                self._free(self._slot_offset(index))
+
+    def _free(self, offset):
+        generation = SLOT.unpack_from(self._mm, offset)[0]
+        if generation:
+            SLOT.pack_into(self._mm, offset, generation | 1, b'\0' * 8, b'\0' * 16, 0, 0)
+            struct.pack_into('>Q', self._mm, offset, (generation | 1) + 1)
+
+    def stats(self):
+        hits = misses = stores = 0
+        for row in range(MAX_WORKERS):
+            _pid, row_hits, row_misses, row_stores = WORKER.unpack_from(self._mm, HEADER_SIZE + row * WORKER.size)
+            hits += row_hits
+            misses += row_misses
+            stores += row_stores
+        used = 0
+        used_bytes = 0
+        for index in range(self.slot_count):
+            _generation, _group, slot_key, length, _used = SLOT.unpack_from(self._mm, self._slot_offset(index))
+            if slot_key != b'\0' * 16:
+                used += 1
+                used_bytes += length
+        return {
+            'hits': hits,
+            'misses': misses,
+            'stores': stores,
+            'slots': self.slot_count,
+            'slots_used': used,
+            'bytes_used': used_bytes,
+            'capacity': self.slot_count * self.block_size,
+        }
+
+
+class _ArenaLock:
+    """flock между процессами плюс RLock между потоками одного процесса."""
+
+    def __init__(self, arena):
+        self.arena = arena
+
+    def __enter__(self):
+        arena = self.arena
+        arena._lock.acquire()
+        if not arena._depth:
+            try:
+                fcntl.flock(arena._fd, fcntl.LOCK_EX)
+            except BaseException:
+                arena._lock.release()
+                raise
+        arena._depth += 1
+
+    def __exit__(self, *exc_info):
+        arena = self.arena
+        arena._depth -= 1
+        if not arena._depth:
+            # Повторный flock на том же дескрипторе не считается, снимаем только внешний
+            fcntl.flock(arena._fd, fcntl.LOCK_UN)
+        arena._lock.release()
+
+
+_arena_lock = threading.Lock()
+_arenas = {}
+
+
+def shared_arena(path, size, block_size):
+    """
+    Арена по пути path, одна на процесс: потоки и экземпляры бэкендов делят
+    одно отображение и одну блокировку.
+    """
+    key = (os.getpid(), path, size, block_size)
+    arena = _arenas.get(key)
+    if arena is None:
+        with _arena_lock:
+            arena = _arenas.get(key)
+            if arena is None:
+                # После fork отображения родителя не используем: у процесса своя строка счётчиков
+                for stale in [stale for stale in _arenas if stale[0] != key[0]]:
+                    del _arenas[stale]
+                arena = _arenas[key] = SharedArena(path, size, block_size)
+    return arena
+
+
+_media_arena_refused = set()
+
+
+def media_arena():
+    """
+    Арена горячих диапазонов медиа для текущего процесса или None, если кэш
+    выключен. Если каталог арены чужой (см. SharedArena._open), медиа
+    отдаются с диска: байты видео из чужого файла не отдаём никогда.
+    """
+    if not settings.MEDIA_HOT_CACHE_SIZE or fcntl is None:
+        return None
+    path = settings.MEDIA_HOT_CACHE_PATH
+    try:
+        return shared_arena(path, settings.MEDIA_HOT_CACHE_SIZE, settings.MEDIA_HOT_CACHE_BLOCK)
+    except PermissionError:
+        if path not in _media_arena_refused:
+            _media_arena_refused.add(path)
+            logger.exception('Кэш горячих диапазонов медиа выключен: каталог %s небезопасен', path)
+        return None
+
+
+class MediaReader:
+    """
+    Чтение диапазонов файла: блоки из горячих зон (начало и конец файла)
+    берутся из арены, остальное — с диска. Файл открывается, только
+    когда нужного блока нет в памяти.
+    """
+
+    def __init__(self, path, stat=None):
+        stat = stat or os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.arena = media_arena()
+        self.version = '%s:%d:%d:%d' % (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.file = None
+
+    def _file(self):
+        if self.file is None:
+            self.file = open(self.path, 'rb')
+        return self.file
+
+    def is_hot(self, offset):
+        if self.arena is None:
+            return False
+        return offset < settings.MEDIA_HOT_CACHE_HEAD or offset >= self.size - settings.MEDIA_HOT_CACHE_TAIL
+
+    def is_hot_range(self, start, length):
+        """Диапазон целиком в одной горячей зоне: его выгодно отдать из арены, а не через sendfile."""
+        if self.arena is None:
+            return False
+        return start + length <= settings.MEDIA_HOT_CACHE_HEAD or start >= self.size - settings.MEDIA_HOT_CACHE_TAIL
+
+    def _block(self, number):
+        key = '%s:%d' % (self.version, number)
+        data = self.arena.get(key)
+        if data is None:
+            block_size = self.arena.block_size
+            f = self._file()
+            f.seek(number * block_size)
+            data = f.read(block_size)
+            self.arena.set(key, data, group=self.path)
+        return data
+
+    def cached(self, offset, size):
+        """Кусок из памяти, если он в горячей зоне и уже в арене, иначе None."""
+        if not self.is_hot(offset):
+            return None
+        block_size = self.arena.block_size
+        number, skip = divmod(offset, block_size)
+        # Промах засчитает read(), который прочитает блок с диска
+        data = self.arena.get('%s:%d' % (self.version, number), count_miss=False)
+        if data is None:
+            return None
+        return data[skip:skip + min(size, block_size - skip)]
+
+    def read(self, offset, size):
+        """До size байт с offset; куски горячих зон не пересекают границу блока."""
+        if self.is_hot(offset):
+            block_size = self.arena.block_size
+            number, skip = divmod(offset, block_size)
+            return self._block(number)[skip:skip + min(size, block_size - skip)]
+        f = self._file()
+        f.seek(offset)
+        if self.arena is not None and offset < self.size - settings.MEDIA_HOT_CACHE_TAIL:
+            # Не заходим в хвостовую зону: её блоки читаются через арену
+            size = min(size, self.size - settings.MEDIA_HOT_CACHE_TAIL - offset)
+        return f.read(size)
+
+    def iter_range(self, start, length, chunk_size):
+        offset, end = start, start + length
+        while offset < end:
+            chunk = self.read(offset, min(chunk_size, end - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
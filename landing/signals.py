@@ -0,0 +1,168 @@
+import logging
+import threading
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .images import (
+    RENDITIONS_LABEL, delete_renditions, fill_image_metadata, generate_renditions, responsive_image_sources,
+)
+from .hls import trailer_hls_values
+from .models import Trailer
+from .mp4 import VIDEO_FIELDS, MP4Error, video_values
+from .publish import content_changed_on_commit
+from .singleflight import KeyLock
+from .storage import referenced_media
+
+logger = logging.getLogger(__name__)
+
+# Служебные модели: их изменения отмечаются в версии контента там, где они создаются
+INTERNAL_MODELS = ('landing.imagerendition',)
+
+
+def _is_landing_model(sender):
+    return sender._meta.app_label == 'landing' and sender._meta.label_lower not in INTERNAL_MODELS
+
+
+@receiver(post_save, dispatch_uid='landing_content_saved')
+@receiver(post_delete, dispatch_uid='landing_content_deleted')
+def invalidate_content(sender, **kwargs):
+    if not _is_landing_model(sender):
+        return
+    instance = kwargs['instance']
+    modified = None
+    if kwargs['signal'] is post_save:
+        modified = getattr(instance, 'updated_at', None) or getattr(instance, 'last_updated', None)
+    # Версию повышаем после коммита: иначе другой воркер может увидеть новую
+    # версию раньше новых данных и закэшировать под ней старые
+    content_changed_on_commit(sender._meta.label_lower, modified=modified)
+
+
+@receiver(pre_save, dispatch_uid='landing_image_metadata')
+def update_image_metadata(sender, instance, raw=False, **kwargs):
+    # Метаданные записываются той же строкой, что и сам объект
+    if raw or not _is_landing_model(sender):
+        return
+    try:
+        fill_image_metadata(instance)
+    except Exception:
+        # Битый файл не должен ломать сохранение в админке
+        logger.exception('Не удалось прочитать изображения %r', instance)
+
+
+@receiver(post_save, dispatch_uid='landing_image_renditions')
+def build_image_renditions(sender, instance, raw=False, **kwargs):
+    if raw or not _is_landing_model(sender):
+        return
+    created = 0
+    for source in responsive_image_sources(instance):
+        try:
+            created += generate_renditions(source)
+        except Exception:
+            # Битый файл не должен ломать сохранение в админке
+            logger.exception('Не удалось построить копии изображения %s', source)
+    if created:
+        content_changed_on_commit(RENDITIONS_LABEL)
+
+
+def _drop_renditions(sources):
+    # Один файл после дедупликации может быть у нескольких объектов:
+    # копии удаляем, только когда на исходник больше никто не ссылается
+    sources = set(sources)
+    if not sources:
+        return
+    removed = 0
+    for source in sources - referenced_media():
+        removed += delete_renditions(source)
+    if removed:
+        content_changed_on_commit(RENDITIONS_LABEL)
+
+
+@receiver(pre_save, dispatch_uid='landing_image_renditions_previous')
+def remember_image_sources(sender, instance, raw=False, **kwargs):
+    if raw or not _is_landing_model(sender) or not getattr(sender, 'responsive_images', ()):
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = sender._base_manager.filter(pk=instance.pk).first()
+    instance._previous_image_sources = set(responsive_image_sources(previous)) if previous else set()
+
+
+@receiver(post_save, dispatch_uid='landing_image_renditions_replaced')
+def delete_replaced_renditions(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_image_sources', None)
+    if raw or not previous:
+        return
+    del instance._previous_image_sources
+    _drop_renditions(previous - set(responsive_image_sources(instance)))
+
+
+@receiver(post_delete, dispatch_uid='landing_image_renditions_deleted')
+def delete_image_renditions(sender, instance, **kwargs):
+    if not _is_landing_model(sender):
+        return
+    _drop_renditions(responsive_image_sources(instance))
+
+
+@receiver(pre_save, sender=Trailer, dispatch_uid='landing_trailer_video_reset')
+def reset_video_metadata(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    video = instance.local_video
+    stored = {}
+    if instance.pk is not None:
+        stored = sender.objects.filter(pk=instance.pk).values('local_video', 'video_hls').first() or {}
+    if not video or not video._committed or video.name != stored.get('local_video'):
+        # Новый файл: сведения о нём посчитает prepare_trailer_video
+        for field in VIDEO_FIELDS.values():
+            setattr(instance, field, None)
+        instance.video_hls = ''
+        instance.video_hls_playlist = ''
+        if stored.get('video_hls'):
+            transaction.on_commit(partial(default_storage.delete, stored['video_hls']))
+
+
+@receiver(post_save, sender=Trailer, dispatch_uid='landing_trailer_video')
+def prepare_trailer_video(sender, instance, raw=False, **kwargs):
+    # moov уже в начале: его переносит ContentAddressedStorage до подсчёта
+    # хэша. В запросе только читаем сведения из moov, это быстро
+    if raw or not instance.local_video or instance.video_faststart is not None:
+        return
+    try:
+        values = video_values(instance.local_video.path)
+    except (OSError, MP4Error) as exc:
+        logger.warning('Не удалось обработать видео %s: %s', instance.local_video.name, exc)
+        return
+    for name, value in values.items():
+        setattr(instance, name, value)
+    sender.objects.filter(pk=instance.pk).update(**values)
+    content_changed_on_commit(sender._meta.label_lower)
+    # fMP4-копия для HLS пишется минутами и заняла бы sync-воркер до таймаута
+    # gunicorn: строим её после коммита в отдельном потоке. Если воркер
+    # перезапустят раньше, копию достроит manage.py faststart_videos
+    transaction.on_commit(partial(_start_hls_build, instance.pk, instance.local_video.name))
+
+
+def _start_hls_build(pk, video_name):
+    threading.Thread(target=_build_trailer_hls, args=(pk, video_name), name='trailer-hls', daemon=True).start()
+
+
+def _build_trailer_hls(pk, video_name):
+    lock = KeyLock('trailer-hls:%s' % video_name)
+    lock.acquire()
+    try:
+        # Под блокировкой: копию могли уже построить или заменить само видео
+        trailer = Trailer.objects.filter(pk=pk, local_video=video_name).first()
+        if trailer is None:
+            return
+        values = trailer_hls_values(trailer)
+        if values and Trailer.objects.filter(pk=pk, local_video=video_name).update(**values):
+            content_changed_on_commit(Trailer._meta.label_lower)
+    except Exception:
+        logger.exception('Не удалось построить HLS для %s', video_name)
+    finally:
+        lock.release()
+        connections.close_all()
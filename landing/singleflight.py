@@ -0,0 +1,101 @@
+"""
+Один пересчёт на ключ (single-flight) для дорогих страниц и вычислений.
+
+После правки в админке кэш страниц устаревает сразу во всех воркерах,
+и без координации каждый запрос заново выполняет запросы к базе и рендер.
+single_flight() пускает к пересчёту только одного: блокировка — flock на
+файле в SINGLE_FLIGHT_LOCK_DIR, общая для процессов и потоков. Остальные
+либо сразу получают устаревшее значение (stale-while-revalidate), либо
+ждут, пока первый закончит, и берут уже готовый результат.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: координация только между потоками процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.01
+
+_thread_locks_lock = threading.Lock()
+_thread_locks = {}
+
+
+class KeyLock:
+    """Блокировка по ключу между процессами (flock) и потоками."""
+
+    def __init__(self, key):
+        self.key = key
+        self.fd = None
+        self.thread_lock = None
+
+    def acquire(self, timeout=None):
+        """timeout=0 — попытка без ожидания; None — ждать сколько угодно."""
+        if fcntl is None:
+            with _thread_locks_lock:
+                self.thread_lock = _thread_locks.setdefault(self.key, threading.Lock())
+            if timeout == 0:
+                return self.thread_lock.acquire(blocking=False)
+            return self.thread_lock.acquire(timeout=-1 if timeout is None else timeout)
+        directory = settings.SINGLE_FLIGHT_LOCK_DIR
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.sha1(self.key.encode('utf-8')).hexdigest()[:20] + '.lock'
+        # Свой дескриптор на каждую попытку: flock различает открытия файла,
+        # поэтому блокировка работает и между потоками одного процесса
+        self.fd = os.open(os.path.join(directory, name), os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(self.fd)
+                    self.fd = None
+                    return False
+            time.sleep(POLL_INTERVAL)
+
+    def release(self):
+        if self.thread_lock is not None:
+            self.thread_lock.release()
+            self.thread_lock = None
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+def single_flight(key, compute, fresh=None, stale=None, timeout=None):
+    """
+    Результат compute(), который одновременно считается только в одном месте.
+
+    fresh() возвращает уже готовый результат или None: его проверяют после
+    ожидания, чтобы не пересчитывать то, что только что посчитал другой.
+    stale — устаревшее значение, которое отдаётся сразу, если пересчёт уже
+    идёт. Если ждать дольше timeout (SINGLE_FLIGHT_TIMEOUT), compute()
+    выполняется без блокировки: медленный пересчёт не должен стать отказом.
+    """
+    lock = KeyLock(key)
+    if not lock.acquire(timeout=0):
+        if stale is not None:
+            return stale
+        if not lock.acquire(timeout=settings.SINGLE_FLIGHT_TIMEOUT if timeout is None else timeout):
+            logger.warning('Не дождались пересчёта %s, считаем без блокировки', key)
+            return compute()
+    try:
+        # Пока мы ждали или шли к блокировке, результат мог посчитать другой
+        if fresh is not None:
+            value = fresh()
+            if value is not None:
+                return value
+        return compute()
+    finally:
+        lock.release()
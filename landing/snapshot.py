@@ -0,0 +1,148 @@
+"""
+Снимок публичного контента лендинга в одном файле (CONTENT_SNAPSHOT_FILE).
+
+После каждой правки (publish.content_changed) весь контент публичных
+страниц сериализуется в JSON: синглтоны, альбомы со скриншотами по
+порядку, скриншоты интерфейса и копии изображений. Готовые для шаблона
+поля моделей (списки тарифов, HTML) попадают в снимок вместе с ними.
+Воркеры читают файл при старте и перечитывают, когда его подменили
+(один os.stat() на обращение), а index, privacy_policy и API галереи
+берут данные только из памяти. Публичные страницы не обращаются
+к SQLite, поэтому блокировки от админки и сбои миграций посетителей не
+затрагивают. Пока снимка нет (до первой публикации), данные читаются из БД.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Меняется вместе со структурой файла: снимок старого формата не читается
+SNAPSHOT_FORMAT = 2
+
+SINGLETON_MODELS = (
+    'landing.aboutblock', 'landing.trailer', 'landing.productinfo', 'landing.versionsblock',
+    'landing.fpvmode', 'landing.purchaseoptionsblock', 'landing.footer', 'landing.privacypolicy',
+    'landing.pagesettings',
+)
+
+_snapshot_lock = threading.Lock()
+_snapshot_state = {'stat': None, 'snapshot': None}
+
+
+def _serialize(objects):
+    return serializers.serialize('python', objects)
+
+
+def build_snapshot():
+    """Словарь снимка по текущим данным из БД."""
+    from .cache import _last_modified_from_db
+    from .images import _load_renditions
+    from .models import AppScreenshot, Screenshot, ScreenshotAlbum
+
+    singletons = {label: apps.get_model(label)._load_from_db() for label in SINGLETON_MODELS}
+    screenshots = {}
+    for screenshot in Screenshot.objects.order_by('pk'):
+        screenshots.setdefault(screenshot.album_id, []).append(screenshot)
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'created': time.time(),
+        'last_modified': _last_modified_from_db(),
+        # Несохранённый синглтон (записи ещё нет) сериализуется с pk=1 и значениями по умолчанию
+        'singletons': {label: _serialize([obj])[0] for label, obj in singletons.items()},
+        'albums': [
+            {'album': _serialize([album])[0], 'screenshots': _serialize(screenshots.get(album.pk, []))}
+            for album in ScreenshotAlbum.objects.order_by('order', 'pk')
+        ],
+        'app_screenshots': _serialize(AppScreenshot.objects.order_by('order', 'pk')),
+        'renditions': _load_renditions(),
+    }
+
+
+def write_snapshot():
+    data = json.dumps(build_snapshot(), cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    write_atomic(str(settings.CONTENT_SNAPSHOT_FILE), data)
+
+
+def remove_snapshot():
+    """Удаляет снимок: публичные страницы снова читают БД."""
+    try:
+        os.unlink(str(settings.CONTENT_SNAPSHOT_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def _deserialize(records):
+    # ignorenonexistent: снимок, записанный до миграции, всё ещё читается
+    return [item.object for item in serializers.deserialize('python', records, ignorenonexistent=True)]
+
+
+class ContentSnapshot:
+    """Объекты моделей из снимка. Они не сохранены в БД и только для чтения."""
+
+    def __init__(self, data):
+        self.last_modified = data['last_modified']
+        self.singletons = {label: _deserialize([record])[0] for label, record in data['singletons'].items()}
+        self.albums = []
+        self.screenshots = {}
+        for entry in data['albums']:
+            album = _deserialize([entry['album']])[0]
+            screenshots = _deserialize(entry['screenshots'])
+            for screenshot in screenshots:
+                # Доступ к screenshot.album не должен идти в БД
+                screenshot.album = album
+            album.screenshot_count = len(screenshots)
+            album.first_screenshot = screenshots[0] if screenshots else None
+            self.albums.append(album)
+            self.screenshots[album.pk] = screenshots
+        self.app_screenshots = _deserialize(data['app_screenshots'])
+        self.renditions = data['renditions']
+
+    def singleton(self, model):
+        return self.singletons.get(model._meta.label_lower)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        logger.exception('Не удалось прочитать снимок контента %s', path)
+        return None
+    if data.get('format') != SNAPSHOT_FORMAT:
+        logger.warning('Снимок контента %s другого формата, читаем БД', path)
+        return None
+    try:
+        return ContentSnapshot(data)
+    except Exception:
+        logger.exception('Снимок контента %s повреждён, читаем БД', path)
+        return None
+
+
+def get_snapshot():
+    """ContentSnapshot из CONTENT_SNAPSHOT_FILE или None, если снимка нет или он выключен."""
+    if not settings.SERVE_FROM_SNAPSHOT:
+        return None
+    path = str(settings.CONTENT_SNAPSHOT_FILE)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # Файл подменяется через os.replace, поэтому меняется inode
+    stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    state = _snapshot_state
+    if state['stat'] == stat_key:
+        return state['snapshot']
+    with _snapshot_lock:
+        if _snapshot_state['stat'] != stat_key:
+            _snapshot_state.update(stat=stat_key, snapshot=_read_snapshot(path))
+    return _snapshot_state['snapshot']
@@ -0,0 +1,122 @@
+// Подгрузка слайдов галереи.
+// Сервер рендерит только первый слайд каждой карусели, остальные приходят
+// из JSON API (data-gallery-url) постранично, когда карусель появляется
+// рядом с экраном или пользователь листает её.
+(function () {
+    'use strict';
+
+    function createElement(tag, attrs) {
+        var element = document.createElement(tag);
+        Object.keys(attrs).forEach(function (name) {
+            if (attrs[name]) {
+                element.setAttribute(name, attrs[name]);
+            }
+        });
+        return element;
+    }
+
+    function buildSlide(item, itemClass, sizes) {
+        var slide = createElement('div', {'class': 'carousel-item'});
+        var wrapper = createElement('div', {'class': itemClass});
+        var picture = document.createElement('picture');
+        item.sources.forEach(function (source) {
+            picture.appendChild(createElement('source', {type: source.type, srcset: source.srcset, sizes: sizes}));
+        });
+        picture.appendChild(createElement('img', {
+            src: item.src,
+            srcset: item.srcset,
+            sizes: item.srcset ? sizes : '',
+            width: item.width ? String(item.width) : '',
+            height: item.height ? String(item.height) : '',
+            style: item.lqip ? 'background: ' + item.color + ' url("' + item.lqip + '") center / cover no-repeat' : '',
+            'class': 'd-block w-100',
+            alt: item.alt || '',
+            loading: 'lazy',
+            decoding: 'async'
+        }));
+        wrapper.appendChild(picture);
+        if (item.caption) {
+            var caption = createElement('div', {'class': 'screenshot-caption'});
+            var text = document.createElement('p');
+            text.textContent = item.caption;
+            caption.appendChild(text);
+            wrapper.appendChild(caption);
+        }
+        slide.appendChild(wrapper);
+        return slide;
+    }
+
+    function addIndicator(carousel, index) {
+        var album = carousel.closest('.screenshot-album');
+        var indicators = album && album.querySelector('.album-indicators');
+        if (!indicators) {
+            return;
+        }
+        indicators.appendChild(createElement('span', {
+            'class': 'indicator-dot',
+            'data-bs-target': '#' + carousel.id,
+            'data-bs-slide-to': String(index)
+        }));
+    }
+
+    function loadPage(carousel, cursor) {
+        var url = carousel.dataset.galleryUrl + '?after=' + encodeURIComponent(cursor);
+        return fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function (page) {
+                var inner = carousel.querySelector('.carousel-inner');
+                page.items.forEach(function (item) {
+                    inner.appendChild(buildSlide(item, carousel.dataset.galleryItemClass, carousel.dataset.gallerySizes));
+                    addIndicator(carousel, inner.children.length - 1);
+                });
+                if (page.next) {
+                    return loadPage(carousel, page.next);
+                }
+            });
+    }
+
+    function loadGallery(carousel) {
+        if (carousel.dataset.galleryState || Number(carousel.dataset.galleryTotal) < 2) {
+            return;
+        }
+        carousel.dataset.galleryState = 'loading';
+        loadPage(carousel, carousel.dataset.galleryAfter)
+            .then(function () {
+                carousel.dataset.galleryState = 'loaded';
+            })
+            .catch(function () {
+                // Повторим при следующем пролистывании
+                delete carousel.dataset.galleryState;
+            });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var carousels = document.querySelectorAll('[data-gallery-url]');
+        var observer = null;
+        if ('IntersectionObserver' in window) {
+            observer = new IntersectionObserver(function (entries) {
+                entries.forEach(function (entry) {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        loadGallery(entry.target);
+                    }
+                });
+            }, {rootMargin: '300px 0px'});
+        }
+        Array.prototype.forEach.call(carousels, function (carousel) {
+            carousel.addEventListener('slide.bs.carousel', function () {
+                loadGallery(carousel);
+            });
+            if (observer) {
+                observer.observe(carousel);
+            } else {
+                loadGallery(carousel);
+            }
+        });
+    });
+})();
@@ -0,0 +1,193 @@
+"""
+Хранилища файлов сайта.
+
+LandingStaticStorage — статика для collectstatic. Поверх
+ManifestStaticFilesStorage (имена с хэшем содержимого) минифицирует CSS
+и кладёт рядом с текстовыми файлами сжатые копии .gz и, если установлен
+пакет brotli, .br. nginx отдаёт их сам (gzip_static / brotli_static), а
+имена с хэшем позволяют кэшировать статику навсегда.
+
+ContentAddressedStorage — загрузки моделей лендинга. Файл получает имя
+по хэшу содержимого (<папка upload_to>/<sha256>.<расширение>), одинаковые
+загрузки дают один файл, а файл под таким именем никогда не меняется, и
+его тоже можно кэшировать навсегда. Файлы, на которые больше не ссылается
+ни одна модель, удаляет manage.py gc_media. В видео MP4 moov переносится в
+начало (faststart) до подсчёта хэша: имя соответствует итоговым байтам, и
+файл после сохранения больше не переписывается.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+from .assets import minify_css
+from .mp4 import MP4Error, faststart, needs_faststart
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # без brotli отдаём только gzip
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.xml', '.html', '.ico')
+# Файлы меньше одного пакета сжимать бессмысленно
+COMPRESS_MIN_SIZE = 1024
+
+
+class LandingStaticStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith('.css'):
+                self._rewrite(name, lambda data: minify_css(data.decode('utf-8')).encode('utf-8'))
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._compress(name)
+
+    def _rewrite(self, name, transform):
+        with self.open(name) as f:
+            data = f.read()
+        processed = transform(data)
+        if processed != data:
+            self.delete(name)
+            self._save(name, ContentFile(processed))
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            if len(compressed) >= len(data):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+
+
+# Длина имени из хэша: 128 бит хватает, чтобы не бояться совпадений
+HASH_NAME_LENGTH = 32
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{%d}\.[A-Za-z0-9]+$' % HASH_NAME_LENGTH)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+FASTSTART_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    """Имя выдано ContentAddressedStorage, то есть содержимое по нему не меняется."""
+    return bool(HASHED_NAME_RE.search(name.replace(os.sep, '/')))
+
+
+def _faststart_copy(content, extension):
+    """
+    Путь ко временной копии видео с moov в начале или None, если переносить
+    не нужно. Копию после сохранения удаляет вызывающий.
+    """
+    try:
+        content.seek(0)
+        if not needs_faststart(content):
+            return None
+    except MP4Error:
+        return None
+    finally:
+        content.seek(0)
+    fd, tmp_path = tempfile.mkstemp(suffix=extension, dir=settings.FILE_UPLOAD_TEMP_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        faststart(tmp_path)
+    except (OSError, MP4Error) as exc:
+        # Видео сохранится как есть: воспроизводится, только стартует медленнее
+        logger.warning('Не удалось перенести moov в начало %s: %s', content.name, exc)
+        os.unlink(tmp_path)
+        return None
+    return tmp_path
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        extension = os.path.splitext(name)[1].lower()
+        tmp_path = _faststart_copy(content, extension) if extension in FASTSTART_EXTENSIONS else None
+        if tmp_path is None:
+            return self._save_hashed(name, content, max_length)
+        try:
+            with open(tmp_path, 'rb') as f:
+                return self._save_hashed(name, File(f, content.name), max_length)
+        finally:
+            os.unlink(tmp_path)
+
+    def _save_hashed(self, name, content, max_length):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = posixpath.join(directory, content_hash(content)[:HASH_NAME_LENGTH] + extension)
+        if self.exists(name):
+            # Такой файл уже загружали: второй копии не будет
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+media_storage = ContentAddressedStorage()
+
+
+def get_media_storage():
+    # Для storage= в полях: миграции ссылаются на функцию, а не на объект
+    return media_storage
+
+
+def referenced_media():
+    """Имена всех файлов, на которые ссылаются поля FileField моделей проекта."""
+    names = set()
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                names.update(model._base_manager.exclude(**{field.name: ''}).exclude(
+                    **{'%s__isnull' % field.name: True},
+                ).values_list(field.name, flat=True))
+    return names
+
+
+def delete_unreferenced(names):
+    """
+    Удаляет файлы из names, если на них больше никто не ссылается:
+    при дедупликации один файл может принадлежать нескольким объектам.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return 0
+    orphans = names - referenced_media()
+    for name in orphans:
+        media_storage.delete(name)
+    return len(orphans)
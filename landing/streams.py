@@ -0,0 +1,247 @@
+"""
+Ограничение одновременных потоков видео.
+
+Каждый sync-воркер gunicorn, который отдаёт видео, занят до конца
+передачи. Поэтому отдачи видео учитываются в общей для всех воркеров
+таблице (файл MEDIA_STREAM_TABLE под flock):
+  * потоков не больше MEDIA_STREAM_MAX — остальные воркеры всегда
+    свободны для страниц; сверх лимита — 503 с Retry-After;
+  * с одного адреса не больше MEDIA_STREAM_MAX_PER_CLIENT потоков,
+    сверх лимита — 429 с Retry-After. Когда файл отдаёт nginx
+    (X-Accel-Redirect), тот же лимит действует в nginx: nginx_limits()
+    пишет его в файл, подключаемый в nginx.conf;
+  * MEDIA_STREAM_RATE ограничивает скорость одного потока (байт/с).
+
+Место в таблице держится, пока ответ не закрыт сервером. Ответы без
+тела (304, 416, HEAD, X-Accel-Redirect) освобождают его сразу: с
+X-Accel-Redirect файл передаёт nginx, и воркер уже свободен. Записи
+завершившихся процессов и слишком старые записи не учитываются.
+Таблица берётся под блокирующий flock, поэтому под ASGI и занимают, и
+освобождают место в потоке, а не в цикле событий.
+"""
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows: локальная разработка, лимиты не применяются
+    fcntl = None
+
+# pid, хэш адреса клиента, время начала
+ROW = struct.Struct('>Q8sd')
+TABLE_ROWS = 256
+# Запись старше этого считается потерянной (процесс не закрыл ответ)
+STALE_AFTER = 3600
+
+_lock = threading.Lock()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def client_address(request):
+    header = settings.MEDIA_STREAM_CLIENT_HEADER
+    address = request.META.get(header) if header else None
+    return address or request.META.get('REMOTE_ADDR') or ''
+
+
+class _Table:
+    """Файл таблицы под эксклюзивной блокировкой (и между потоками процесса)."""
+
+    def __enter__(self):
+        _lock.acquire()
+        try:
+            path = settings.MEDIA_STREAM_TABLE
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        except BaseException:
+            _lock.release()
+            raise
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            data = os.pread(self.fd, ROW.size * TABLE_ROWS, 0).ljust(ROW.size * TABLE_ROWS, b'\0')
+        except BaseException:
+            self.__exit__()
+            raise
+        self.rows = [ROW.unpack_from(data, i * ROW.size) for i in range(TABLE_ROWS)]
+        return self
+
+    def write(self, index, row):
+        os.pwrite(self.fd, ROW.pack(*row), index * ROW.size)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        _lock.release()
+
+
+EMPTY_ROW = (0, b'\0' * 8, 0.0)
+
+
+class StreamTicket:
+
+    def __init__(self, index, row):
+        self.index = index
+        self.row = row
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        with _Table() as table:
+            # Строку могли уже очистить как устаревшую и отдать другому потоку
+            if table.rows[self.index] == self.row:
+                table.write(self.index, EMPTY_ROW)
+
+    async def _release_after(self, chunks):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # Конец отдачи или обрыв соединения: при обрыве Django под ASGI
+            # не вызывает close() ответа, а итератор закрывает всегда
+            await asyncio.to_thread(self.release)
+
+    def attach(self, response):
+        """
+        Держит место до конца отдачи и ограничивает скорость тела. Ответ без
+        тела освобождает место сразу, поэтому асинхронные view передают сюда
+        только потоковые ответы (см. limit_streams).
+        """
+        if not response.streaming:
+            self.release()
+            return response
+        rate = settings.MEDIA_STREAM_RATE
+        if rate:
+            if response.is_async:
+                response.streaming_content = _athrottle(response.streaming_content, rate)
+            else:
+                # FileResponse при этом отдаётся блоками, а не через sendfile
+                response.streaming_content = _throttle(response.streaming_content, rate)
+        if response.is_async:
+            response.streaming_content = self._release_after(response.streaming_content)
+        # close() ответа Django вызывает в потоке и под ASGI; повторное освобождение ничего не делает
+        response._resource_closers.append(self.release)
+        return response
+
+
+def acquire(client):
+    """StreamTicket или ответ 429/503, если свободных мест нет."""
+    client_hash = hashlib.blake2b(client.encode('utf-8'), digest_size=8).digest()
+    now = time.time()
+    with _Table() as table:
+        active = 0
+        from_client = 0
+        free = None
+        for index, (pid, row_client, started) in enumerate(table.rows):
+            if pid and (now - started > STALE_AFTER or not _pid_alive(pid)):
+                table.write(index, EMPTY_ROW)
+                pid = 0
+            if not pid:
+                if free is None:
+                    free = index
+                continue
+            active += 1
+            if row_client == client_hash:
+                from_client += 1
+        if from_client >= settings.MEDIA_STREAM_MAX_PER_CLIENT:
+            return _retry_later(429, 'Слишком много одновременных загрузок')
+        if active >= settings.MEDIA_STREAM_MAX or free is None:
+            return _retry_later(503, 'Сервер занят, повторите позже')
+        row = (os.getpid(), client_hash, now)
+        table.write(free, row)
+    return StreamTicket(free, row)
+
+
+def nginx_limits():
+    """Лимит на клиента для location /protected-media/ в nginx (include)."""
+    return (
+        '# Создано manage.py nginx_stream_limits из MEDIA_STREAM_MAX_PER_CLIENT, не редактируйте\n'
+        'limit_conn media_per_client %d;\n'
+        'limit_conn_status 429;\n'
+    ) % settings.MEDIA_STREAM_MAX_PER_CLIENT
+
+
+def _retry_later(status, message):
+    response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(settings.MEDIA_STREAM_RETRY_AFTER)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _throttle(chunks, rate):
+    started = time.monotonic()
+    sent = 0
+    for chunk in chunks:
+        yield chunk
+        sent += len(chunk)
+        delay = sent / rate - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+async def _athrottle(chunks, rate):
+    started = time.monotonic()
+    sent = 0
+    async for chunk in chunks:
+        yield chunk
+        sent += len(chunk)
+        delay = sent / rate - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def limit_streams(view_func):
+    """Декоратор view, отдающих видео: учитывает поток в общей таблице."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if fcntl is None:
+                return await view_func(request, *args, **kwargs)
+            ticket = await asyncio.to_thread(acquire, client_address(request))
+            if isinstance(ticket, HttpResponse):
+                return ticket
+            try:
+                response = await view_func(request, *args, **kwargs)
+            except BaseException:
+                await asyncio.to_thread(ticket.release)
+                raise
+            if not response.streaming:
+                await asyncio.to_thread(ticket.release)
+                return response
+            return ticket.attach(response)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if fcntl is None:
+            return view_func(request, *args, **kwargs)
+        ticket = acquire(client_address(request))
+        if isinstance(ticket, HttpResponse):
+            return ticket
+        try:
+            response = view_func(request, *args, **kwargs)
+        except BaseException:
+            ticket.release()
+            raise
+        return ticket.attach(response)
+
+    return wrapper
@@ -0,0 +1,41 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from landing.assets import critical_css, vendor_static
+
+register = template.Library()
+
+
+@register.simple_tag
+def inline_critical_css(path):
+    """<style> с правилами первого экрана из статического CSS-файла."""
+    css = critical_css(path)
+    if not css:
+        return ''
+    # Закрывающий тег внутри CSS (например, в data URI) не должен завершить <style>
+    return mark_safe('<style>%s</style>' % css.replace('</', '<\\/'))
+
+
+@register.simple_tag
+def async_stylesheet(path):
+    """Подключает CSS без блокировки отрисовки: preload и переключение в stylesheet по onload."""
+    url = static(path)
+    return format_html(
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        url, url,
+    )
+
+
+@register.simple_tag
+def vendor_stylesheet(name):
+    """<link> на локальную сборку стороннего CSS из VENDOR_ASSETS или на CDN."""
+    return format_html('<link rel="stylesheet" href="{}">', vendor_static(name))
+
+
+@register.simple_tag
+def vendor_script(name):
+    """<script> с локальной сборкой стороннего JS из VENDOR_ASSETS или с CDN."""
+    return format_html('<script src="{}"></script>', vendor_static(name))
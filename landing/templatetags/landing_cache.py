@@ -0,0 +1,51 @@
+from django import template
+from django.core.cache import cache
+
+from landing import metrics
+from landing.cache import section_key
+
+register = template.Library()
+
+
+class SectionNode(template.Node):
+
+    def __init__(self, nodelist, name, labels):
+        self.nodelist = nodelist
+        self.name = name
+        self.labels = labels
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        key = section_key(name, [label.resolve(context) for label in self.labels])
+        content = cache.get(key)
+        if content is None:
+            metrics.inc('dron_section_cache_total', (name, 'miss'))
+            content = self.nodelist.render(context)
+            cache.set(key, content, None)
+        else:
+            metrics.inc('dron_section_cache_total', (name, 'hit'))
+        return content
+
+
+@register.tag
+def cache_section(parser, token):
+    """
+    Кэширует секцию страницы до изменения моделей, от которых она зависит:
+    {% cache_section 'footer' 'landing.footer' %}...{% endcache_section %}
+    Метки — label_lower моделей (версии из CONTENT_VERSION_FILE). При правке
+    одной модели перерисовываются только её секции, остальные берутся из кэша.
+    Данные для секции в контексте должны быть ленивыми, иначе запросы к БД
+    выполнятся и при попадании в кэш.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            "'%s' принимает имя секции и хотя бы одну метку модели" % bits[0]
+        )
+    nodelist = parser.parse(('endcache_section',))
+    parser.delete_first_token()
+    return SectionNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,108 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from landing.images import FORMAT_MIME_TYPES, metadata_for, renditions_for
+
+register = template.Library()
+
+
+def _srcset(renditions):
+    return ', '.join('%s %dw' % (url, width) for width, url in renditions)
+
+
+def _placeholder_style(metadata):
+    # Заглушка видна, пока картинка не загрузилась, и закрывается ею
+    return 'background: %s url("%s") center / cover no-repeat' % (metadata['color'], metadata['lqip'])
+
+
+@register.simple_tag
+def picture(image, sizes='100vw', loading=None, **attrs):
+    """
+    <picture> с WebP/JPEG копиями изображения:
+    {% picture screenshot.image sizes="(min-width: 992px) 66vw, 100vw" loading="lazy" class="d-block w-100" alt=screenshot.caption %}
+    Если копий ещё нет, выводит обычный <img> с оригиналом. Если посчитаны
+    метаданные, добавляет width/height и размытую заглушку.
+    """
+    if not image:
+        return ''
+    renditions = renditions_for(image.name)
+    jpeg = renditions.get('jpeg')
+    img_attrs = dict(attrs)
+    if jpeg:
+        img_attrs.update(src=jpeg[-1][1], srcset=_srcset(jpeg), sizes=sizes)
+    else:
+        img_attrs['src'] = image.url
+    metadata = metadata_for(image)
+    if metadata:
+        # Размеры резервируют место под картинку и убирают сдвиги вёрстки
+        img_attrs.update(width=metadata['width'], height=metadata['height'])
+        style = img_attrs.get('style')
+        img_attrs['style'] = '%s; %s' % (_placeholder_style(metadata), style) if style else _placeholder_style(metadata)
+    if loading:
+        img_attrs['loading'] = loading
+    img_attrs.setdefault('decoding', 'async')
+    img = format_html('<img{}>', format_html_join('', ' {}="{}"', img_attrs.items()))
+    if not renditions.get('webp'):
+        return img
+    return format_html(
+        '<picture><source type="{}" srcset="{}" sizes="{}">{}</picture>',
+        FORMAT_MIME_TYPES['webp'], _srcset(renditions['webp']), sizes, img,
+    )
+
+
+@register.simple_tag
+def hero_preload(image, sizes='100vw'):
+    """
+    <link rel="preload"> для фона первого экрана: браузер начинает грузить
+    его вместе с CSS, не дожидаясь разбора стилей.
+    """
+    if not image:
+        return ''
+    renditions = renditions_for(image.name)
+    for ext in ('webp', 'jpeg'):
+        if renditions.get(ext):
+            return format_html(
+                '<link rel="preload" as="image" type="{}" imagesrcset="{}" imagesizes="{}" fetchpriority="high">',
+                FORMAT_MIME_TYPES[ext], _srcset(renditions[ext]), sizes,
+            )
+    return format_html('<link rel="preload" as="image" href="{}" fetchpriority="high">', image.url)
+
+
+@register.simple_tag
+def responsive_background(selector, image):
+    """
+    <style> с фоном selector: на узких экранах берётся копия подходящей ширины,
+    браузеры с поддержкой WebP получают WebP через image-set(). Под фоном
+    лежат основной цвет и размытое превью, пока полноразмерный фон грузится.
+    """
+    if not image:
+        return ''
+    metadata = metadata_for(image)
+    placeholder = ''
+    if metadata:
+        placeholder = format_html(', url("{}")', metadata['lqip'])
+    renditions = renditions_for(image.name)
+    rules = []
+    if metadata:
+        rules.append(format_html('{} {{ background-color: {}; }}', selector, metadata['color']))
+    jpeg = renditions.get('jpeg')
+    if not jpeg:
+        rules.append(format_html('{} {{ background-image: url("{}"){}; }}', selector, image.url, placeholder))
+        return format_html('<style>{}</style>', format_html_join('\n', '{}', ((rule,) for rule in rules)))
+    webp = dict(renditions.get('webp', ()))
+    sized_rules = []
+    for i, (width, jpeg_url) in enumerate(jpeg):
+        declarations = format_html('background-image: url("{}"){};', jpeg_url, placeholder)
+        if width in webp:
+            declarations += format_html(
+                ' background-image: image-set(url("{}") type("image/webp"), url("{}") type("image/jpeg")){};',
+                webp[width], jpeg_url, placeholder,
+            )
+        rule = format_html('{} {{ {} }}', selector, declarations)
+        if i < len(jpeg) - 1:
+            # Копия подходит экранам не шире себя; самая большая — без ограничения
+            rule = format_html('@media (max-width: {}px) {{ {} }}', width, rule)
+        sized_rules.append(rule)
+    # Большие ширины первыми, чтобы более узкие media-запросы их перекрывали
+    rules.extend(reversed(sized_rules))
+    return format_html('<style>{}</style>', format_html_join('\n', '{}', ((rule,) for rule in rules)))
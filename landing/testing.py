@@ -0,0 +1,247 @@
+"""
+Помощники для тестов и CI: служебные файлы сайта во временном каталоге и
+бюджеты запросов к БД страниц лендинга и админки.
+
+    class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+        def test_pages(self):
+            self.assertPageBudgets()
+
+Страницы проверяются без кэшей (DummyCache, без снимка контента), на
+нескольких альбомах и скриншотах: N+1 проявляется как повтор запроса.
+Бюджет берётся из @query_budget view или QUERY_BUDGETS. Проверка для CI —
+landing/tests/test_query_budgets.py (manage.py test landing или команда
+check_query_budgets, которая запускает только её).
+"""
+import io
+import os
+import shutil
+import struct
+import tempfile
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from PIL import Image
+
+from .models import AppScreenshot, Screenshot, ScreenshotAlbum
+from .mp4 import box_bytes
+from .querybudget import track_queries, view_budget
+
+# Настройки, при которых измеряется полный рендер страниц
+BUDGET_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    'SERVE_FROM_SNAPSHOT': False,
+    'PUBLISH_ON_SAVE': False,
+    'MEDIA_HOT_CACHE_SIZE': 0,
+    'MEDIA_OFFLOAD': None,
+    'QUERY_BUDGET_ENABLED': False,
+}
+SAMPLE_VIDEO = 'budget-check.mp4'
+
+
+def isolated_settings(directory):
+    """
+    Настройки, при которых служебные файлы сайта (версии и снимок контента,
+    опубликованные страницы, кэш, блокировки, метрики) и медиа лежат в
+    directory, а не в рабочих каталогах сайта.
+    """
+    return {
+        'MEDIA_ROOT': os.path.join(directory, 'media'),
+        'VAR_DIR': directory,
+        'CONTENT_VERSION_FILE': os.path.join(directory, 'content_version.json'),
+        'CONTENT_SNAPSHOT_FILE': os.path.join(directory, 'content_snapshot.json'),
+        'PUBLISH_ROOT': os.path.join(directory, 'published'),
+        'SINGLE_FLIGHT_LOCK_DIR': os.path.join(directory, 'locks'),
+        'METRICS_DIR': os.path.join(directory, 'metrics'),
+        'MEDIA_HOT_CACHE_PATH': os.path.join(directory, 'media.arena'),
+        'MEDIA_STREAM_TABLE': os.path.join(directory, 'media_streams.table'),
+        'CACHES': {'default': dict(settings.CACHES['default'], LOCATION=os.path.join(directory, 'cache.arena'))},
+    }
+
+
+class IsolatedSiteMixin:
+    """
+    Для тестов: каждый тест со своим временным каталогом служебных файлов
+    (isolated_settings) и настройками site_settings поверх. Тесты идут с
+    DEBUG = False, а манифеста collectstatic может не быть, поэтому
+    статика — из обычного StaticFilesStorage.
+    """
+    site_settings = {}
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='landing-test-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overrides = override_settings(**dict(
+            isolated_settings(self.directory),
+            STORAGES=dict(settings.STORAGES, staticfiles={
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+            }),
+            **self.site_settings,
+        ))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+def _full(box_type, body, version=0):
+    return box_bytes(box_type, struct.pack('>I', version << 24) + body)
+
+
+def _video_trak(chunk_offsets, sizes, timescale, delta, ctts, ctts_version, width, height):
+    count = len(sizes)
+    tkhd = _full(b'tkhd', struct.pack('>IIIII8xHHHH36xII', 0, 0, 1, 0, count * delta, 0, 0, 0, 0,
+                                      width << 16, height << 16))
+    mdhd = _full(b'mdhd', struct.pack('>IIIIHH', 0, 0, timescale, count * delta, 0x55C4, 0))
+    hdlr = _full(b'hdlr', struct.pack('>I4s12s', 0, b'vide', b'') + b'Video\0')
+    tables = [
+        _full(b'stsd', struct.pack('>I', 1) + box_bytes(b'avc1', b'\0' * 78)),
+        _full(b'stts', struct.pack('>III', 1, count, delta)),
+        # Один сэмпл в чанке: смещение каждого сэмпла — в stco
+        _full(b'stsc', struct.pack('>IIII', 1, 1, 1, 1)),
+        _full(b'stsz', struct.pack('>II%dI' % count, 0, count, *sizes)),
+        _full(b'stco', struct.pack('>I%dI' % count, count, *chunk_offsets)),
+    ]
+    if ctts is not None:
+        item = 'i' if ctts_version else 'I'
+        tables.append(_full(b'ctts', struct.pack('>I', count) + b''.join(
+            struct.pack('>I' + item, 1, offset) for offset in ctts
+        ), ctts_version))
+    stbl = box_bytes(b'stbl', b''.join(tables))
+    minf = box_bytes(b'minf', box_bytes(b'vmhd', b'\0' * 12) + stbl)
+    return box_bytes(b'trak', tkhd + box_bytes(b'mdia', mdhd + hdlr + minf))
+
+
+def write_mp4(path, samples, moov_first=False, timescale=1000, delta=40, ctts=None, ctts_version=0,
+              width=640, height=360):
+    """
+    Минимальный MP4 с одной видеодорожкой для тестов разбора: ftyp, mdat с
+    сэмплами samples (bytes, по одному в чанке) и moov — по умолчанию после
+    mdat, как пишут камеры и редакторы. ctts — смещения времени показа
+    сэмплов. Возвращает смещения сэмплов в файле.
+    """
+    ftyp = box_bytes(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2avc1mp41')
+    mdat = box_bytes(b'mdat', b''.join(samples))
+
+    def moov(data_start):
+        offsets = []
+        position = data_start
+        for sample in samples:
+            offsets.append(position)
+            position += len(sample)
+        mvhd = _full(b'mvhd', struct.pack('>IIII', 0, 0, timescale, len(samples) * delta) + b'\0' * 80)
+        trak = _video_trak(offsets, [len(sample) for sample in samples], timescale, delta, ctts, ctts_version,
+                           width, height)
+        return box_bytes(b'moov', mvhd + trak), offsets
+
+    if moov_first:
+        # Размер moov не зависит от значений смещений
+        moov_size = len(moov(0)[0])
+        data, offsets = moov(len(ftyp) + moov_size + 8)
+        content = ftyp + data + mdat
+    else:
+        data, offsets = moov(len(ftyp) + 8)
+        content = ftyp + mdat + data
+    with open(path, 'wb') as f:
+        f.write(content)
+    return offsets
+
+
+def image_file(name='image.png', size=(640, 360), color=(200, 40, 40)):
+    """Однотонная PNG-картинка для загрузки в ImageField."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def create_sample_content(media_root, albums=3, screenshots=4):
+    """Альбомы, скриншоты и видео для проверки; bulk_create не вызывает сигналы."""
+    created = ScreenshotAlbum.objects.bulk_create(
+        ScreenshotAlbum(title='Проверка %d' % number, order=number) for number in range(albums)
+    )
+    Screenshot.objects.bulk_create(
+        Screenshot(album=album, image='screenshots/check-%d.png' % number, caption='Скриншот %d' % number)
+        for album in created for number in range(screenshots)
+    )
+    AppScreenshot.objects.bulk_create(
+        AppScreenshot(title='Экран %d' % number, image='app_screenshots/check-%d.png' % number, order=number)
+        for number in range(screenshots)
+    )
+    os.makedirs(os.path.join(media_root, 'videos'), exist_ok=True)
+    with open(os.path.join(media_root, 'videos', SAMPLE_VIDEO), 'wb') as f:
+        f.write(b'\0' * 4096)
+    return created
+
+
+def budget_pages():
+    """Адреса с бюджетами: публичные страницы, отдача видео и changelist админки."""
+    album = ScreenshotAlbum.objects.order_by('pk').first()
+    paths = [
+        reverse('index'),
+        reverse('privacy_policy'),
+        reverse('stream_video', args=[SAMPLE_VIDEO]),
+        reverse('app_screenshots'),
+    ]
+    if album is not None:
+        paths.append(reverse('album_screenshots', args=[album.pk]))
+    for model in admin.site._registry:
+        if model._meta.app_label == 'landing':
+            paths.append(reverse('admin:landing_%s_changelist' % model._meta.model_name))
+    return paths
+
+
+def measure(client, path, budget=None):
+    """QueryLog полного запроса path с бюджетом его view; процесс заранее прогрет."""
+    # Первый запрос заполняет кэши процесса (синглтоны, права), которые
+    # переживают правки других моделей; бюджет — для последующих
+    _consume(client.get(path))
+    with track_queries(view_budget(resolve(path)) if budget is None else budget) as log:
+        response = client.get(path)
+        _consume(response)
+    return response, log
+
+
+def _consume(response):
+    # Как WSGI-сервер: тело файла читается до конца, после чего тестовый
+    # клиент сам закрывает ответ (и освобождает место в таблице потоков)
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+
+def check_query_budgets(client):
+    """Список нарушений (строки) для всех budget_pages(); пустой — всё в бюджете."""
+    problems = []
+    for path in budget_pages():
+        response, log = measure(client, path)
+        if response.status_code >= 400:
+            problems.append('%s: статус %d' % (path, response.status_code))
+        if log.budget is None:
+            problems.append('%s: бюджет запросов не задан' % path)
+        problems.extend('%s: %s' % (path, problem) for problem in log.problems())
+    return problems
+
+
+def budget_user():
+    User = get_user_model()
+    return User.objects.create_superuser('budget-check', 'budget-check@example.com', None)
+
+
+class QueryBudgetTestMixin:
+    """Для django.test.TestCase: assertQueryBudget и проверка всех страниц."""
+
+    def assertQueryBudget(self, path, budget=None):
+        response, log = measure(self.client, path, budget)
+        problems = log.problems()
+        if problems:
+            self.fail('%s:\n%s' % (path, '\n'.join(problems)))
+        return response
+
+    def assertPageBudgets(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, **BUDGET_SETTINGS):
+            create_sample_content(media_root)
+            self.client.force_login(budget_user())
+            problems = check_query_budgets(self.client)
+        if problems:
+            self.fail('\n'.join(problems))
@@ -0,0 +1,271 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from unittest import skipIf
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.test import SimpleTestCase
+
+from landing.cache_backend import SharedMemoryCache
+from landing.shm import fcntl
+
+BLOCK_SIZE = 4096
+
+
+class Unpicklable:
+    def __getstate__(self):
+        raise pickle.PickleError()
+
+
+def _set_in_child(location, params):
+    SharedMemoryCache(location, params).set('from-child', 'значение')
+
+
+@skipIf(fcntl is None, 'Разделяемая арена требует fcntl')
+class SharedMemoryCacheTests(SimpleTestCase):
+    """Контракт бэкенда кэша Django, по образцу BaseCacheTests из тестов Django."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-cache-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.location = os.path.join(self.directory, 'cache.arena')
+        self.params = {'OPTIONS': {'SIZE': 256 * BLOCK_SIZE, 'BLOCK_SIZE': BLOCK_SIZE}}
+        self.cache = self.make_cache()
+
+    def make_cache(self, **params):
+        return SharedMemoryCache(self.location, dict(self.params, **params))
+
+    def test_simple(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_default_used_when_none_is_set(self):
+        self.cache.set('key_default_none', None)
+        self.assertIsNone(self.cache.get('key_default_none', default='default'))
+
+    def test_non_existent(self):
+        self.assertIsNone(self.cache.get('does_not_exist'))
+        self.assertEqual(self.cache.get('does_not_exist', 'bang!'), 'bang!')
+
+    def test_add(self):
+        self.assertIs(self.cache.add('addkey1', 'value'), True)
+        self.assertIs(self.cache.add('addkey1', 'newvalue'), False)
+        self.assertEqual(self.cache.get('addkey1'), 'value')
+
+    def test_get_many(self):
+        self.cache.set_many({'a': 'a', 'b': 'b', 'c': 'c', 'd': 'd'})
+        self.assertEqual(self.cache.get_many(['a', 'c', 'd']), {'a': 'a', 'c': 'c', 'd': 'd'})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'e']), {'a': 'a', 'b': 'b'})
+        self.assertEqual(self.cache.get_many(iter(['a'])), {'a': 'a'})
+
+    def test_delete(self):
+        self.cache.set_many({'key1': 'spam', 'key2': 'eggs'})
+        self.assertIs(self.cache.delete('key1'), True)
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertEqual(self.cache.get('key2'), 'eggs')
+        self.assertIs(self.cache.delete('key1'), False)
+
+    def test_delete_many(self):
+        self.cache.set_many({'key1': 'spam', 'key2': 'eggs', 'key3': 'ham'})
+        self.cache.delete_many(['key1', 'key2'])
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertIsNone(self.cache.get('key2'))
+        self.assertEqual(self.cache.get('key3'), 'ham')
+
+    def test_has_key(self):
+        self.cache.set('hello1', 'goodbye1')
+        self.assertIs(self.cache.has_key('hello1'), True)
+        self.assertIs(self.cache.has_key('goodbye1'), False)
+        self.cache.set('no_expiry', 'here', None)
+        self.assertIs(self.cache.has_key('no_expiry'), True)
+        self.cache.set('null', None)
+        self.assertIs(self.cache.has_key('null'), True)
+
+    def test_in(self):
+        self.cache.set('hello2', 'goodbye2')
+        self.assertIn('hello2', self.cache)
+        self.assertNotIn('goodbye2', self.cache)
+
+    def test_incr_decr(self):
+        self.cache.set('answer', 41)
+        self.assertEqual(self.cache.incr('answer'), 42)
+        self.assertEqual(self.cache.get('answer'), 42)
+        self.assertEqual(self.cache.incr('answer', 10), 52)
+        self.assertEqual(self.cache.incr('answer', -10), 42)
+        self.assertEqual(self.cache.decr('answer'), 41)
+        self.assertEqual(self.cache.decr('answer', 10), 31)
+        with self.assertRaises(ValueError):
+            self.cache.incr('does_not_exist')
+        with self.assertRaises(ValueError):
+            self.cache.decr('does_not_exist')
+
+    def test_incr_keeps_timeout(self):
+        self.cache.set('expiring', 1, 1)
+        self.cache.incr('expiring')
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('expiring'))
+
+    def test_data_types(self):
+        stuff = {
+            'string': 'это строка',
+            'int': 42,
+            'bytes': b'\x00\xff' * 10,
+            'list': [1, 2, 3, 4],
+            'tuple': (1, 2, 3, 4),
+            'dict': {'A': 1, 'B': 2},
+        }
+        self.cache.set('stuff', stuff)
+        self.assertEqual(self.cache.get('stuff'), stuff)
+
+    def test_unicode_key(self):
+        self.cache.set('ключ-ü-€', 'значение')
+        self.assertEqual(self.cache.get('ключ-ü-€'), 'значение')
+
+    def test_expiration(self):
+        self.cache.set('expire1', 'very quickly', 1)
+        self.cache.set('expire2', 'very quickly', 1)
+        self.cache.set('expire3', 'very quickly', 1)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('expire1'))
+        self.assertIs(self.cache.add('expire2', 'newvalue'), True)
+        self.assertEqual(self.cache.get('expire2'), 'newvalue')
+        self.assertIs(self.cache.has_key('expire3'), False)
+
+    def test_touch(self):
+        self.cache.set('expire1', 'very quickly', timeout=1)
+        self.assertIs(self.cache.touch('expire1', timeout=4), True)
+        time.sleep(1.1)
+        self.assertIs(self.cache.has_key('expire1'), True)
+        self.cache.set('expire2', 'very quickly', timeout=1)
+        self.assertIs(self.cache.touch('expire2', timeout=None), True)
+        time.sleep(1.1)
+        self.assertIs(self.cache.has_key('expire2'), True)
+        self.assertIs(self.cache.touch('nonexistent'), False)
+        self.cache.set('expire3', 'value')
+        self.assertIs(self.cache.touch('expire3', timeout=0), True)
+        self.assertIs(self.cache.has_key('expire3'), False)
+
+    def test_forever_timeout(self):
+        self.cache.set('key1', 'eggs', None)
+        self.assertEqual(self.cache.get('key1'), 'eggs')
+        self.assertIs(self.cache.add('key2', 'ham', None), True)
+        self.assertIs(self.cache.add('key1', 'new eggs', None), False)
+        self.cache.set_many({'key3': 'sausage', 'key4': 'lobster bisque'}, None)
+        self.assertEqual(self.cache.get('key4'), 'lobster bisque')
+
+    def test_zero_and_negative_timeout(self):
+        self.cache.set('key1', 'eggs', 0)
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertIs(self.cache.add('key2', 'ham', 0), True)
+        self.assertIsNone(self.cache.get('key2'))
+        self.cache.set('key3', 'eggs', -1)
+        self.assertIsNone(self.cache.get('key3'))
+
+    def test_float_timeout(self):
+        self.cache.set('key1', 'spam', 100.2)
+        self.assertEqual(self.cache.get('key1'), 'spam')
+
+    def test_default_timeout_option(self):
+        cache = self.make_cache(TIMEOUT=1)
+        cache.set('key', 'value', DEFAULT_TIMEOUT)
+        time.sleep(1.1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_set_many_returns_empty_list_on_success(self):
+        self.assertEqual(self.cache.set_many({'key1': 'spam', 'key2': 'eggs'}), [])
+
+    def test_set_many_returns_failing_keys(self):
+        huge = os.urandom(200 * BLOCK_SIZE)
+        self.assertEqual(self.cache.set_many({'small': 'ok', 'huge': huge}), ['huge'])
+        self.assertEqual(self.cache.get('small'), 'ok')
+        self.assertIsNone(self.cache.get('huge'))
+
+    def test_set_fail_on_pickleerror(self):
+        with self.assertRaises(pickle.PickleError):
+            self.cache.set('unpicklable', Unpicklable())
+
+    def test_clear(self):
+        self.cache.set_many({'key1': 'spam', 'key2': 'eggs'})
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertIsNone(self.cache.get('key2'))
+
+    def test_get_or_set(self):
+        self.assertEqual(self.cache.get_or_set('projector', 42), 42)
+        self.assertEqual(self.cache.get('projector'), 42)
+        self.assertEqual(self.cache.get_or_set('projector', 43), 42)
+        self.assertEqual(self.cache.get_or_set('callable', lambda: 'value'), 'value')
+
+    def test_versioning(self):
+        self.cache.set('answer', 42, version=1)
+        self.cache.set('answer', 37, version=2)
+        self.assertEqual(self.cache.get('answer', version=1), 42)
+        self.assertEqual(self.cache.get('answer', version=2), 37)
+        self.assertEqual(self.cache.incr_version('answer', version=2), 3)
+        self.assertIsNone(self.cache.get('answer', version=2))
+        self.assertEqual(self.cache.get('answer', version=3), 37)
+
+    def test_key_prefix(self):
+        prefixed = self.make_cache(KEY_PREFIX='other')
+        self.cache.set('somekey', 'value')
+        self.assertIsNone(prefixed.get('somekey'))
+        prefixed.set('somekey', 'prefixed')
+        self.assertEqual(self.cache.get('somekey'), 'value')
+
+    def test_chunked_value(self):
+        # Значение на несколько слотов делится на куски с общим маркером
+        value = os.urandom(10 * BLOCK_SIZE + 123)
+        self.cache.set('chunked', value)
+        self.assertEqual(self.cache.get('chunked'), value)
+        shorter = os.urandom(3 * BLOCK_SIZE)
+        self.cache.set('chunked', shorter)
+        self.assertEqual(self.cache.get('chunked'), shorter)
+
+    def test_evicted_chunk_is_a_miss(self):
+        value = os.urandom(5 * BLOCK_SIZE)
+        self.cache.set('chunked', value)
+        key = self.cache.make_key('chunked')
+        self.cache._arena.delete(self.cache._chunk_key(key, 2))
+        self.assertIsNone(self.cache.get('chunked'))
+        self.assertIs(self.cache.has_key('chunked'), False)
+
+    def test_value_too_large(self):
+        self.cache.set('large', 'old')
+        self.cache.set('large', os.urandom(200 * BLOCK_SIZE))
+        # Не поместившееся значение не оставляет старое
+        self.assertIsNone(self.cache.get('large'))
+
+    def test_shared_between_processes(self):
+        process = multiprocessing.get_context('fork').Process(
+            target=_set_in_child, args=(self.location, self.params),
+        )
+        process.start()
+        process.join(30)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.cache.get('from-child'), 'значение')
+        self.assertIs(self.make_cache().delete('from-child'), True)
+        self.assertIsNone(self.cache.get('from-child'))
+
+    def test_foreign_arena_file_is_not_loaded(self):
+        """Подложенный файл арены (права шире 0600) подменяется, а не распаковывается."""
+        planted = os.path.join(self.directory, 'planted')
+        os.mkdir(planted, 0o700)
+        location = os.path.join(planted, 'cache.arena')
+        SharedMemoryCache(location, self.params).set('key', 'подложено')
+        target = os.path.join(self.directory, 'victim', 'cache.arena')
+        os.mkdir(os.path.dirname(target), 0o700)
+        shutil.copyfile(location, target)
+        os.chmod(target, 0o644)
+        cache = SharedMemoryCache(target, self.params)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(os.stat(target).st_mode & 0o777, 0o600)
+
+    def test_open_directory_is_closed(self):
+        location = os.path.join(self.directory, 'open', 'cache.arena')
+        os.mkdir(os.path.dirname(location), 0o777)
+        os.chmod(os.path.dirname(location), 0o777)
+        SharedMemoryCache(location, self.params).set('key', 'value')
+        self.assertEqual(os.stat(os.path.dirname(location)).st_mode & 0o777, 0o700)
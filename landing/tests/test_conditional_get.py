@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date
+
+from landing.models import PrivacyPolicy
+from landing.testing import IsolatedSiteMixin
+
+
+class ConditionalGetTests(IsolatedSiteMixin, TestCase):
+    """Публичные страницы отвечают 304 по ETag и Last-Modified версии контента."""
+    site_settings = {'PUBLISH_ON_SAVE': False, 'QUERY_BUDGET_ENABLED': False}
+
+    def edit_policy(self, content):
+        policy = PrivacyPolicy.load()
+        policy.content = content
+        with self.captureOnCommitCallbacks(execute=True):
+            policy.save()
+
+    def test_validators_are_sent(self):
+        for name in ('index', 'privacy_policy'):
+            with self.subTest(name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('"'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_if_none_match(self):
+        url = reverse('privacy_policy')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('privacy_policy')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        earlier = http_date(parse_http_date(last_modified) - 60)
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': earlier}).status_code, 200)
+
+    def test_edit_changes_etag(self):
+        self.edit_policy('Первая редакция')
+        url = reverse('privacy_policy')
+        first = self.client.get(url)
+        self.edit_policy('Вторая редакция')
+        response = self.client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Вторая редакция')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertGreaterEqual(parse_http_date(response['Last-Modified']), parse_http_date(first['Last-Modified']))
+        # Правка любой модели лендинга меняет ETag всех страниц
+        index_etag = self.client.get(reverse('index'))['ETag']
+        self.edit_policy('Третья редакция')
+        self.assertNotEqual(self.client.get(reverse('index'))['ETag'], index_etag)
@@ -0,0 +1,99 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from landing.models import AppScreenshot, Screenshot, ScreenshotAlbum
+from landing.snapshot import write_snapshot
+from landing.testing import IsolatedSiteMixin
+
+
+class GalleryApiTestsMixin:
+    """JSON API галереи: страницы по курсору after до последней с next = null."""
+    site_settings = {'PUBLISH_ON_SAVE': False, 'QUERY_BUDGET_ENABLED': False}
+
+    def setUp(self):
+        super().setUp()
+        # bulk_create: без сигналов, которые читают файлы изображений
+        self.album = ScreenshotAlbum.objects.create(title='Локации')
+        self.screenshots = Screenshot.objects.bulk_create(
+            Screenshot(album=self.album, image='screenshots/%d.png' % number, caption='Кадр %d' % number)
+            for number in range(5)
+        )
+        # Порядок по (order, id): одинаковый order различает id
+        self.app_screenshots = AppScreenshot.objects.bulk_create(
+            AppScreenshot(title='Экран %d' % number, image='app_screenshots/%d.png' % number, order=order)
+            for number, order in enumerate((2, 1, 1, 0, 3))
+        )
+        self.prepare()
+
+    def prepare(self):
+        pass
+
+    def pages(self, url, limit):
+        """Все страницы API: [(id слайдов, next)]."""
+        pages = []
+        after = ''
+        while True:
+            response = self.client.get(url, {'limit': limit, 'after': after} if after else {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(([item['id'] for item in data['items']], data['next']))
+            if data['next'] is None:
+                return pages
+            after = data['next']
+
+    def test_album_pages(self):
+        url = reverse('album_screenshots', args=[self.album.pk])
+        ids = [screenshot.pk for screenshot in self.screenshots]
+        self.assertEqual(self.pages(url, 2), [
+            (ids[:2], str(ids[1])), (ids[2:4], str(ids[3])), (ids[4:], None),
+        ])
+        # Ровно на границе: последняя полная страница уже без курсора
+        self.assertEqual(self.pages(url, 5), [(ids, None)])
+        item = self.client.get(url, {'limit': 1}).json()['items'][0]
+        self.assertEqual((item['caption'], item['src']), ('Кадр 0', '/media/screenshots/0.png'))
+
+    def test_app_pages(self):
+        url = reverse('app_screenshots')
+        ordered = sorted(self.app_screenshots, key=lambda screenshot: (screenshot.order, screenshot.pk))
+        ids = [screenshot.pk for screenshot in ordered]
+        cursor = ['%d-%d' % (screenshot.order, screenshot.pk) for screenshot in ordered]
+        self.assertEqual(self.pages(url, 2), [
+            (ids[:2], cursor[1]), (ids[2:4], cursor[3]), (ids[4:], None),
+        ])
+
+    def test_cursor_past_the_end(self):
+        url = reverse('album_screenshots', args=[self.album.pk])
+        response = self.client.get(url, {'after': self.screenshots[-1].pk})
+        self.assertEqual(response.json(), {'items': [], 'next': None})
+
+    def test_invalid_cursor(self):
+        album_url = reverse('album_screenshots', args=[self.album.pk])
+        for after in ('abc', '-1', '1.5'):
+            with self.subTest(after):
+                self.assertEqual(self.client.get(album_url, {'after': after}).status_code, 400)
+        for after in ('1', '1-', 'x-1', '1-2-3'):
+            with self.subTest(after):
+                self.assertEqual(self.client.get(reverse('app_screenshots'), {'after': after}).status_code, 400)
+
+    def test_limit_is_clamped(self):
+        url = reverse('album_screenshots', args=[self.album.pk])
+        self.assertEqual(len(self.client.get(url, {'limit': 0}).json()['items']), 1)
+        self.assertEqual(len(self.client.get(url, {'limit': 'many'}).json()['items']), 5)
+
+    def test_unknown_album(self):
+        self.assertEqual(self.client.get(reverse('album_screenshots', args=[self.album.pk + 100])).status_code, 404)
+
+
+class GalleryApiDatabaseTests(GalleryApiTestsMixin, IsolatedSiteMixin, TestCase):
+    site_settings = dict(GalleryApiTestsMixin.site_settings, SERVE_FROM_SNAPSHOT=False)
+
+
+class GalleryApiSnapshotTests(GalleryApiTestsMixin, IsolatedSiteMixin, TestCase):
+    site_settings = dict(GalleryApiTestsMixin.site_settings, SERVE_FROM_SNAPSHOT=True)
+
+    def prepare(self):
+        write_snapshot()
+
+    def test_snapshot_is_used(self):
+        with self.assertNumQueries(0):
+            self.pages(reverse('album_screenshots', args=[self.album.pk]), 2)
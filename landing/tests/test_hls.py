@@ -0,0 +1,57 @@
+import os
+import shutil
+import struct
+import tempfile
+
+from django.test import SimpleTestCase
+
+from landing.hls import build_fragmented, playlist
+from landing.mp4 import find_boxes
+from landing.testing import write_mp4
+
+SAMPLES = [bytes([number]) * (100 + number) for number in range(5)]
+# Смещения показа сэмплов с B-кадром: -40 меньше нуля
+CTTS = [80, 0, -40, 80, 0]
+
+
+class BuildFragmentedTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-hls-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.source = os.path.join(self.directory, 'source.mp4')
+        self.target = os.path.join(self.directory, 'hls.mp4')
+
+    def build(self, **kwargs):
+        write_mp4(self.source, SAMPLES, **kwargs)
+        init_size, segments = build_fragmented(self.source, self.target)
+        with open(self.target, 'rb') as f:
+            return f.read(), init_size, segments
+
+    def trun_entries(self, data):
+        trun_start, _ = find_boxes(data, (b'moof', b'traf', b'trun'))[0]
+        version_flags, count = struct.unpack_from('>II', data, trun_start)
+        # Поля сэмпла: длительность, размер, флаги, смещение показа
+        entries = [struct.unpack_from('>IIIi', data, trun_start + 12 + i * 16) for i in range(count)]
+        return version_flags >> 24, entries
+
+    def test_negative_cts_offsets_in_ctts_version_0(self):
+        data, init_size, segments = self.build(ctts=[offset & 0xFFFFFFFF for offset in CTTS])
+        version, entries = self.trun_entries(data)
+        self.assertEqual(version, 1)
+        self.assertEqual([entry[3] for entry in entries], CTTS)
+
+    def test_ctts_version_1(self):
+        data, _, _ = self.build(ctts=CTTS, ctts_version=1)
+        self.assertEqual([entry[3] for entry in self.trun_entries(data)[1]], CTTS)
+
+    def test_samples_are_copied(self):
+        data, init_size, segments = self.build()
+        self.assertEqual(len(segments), 1)
+        _duration, offset, length = segments[0]
+        self.assertEqual(offset, init_size)
+        self.assertEqual(offset + length, len(data))
+        self.assertTrue(data[offset:].endswith(b''.join(SAMPLES)))
+        self.assertEqual([entry[1] for entry in self.trun_entries(data)[1]], [len(sample) for sample in SAMPLES])
+        text = playlist('/media/hls/source.mp4', init_size, segments)
+        self.assertIn('#EXT-X-BYTERANGE:%d@%d' % (length, offset), text)
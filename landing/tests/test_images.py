@@ -0,0 +1,145 @@
+import base64
+import io
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from PIL import Image
+
+from landing import images
+from landing.images import LQIP_WIDTH, generate_renditions, renditions_for
+from landing.models import ImageRendition, Screenshot, ScreenshotAlbum
+from landing.storage import is_content_addressed
+from landing.testing import IsolatedSiteMixin, image_file
+
+
+class ImageTestsMixin:
+    site_settings = {'PUBLISH_ON_SAVE': False, 'QUERY_BUDGET_ENABLED': False}
+
+    def setUp(self):
+        super().setUp()
+        self.album = ScreenshotAlbum.objects.create(title='Локации')
+
+    def save(self, screenshot):
+        # Старые файлы удаляются после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            screenshot.save()
+        return screenshot
+
+    def upload(self, name='image.png', **kwargs):
+        return self.save(Screenshot(album=self.album, image=image_file(name, **kwargs)))
+
+
+class RenditionTests(ImageTestsMixin, IsolatedSiteMixin, TestCase):
+    """Копии для srcset: строятся при сохранении и удаляются вместе с последней ссылкой на исходник."""
+
+    def renditions(self, source):
+        return set(ImageRendition.objects.filter(source=source).values_list('format', 'width', 'height', 'file'))
+
+    def assertFilesExist(self, renditions, exist=True):
+        for *_, name in renditions:
+            self.assertEqual(default_storage.exists(name), exist, name)
+
+    def test_generated_on_save(self):
+        source = self.upload(size=(640, 360)).image.name
+        renditions = self.renditions(source)
+        # Стандартные ширины меньше оригинала и сам оригинал, в WebP и JPEG
+        self.assertEqual({rendition[:3] for rendition in renditions}, {
+            (ext, width, height) for ext in ('webp', 'jpeg') for width, height in ((480, 270), (640, 360))
+        })
+        for ext, width, height, name in renditions:
+            self.assertTrue(name.startswith('renditions/') and is_content_addressed(name))
+            with default_storage.open(name) as f, Image.open(f) as image:
+                self.assertEqual((image.format, image.size), (ext.upper(), (width, height)))
+        self.assertEqual([width for width, url in renditions_for(source)['jpeg']], [480, 640])
+        # Повторно копии не строятся, с force — те же файлы
+        self.assertEqual(generate_renditions(source), 0)
+        self.assertEqual(generate_renditions(source, force=True), 4)
+        self.assertEqual(self.renditions(source), renditions)
+
+    def test_large_image_is_capped(self):
+        source = self.upload(size=(2400, 100)).image.name
+        self.assertEqual(
+            sorted({width for _, width, _, _ in self.renditions(source)}), [480, 960, 1440, 1920],
+        )
+
+    def test_deleted_with_replaced_image(self):
+        screenshot = self.upload()
+        old_source = screenshot.image.name
+        old = self.renditions(old_source)
+        screenshot.image = image_file(color=(10, 120, 10))
+        self.save(screenshot)
+        self.assertEqual(self.renditions(old_source), set())
+        self.assertFilesExist(old, exist=False)
+        new = self.renditions(screenshot.image.name)
+        self.assertEqual(len(new), 4)
+        self.assertFilesExist(new)
+
+    def test_deleted_with_object(self):
+        screenshot = self.upload()
+        renditions = self.renditions(screenshot.image.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            screenshot.delete()
+        self.assertEqual(ImageRendition.objects.count(), 0)
+        self.assertFilesExist(renditions, exist=False)
+
+    def test_kept_for_shared_source(self):
+        first = self.upload('first.png')
+        second = self.upload('second.png')
+        source = first.image.name
+        self.assertEqual(second.image.name, source)
+        renditions = self.renditions(source)
+        self.assertEqual(len(renditions), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.renditions(source), renditions)
+        self.assertFilesExist(renditions)
+        # Копии уходят вместе с последней ссылкой
+        second.image = image_file(color=(10, 120, 10))
+        self.save(second)
+        self.assertEqual(self.renditions(source), set())
+        self.assertFilesExist(renditions, exist=False)
+
+
+class ImageMetadataTests(ImageTestsMixin, IsolatedSiteMixin, TestCase):
+    """Размеры, основной цвет и LQIP записываются в модель при сохранении."""
+
+    def test_filled_on_save(self):
+        screenshot = self.upload(size=(640, 360), color=(200, 40, 40))
+        stored = Screenshot.objects.values('image_width', 'image_height', 'image_color', 'image_lqip').get()
+        self.assertEqual(
+            (stored['image_width'], stored['image_height'], stored['image_color']), (640, 360, '#c82828'),
+        )
+        prefix = 'data:image/jpeg;base64,'
+        self.assertTrue(stored['image_lqip'].startswith(prefix))
+        with Image.open(io.BytesIO(base64.b64decode(stored['image_lqip'][len(prefix):]))) as lqip:
+            self.assertEqual((lqip.format, lqip.size), ('JPEG', (LQIP_WIDTH, 9)))
+        self.assertEqual(images.metadata_for(screenshot.image)['color'], '#c82828')
+
+    def test_recomputed_only_for_new_file(self):
+        screenshot = self.upload(size=(640, 360))
+        with mock.patch.object(images, 'image_metadata', wraps=images.image_metadata) as image_metadata:
+            screenshot.caption = 'Новая подпись'
+            self.save(screenshot)
+            self.assertEqual(image_metadata.call_count, 0)
+            screenshot.image = image_file(size=(300, 500), color=(10, 120, 10))
+            self.save(screenshot)
+            self.assertEqual(image_metadata.call_count, 1)
+        screenshot.refresh_from_db()
+        self.assertEqual((screenshot.image_width, screenshot.image_height, screenshot.image_color), (300, 500, '#0a780a'))
+
+    def test_corrupt_upload_is_saved(self):
+        screenshot = Screenshot(album=self.album, image=ContentFile(b'not an image', name='broken.png'))
+        with self.assertLogs('landing.signals', 'ERROR') as logs:
+            self.save(screenshot)
+        self.assertEqual(len(logs.records), 2)
+        screenshot = Screenshot.objects.get()
+        self.assertTrue(default_storage.exists(screenshot.image.name))
+        self.assertEqual((screenshot.image_width, screenshot.image_height, screenshot.image_lqip), (None, None, ''))
+        self.assertEqual(ImageRendition.objects.count(), 0)
+        # Исправленный файл заполняет метаданные
+        screenshot.image = image_file()
+        self.save(screenshot)
+        self.assertEqual(Screenshot.objects.get().image_width, 640)
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import re
+
+from django.conf import settings
+from django.http import Http404
+from django.test import AsyncRequestFactory, SimpleTestCase
+
+from landing import views
+from landing.testing import IsolatedSiteMixin
+
+SIZE = 64 * 1024
+
+
+class RangeTests(IsolatedSiteMixin, SimpleTestCase):
+    """Отдача медиа из Django: Range, HEAD и выход за пределы MEDIA_ROOT."""
+    site_settings = {'MEDIA_OFFLOAD': None, 'MEDIA_HOT_CACHE_SIZE': 0, 'METRICS_ENABLED': False}
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(SIZE)
+        self.path = self.write('videos/clip.mp4', self.content)
+
+    def write(self, name, content):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def get(self, range_header=None, url='/media/videos/clip.mp4', method='get'):
+        headers = {'Range': range_header} if range_header else {}
+        response = getattr(self.client, method)(url, headers=headers)
+        # Тестовый клиент закрывает потоковый ответ (и освобождает место
+        # в таблице потоков), когда тело прочитано до конца
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def parts(self, response, body):
+        """[(Content-Range, данные)] ответа multipart/byteranges."""
+        boundary = re.fullmatch(r'multipart/byteranges; boundary=(\w+)', response['Content-Type']).group(1)
+        self.assertTrue(body.endswith(('\r\n--%s--\r\n' % boundary).encode()))
+        parts = []
+        for chunk in body.split(('--%s' % boundary).encode())[1:-1]:
+            head, _, data = chunk.partition(b'\r\n\r\n')
+            content_range = re.search(rb'Content-Range: (bytes \S+)', head).group(1).decode()
+            parts.append((content_range, data.removesuffix(b'\r\n')))
+        return parts
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), SIZE)
+        self.assertEqual(body, self.content)
+
+    def test_single_range(self):
+        response, body = self.get('bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/%d' % SIZE)
+        self.assertEqual(body, self.content[100:200])
+
+    def test_overlapping_and_adjacent_ranges_are_merged(self):
+        response, body = self.get('bytes=0-9,5-14,15-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 0-19/%d' % SIZE)
+        self.assertEqual(body, self.content[:20])
+
+    def test_multiple_ranges(self):
+        response, body = self.get('bytes=1000-1099, 0-9,5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(self.parts(response, body), [
+            ('bytes 0-14/%d' % SIZE, self.content[:15]),
+            ('bytes 1000-1099/%d' % SIZE, self.content[1000:1100]),
+        ])
+
+    def test_suffix_range(self):
+        response, body = self.get('bytes=-100')
+        self.assertEqual(response['Content-Range'], 'bytes %d-%d/%d' % (SIZE - 100, SIZE - 1, SIZE))
+        self.assertEqual(body, self.content[-100:])
+        # Суффикс длиннее файла — весь файл
+        response, body = self.get('bytes=-%d' % (SIZE * 2))
+        self.assertEqual(response['Content-Range'], 'bytes 0-%d/%d' % (SIZE - 1, SIZE))
+        self.assertEqual(body, self.content)
+
+    def test_open_ended_range_is_capped(self):
+        chunk = settings.MEDIA_STREAM_CHUNK
+        self.assertEqual(chunk, 4 * 1024 * 1024)
+        content = os.urandom(chunk + 1000)
+        self.write('videos/long.mp4', content)
+        response, body = self.get('bytes=10-', url='/media/videos/long.mp4')
+        self.assertEqual(response['Content-Range'], 'bytes 10-%d/%d' % (chunk + 9, len(content)))
+        self.assertEqual(body, content[10:chunk + 10])
+        # Явный конец диапазона не урезается
+        response, body = self.get('bytes=10-%d' % (len(content) - 1), url='/media/videos/long.mp4')
+        self.assertEqual(len(body), len(content) - 10)
+        # Хвост короче лимита отдаётся до конца файла
+        response, body = self.get('bytes=%d-' % (len(content) - 100), url='/media/videos/long.mp4')
+        self.assertEqual(body, content[-100:])
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=%d-' % SIZE, 'bytes=%d-%d' % (SIZE + 10, SIZE + 20), 'bytes=-0'):
+            with self.subTest(header):
+                response, body = self.get(header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */%d' % SIZE)
+                self.assertEqual(body, b'')
+
+    def test_invalid_range_is_ignored(self):
+        for header in ('bytes=20-10', 'items=0-10', 'bytes=a-b', 'bytes='):
+            with self.subTest(header):
+                response, body = self.get(header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(body, self.content)
+
+    def test_too_many_ranges(self):
+        ranges = ['%d-%d' % (i * 100, i * 100 + 9) for i in range(views.MAX_RANGES + 1)]
+        response, body = self.get('bytes=' + ','.join(ranges[:views.MAX_RANGES]))
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(self.parts(response, body)), views.MAX_RANGES)
+        # Сверх лимита заголовок игнорируется: файл целиком
+        response, body = self.get('bytes=' + ','.join(ranges))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_head(self):
+        response, body = self.get(method='head')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), SIZE)
+        self.assertEqual(body, b'')
+        response, body = self.get('bytes=0-9,100-109', method='head')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        self.assertEqual(body, b'')
+        self.assertEqual(int(response['Content-Length']), len(self.get('bytes=0-9,100-109')[1]))
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        self.client.defaults['HTTP_IF_RANGE'] = etag
+        self.addCleanup(self.client.defaults.clear)
+        self.assertEqual(self.get('bytes=0-9')[1], self.content[:10])
+        self.client.defaults['HTTP_IF_RANGE'] = '"stale"'
+        response, body = self.get('bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_async_view_matches_sync(self):
+        request = AsyncRequestFactory().get('/media/videos/clip.mp4', headers={'Range': 'bytes=-10,0-9,500-599'})
+
+        async def fetch():
+            response = await views.stream_video_async(request, 'clip.mp4')
+            return response, b''.join([chunk async for chunk in response])
+
+        response, body = asyncio.run(fetch())
+        self.assertEqual([data for _, data in self.parts(response, body)], [
+            self.content[:10], self.content[500:600], self.content[-10:],
+        ])
+
+    def test_path_traversal(self):
+        secret = self.write('../secret.txt', b'secret')
+        os.symlink(secret, os.path.join(settings.MEDIA_ROOT, 'videos', 'link.mp4'))
+        for subdir, name in (
+            ('videos', '../../secret.txt'), ('videos', '/etc/passwd'), ('videos', 'link.mp4'),
+            ('', '../secret.txt'), ('videos', 'clip.mp4\x00.txt'), ('videos', ''),
+        ):
+            with self.subTest(name):
+                with self.assertRaises(Http404):
+                    views.resolve_media_path(subdir, name)
+        self.assertEqual(views.resolve_media_path('videos', 'clip.mp4'), os.path.realpath(self.path))
+        for url in ('/media/%2E%2E/secret.txt', '/media/videos/link.mp4', '/media/videos/..%2F..%2Fsecret.txt'):
+            with self.subTest(url):
+                self.assertEqual(self.get(url=url)[0].status_code, 404)
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import pickle
+import tempfile
+from unittest import skipIf
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from landing import metrics
+from landing.testing import IsolatedSiteMixin
+
+MARKER = 'pickle-executed'
+
+
+class Exploit:
+    def __reduce__(self):
+        return (open, (os.path.join(settings.METRICS_DIR, MARKER), 'w'))
+
+
+@skipIf(metrics.fcntl is None, 'Метрики воркеров складываются только с flock')
+class MetricsFilesTests(IsolatedSiteMixin, SimpleTestCase):
+    site_settings = {'METRICS_ENABLED': True}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(metrics._values.clear)
+        metrics._values.clear()
+
+    def write_worker_file(self, pid, data):
+        os.makedirs(settings.METRICS_DIR, 0o700, exist_ok=True)
+        with open(metrics._worker_file(pid), 'wb') as f:
+            f.write(data)
+
+    def test_round_trip(self):
+        metrics.inc('dron_page_cache_total', ('hit',), 3)
+        metrics.observe('dron_template_render_duration_seconds', ('landing/index.html',), 0.02)
+        values = metrics.collect()
+        self.assertEqual(values[('dron_page_cache_total', ('hit',))], 3)
+        histogram = values[('dron_template_render_duration_seconds', ('landing/index.html',))]
+        self.assertEqual(sum(histogram[:-1]), 1)
+        self.assertAlmostEqual(histogram[-1], 0.02)
+        with open(metrics._worker_file(os.getpid()), encoding='utf-8') as f:
+            self.assertEqual(f.read(1), '[')
+        self.assertEqual(os.stat(settings.METRICS_DIR).st_mode & 0o777, 0o700)
+
+    def test_pickle_file_is_not_loaded(self):
+        """Подложенный файл с pickle не выполняется, а пропускается."""
+        self.write_worker_file(os.getpid() + 1, pickle.dumps({('dron_page_cache_total', ('hit',)): Exploit()}))
+        metrics.inc('dron_page_cache_total', ('hit',))
+        values = metrics.collect()
+        self.assertEqual(values[('dron_page_cache_total', ('hit',))], 1)
+        self.assertFalse(os.path.exists(os.path.join(settings.METRICS_DIR, MARKER)))
+
+    def test_unknown_and_malformed_entries_are_skipped(self):
+        self.write_worker_file(os.getpid() + 1, (
+            b'[["dron_page_cache_total", ["hit"], 5], ["unknown", [], 1],'
+            b' ["dron_page_cache_total", ["a", "b"], 1], ["dron_stream_duration_seconds", ["v"], 1]]'
+        ))
+        values = metrics.collect()
+        self.assertEqual(values, {('dron_page_cache_total', ('hit',)): 5})
+
+    def test_dead_worker_counters_are_kept(self):
+        # pid, которого нет: счётчики переносятся в общий файл завершившихся воркеров
+        dead_pid = 2 ** 22 + 12345
+        self.write_worker_file(dead_pid, b'[["dron_page_cache_total", ["render"], 2]]')
+        self.assertEqual(metrics.collect()[('dron_page_cache_total', ('render',))], 2)
+        self.assertFalse(os.path.exists(metrics._worker_file(dead_pid)))
+        self.assertEqual(metrics.collect()[('dron_page_cache_total', ('render',))], 2)
+
+
+CHUNKS = [b'a' * 10, b'b' * 20, b'c' * 30]
+
+
+async def _achunks():
+    for chunk in CHUNKS:
+        yield chunk
+
+
+class StreamMetricsTests(IsolatedSiteMixin, SimpleTestCase):
+    """Байты отдачи считаются по тому, что сервер забрал из тела, а не по Content-Length."""
+    site_settings = {'METRICS_ENABLED': True}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(metrics._values.clear)
+        metrics._values.clear()
+        self.request = RequestFactory().get('/media/videos/trailer.mp4')
+
+    def sent(self):
+        return metrics._values.get(('dron_stream_bytes_total', ('unmatched',)), 0)
+
+    def streams(self):
+        return sum(metrics._values[('dron_stream_duration_seconds', ('unmatched',))][:-1])
+
+    def respond(self, response):
+        # Content-Length, который не совпадает с телом, не влияет на счётчик
+        response['Content-Length'] = '1000000'
+        return metrics.metrics_middleware(lambda request: response)(self.request)
+
+    def test_full_body(self):
+        response = self.respond(StreamingHttpResponse(iter(CHUNKS)))
+        self.assertEqual(b''.join(response), b''.join(CHUNKS))
+        response.close()
+        self.assertEqual(self.sent(), 60)
+        self.assertEqual(self.streams(), 1)
+
+    def test_aborted_body(self):
+        response = self.respond(StreamingHttpResponse(iter(CHUNKS)))
+        body = iter(response)
+        next(body)
+        next(body)
+        # Клиент отключился, пока сервер отправлял второй кусок
+        response.close()
+        self.assertEqual(self.sent(), 10)
+        self.assertEqual(self.streams(), 1)
+
+    def test_file_response_keeps_sendfile(self):
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as f:
+            f.write(b'x' * 100)
+        response = self.respond(FileResponse(open(f.name, 'rb')))
+        self.assertIsNotNone(response.file_to_stream)
+        self.assertEqual(len(b''.join(response)), 100)
+        response.close()
+        self.assertEqual(self.sent(), 100)
+
+    def test_async_aborted_body(self):
+        async def run():
+            async def get_response(request):
+                return StreamingHttpResponse(_achunks())
+
+            response = await metrics.metrics_middleware(get_response)(self.request)
+            body = aiter(response)
+            await anext(body)
+            await anext(body)
+            # Под ASGI при обрыве Django закрывает итератор, а close() ответа не вызывает
+            await body.aclose()
+
+        asyncio.run(run())
+        self.assertEqual(self.sent(), 10)
+        self.assertEqual(self.streams(), 1)
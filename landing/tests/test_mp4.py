@@ -0,0 +1,125 @@
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+from unittest import mock
+
+from django.core.files import File
+from django.test import SimpleTestCase
+
+from landing import mp4
+from landing.storage import HASH_NAME_LENGTH, ContentAddressedStorage
+from landing.testing import write_mp4
+
+SAMPLES = [bytes([number + 1]) * (200 + number) for number in range(5)]
+STBL = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+
+def chunk_offsets(data):
+    """(тип таблицы, смещения чанков) единственной дорожки."""
+    for box_type, item in ((b'stco', 'I'), (b'co64', 'Q')):
+        for start, _ in mp4.find_boxes(data, STBL + (box_type,)):
+            count = struct.unpack_from('>I', data, start + 4)[0]
+            return box_type, list(struct.unpack_from('>%d%s' % (count, item), data, start + 8))
+    return None, []
+
+
+class FaststartTestsMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='test-mp4-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'clip.mp4')
+
+    def read(self, path=None):
+        with open(path or self.path, 'rb') as f:
+            return f.read()
+
+    def assertSamplesAt(self, data, offsets):
+        self.assertEqual([data[offset:offset + len(sample)] for offset, sample in zip(offsets, SAMPLES)], SAMPLES)
+
+
+class FaststartTests(FaststartTestsMixin, SimpleTestCase):
+    """Перенос moov в начало: смещения чанков указывают на те же сэмплы."""
+
+    def test_offsets_move_with_data(self):
+        old_offsets = write_mp4(self.path, SAMPLES)
+        self.assertFalse(mp4.analyze(self.path)['faststart'])
+        size = os.path.getsize(self.path)
+
+        self.assertTrue(mp4.faststart(self.path))
+        data = self.read()
+        self.assertEqual(len(data), size)
+        self.assertTrue(mp4.analyze(self.path)['faststart'])
+        box_type, offsets = chunk_offsets(data)
+        self.assertEqual(box_type, b'stco')
+        # Данные сдвинулись ровно на размер moov
+        moov_size = size - old_offsets[-1] - len(SAMPLES[-1])
+        self.assertEqual(offsets, [offset + moov_size for offset in old_offsets])
+        self.assertSamplesAt(data, offsets)
+        # Повторный вызов файл не трогает
+        self.assertFalse(mp4.faststart(self.path))
+        self.assertEqual(self.read(), data)
+
+    def test_stco_becomes_co64(self):
+        write_mp4(self.path, SAMPLES)
+        old_offsets = chunk_offsets(self.read())[1]
+        moov_size = os.path.getsize(self.path) - old_offsets[-1] - len(SAMPLES[-1])
+        # Граница 32 бит вместо 4 ГиБ: moov в неё влезает, а сдвинутые
+        # смещения (не меньше размера moov) — нет
+        limit = moov_size + 8 * len(SAMPLES)
+        with mock.patch.object(mp4, 'MAX_UINT32', limit):
+            self.assertTrue(mp4.faststart(self.path))
+        data = self.read()
+        box_type, offsets = chunk_offsets(data)
+        self.assertEqual(box_type, b'co64')
+        self.assertGreater(min(offsets), limit)
+        # co64 длиннее stco на 4 байта на чанк — на столько же дальше и данные
+        shift = moov_size + 4 * len(SAMPLES)
+        self.assertEqual(offsets, [offset + shift for offset in old_offsets])
+        self.assertSamplesAt(data, offsets)
+        self.assertTrue(mp4.analyze(self.path)['faststart'])
+
+    def test_not_mp4(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(mp4.MP4Error):
+            mp4.faststart(self.path)
+
+
+class FaststartStorageTests(FaststartTestsMixin, SimpleTestCase):
+    """ContentAddressedStorage переносит moov до хэширования: имя — хэш итоговых байтов."""
+
+    def setUp(self):
+        super().setUp()
+        self.storage = ContentAddressedStorage(location=os.path.join(self.directory, 'media'))
+
+    def save(self, path, name='videos/upload.mp4'):
+        with open(path, 'rb') as f:
+            return self.storage.save(name, File(f, os.path.basename(path)))
+
+    def test_name_is_hash_of_faststarted_file(self):
+        write_mp4(self.path, SAMPLES)
+        original = self.read()
+        expected_path = os.path.join(self.directory, 'expected.mp4')
+        shutil.copyfile(self.path, expected_path)
+        mp4.faststart(expected_path)
+        expected = self.read(expected_path)
+
+        name = self.save(self.path)
+        self.assertEqual(name, 'videos/%s.mp4' % hashlib.sha256(expected).hexdigest()[:HASH_NAME_LENGTH])
+        self.assertEqual(self.read(self.storage.path(name)), expected)
+        # Загруженный файл не меняется, временная копия удалена
+        self.assertEqual(self.read(), original)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['clip.mp4', 'expected.mp4', 'media'])
+        # Тот же ролик уже с moov в начале — тот же файл
+        self.assertEqual(self.save(expected_path, 'videos/other.mp4'), name)
+        self.assertEqual(os.listdir(self.storage.path('videos')), [os.path.basename(name)])
+
+    def test_other_files_are_hashed_as_is(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not really a video')
+        name = self.save(self.path)
+        self.assertEqual(name, 'videos/%s.mp4' % hashlib.sha256(b'not really a video').hexdigest()[:HASH_NAME_LENGTH])
@@ -0,0 +1,92 @@
+import inspect
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from landing import metrics
+from landing.cache import _page_key, bump_content_version, get_content_version
+from landing.models import PrivacyPolicy
+from landing.singleflight import KeyLock
+from landing.testing import IsolatedSiteMixin
+from landing.views import privacy_policy
+
+
+class PageCacheTests(IsolatedSiteMixin, TestCase):
+    """Кэш готовых страниц: попадание без запросов к БД, сброс по версии, один пересчёт."""
+    site_settings = {
+        'PUBLISH_ON_SAVE': False, 'SERVE_FROM_SNAPSHOT': False, 'QUERY_BUDGET_ENABLED': False,
+        'METRICS_ENABLED': True,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(metrics._values.clear)
+        metrics._values.clear()
+        self.url = reverse('privacy_policy')
+        self.key = _page_key(inspect.unwrap(privacy_policy))
+        self.set_policy('Первая редакция')
+        bump_content_version('landing.privacypolicy')
+
+    def set_policy(self, content):
+        # on_commit в TestCase не выполняется: версию контента тест повышает сам
+        PrivacyPolicy.objects.update_or_create(pk=1, defaults=dict(content=content, content_html='<p>%s</p>' % content))
+
+    def results(self):
+        return {
+            labels[0]: value for (name, labels), value in metrics._values.items() if name == 'dron_page_cache_total'
+        }
+
+    def test_hit_skips_queries(self):
+        self.assertContains(self.client.get(self.url), 'Первая редакция')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Первая редакция')
+        self.assertEqual(self.results(), {'render': 1, 'hit': 1})
+
+    def test_version_bump_invalidates(self):
+        self.client.get(self.url)
+        self.set_policy('Вторая редакция')
+        # Пока версия прежняя, отдаётся кэш
+        self.assertContains(self.client.get(self.url), 'Первая редакция')
+        bump_content_version('landing.privacypolicy')
+        self.assertContains(self.client.get(self.url), 'Вторая редакция')
+        self.assertEqual(self.results(), {'render': 2, 'hit': 1})
+
+    def test_stale_while_another_worker_renders(self):
+        old_etag = self.client.get(self.url)['ETag']
+        self.set_policy('Вторая редакция')
+        bump_content_version('landing.privacypolicy')
+        lock = KeyLock(self.key)
+        self.assertTrue(lock.acquire(timeout=0))
+        try:
+            with self.assertNumQueries(0):
+                response = self.client.get(self.url)
+        finally:
+            lock.release()
+        # Прежняя страница со своим ETag: браузер не запомнит её под новой версией
+        self.assertContains(response, 'Первая редакция')
+        self.assertEqual(response['ETag'], old_etag)
+        self.assertEqual(self.results(), {'render': 1, 'stale': 1})
+        self.assertContains(self.client.get(self.url), 'Вторая редакция')
+
+    def test_fresh_after_waiting(self):
+        """Без устаревшей записи запрос ждёт пересчёта и берёт его результат."""
+        self.client.get(self.url)
+        cache.delete(self.key)
+        lock = KeyLock(self.key)
+        self.assertTrue(lock.acquire(timeout=0))
+
+        def finish_render():
+            # Другой воркер закончил рендер, положил страницу в кэш и отпустил блокировку
+            cache.set(self.key, (get_content_version(), b'rendered elsewhere', 'text/html; charset=utf-8'), None)
+            lock.release()
+
+        timer = threading.Timer(0.2, finish_render)
+        timer.start()
+        self.addCleanup(timer.join)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, b'rendered elsewhere')
+        self.assertEqual(self.results(), {'render': 1, 'fresh': 1})
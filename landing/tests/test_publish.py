@@ -0,0 +1,54 @@
+import inspect
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from landing import publish
+from landing.cache import _page_key
+from landing.models import PrivacyPolicy
+from landing.publish import content_changed_on_commit
+from landing.singleflight import KeyLock
+from landing.testing import IsolatedSiteMixin
+from landing.views import privacy_policy
+
+
+class PublishTests(IsolatedSiteMixin, TestCase):
+    site_settings = {'PUBLISH_ON_SAVE': True, 'SERVE_FROM_SNAPSHOT': True}
+
+    def published(self):
+        with open(os.path.join(settings.PUBLISH_ROOT, 'privacy-policy', 'index.html'), encoding='utf-8') as f:
+            return f.read()
+
+    def save_policy(self, content):
+        policy = PrivacyPolicy.load()
+        policy.content = content
+        with self.captureOnCommitCallbacks(execute=True):
+            policy.save()
+
+    def test_save_publishes_page(self):
+        self.save_policy('Первая редакция политики')
+        self.assertIn('Первая редакция политики', self.published())
+
+    def test_publish_bypasses_page_cache(self):
+        """Пока страницу пересчитывает другой воркер, публикуется новая версия, а не прежняя из кэша."""
+        self.save_policy('Старая редакция')
+        self.assertContains(self.client.get(reverse('privacy_policy')), 'Старая редакция')
+        lock = KeyLock(_page_key(inspect.unwrap(privacy_policy)))
+        self.assertTrue(lock.acquire(timeout=0))
+        try:
+            self.save_policy('Новая редакция')
+        finally:
+            lock.release()
+        published = self.published()
+        self.assertIn('Новая редакция', published)
+        self.assertNotIn('Старая редакция', published)
+
+    def test_one_publish_per_transaction(self):
+        with mock.patch.object(publish, 'publish_site', wraps=publish.publish_site) as publish_site:
+            with self.captureOnCommitCallbacks(execute=True):
+                content_changed_on_commit('landing.privacypolicy')
+                content_changed_on_commit('landing.footer')
+        self.assertEqual(publish_site.call_count, 1)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from landing.testing import QueryBudgetTestMixin
+
+
+# Тесты идут с DEBUG = False, а манифеста collectstatic может не быть
+@override_settings(STORAGES=dict(settings.STORAGES, staticfiles={
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}))
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+
+    def test_page_budgets(self):
+        """Страницы, отдача видео, API галереи и changelist админки в своих бюджетах, без N+1."""
+        self.assertPageBudgets()
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from landing.cache import bump_content_version
+from landing.models import Footer, PrivacyPolicy, ProductInfo, PurchaseOptionsBlock
+from landing.testing import BUDGET_SETTINGS, IsolatedSiteMixin
+
+
+class RenderFieldsTests(IsolatedSiteMixin, TestCase):
+    """Готовые для шаблона поля считаются при сохранении, а шаблоны только подставляют их."""
+    # Без кэшей и снимка: страницы рендерятся из БД на каждый запрос
+    site_settings = BUDGET_SETTINGS
+
+    def save(self, obj):
+        # Версии моделей повышаются после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        return obj
+
+    def test_refreshed_on_save(self):
+        policy = self.save(PrivacyPolicy(content='Первый абзац\nстрока\n\n<b>Второй</b>'))
+        self.assertEqual(policy.content_html, '<p>Первый абзац<br>строка</p>\n\n<p>&lt;b&gt;Второй&lt;/b&gt;</p>')
+        product = self.save(ProductInfo(description='Строка 1\nСтрока 2'))
+        self.assertEqual(product.description_html, 'Строка 1<br>Строка 2')
+        purchase = self.save(PurchaseOptionsBlock(basic_features=' Полёты \n\nЛокации', custom_features=''))
+        self.assertEqual((purchase.basic_features_list, purchase.custom_features_list), (['Полёты', 'Локации'], []))
+        footer = self.save(Footer(phone='8 (900) 478-43-84'))
+        self.assertEqual(footer.phone_link, 'tel:89004784384')
+
+        policy.content = 'Новая редакция'
+        footer.phone = '+7 900 000-00-00'
+        self.save(policy)
+        self.save(footer)
+        self.assertEqual(PrivacyPolicy.objects.get().content_html, '<p>Новая редакция</p>')
+        self.assertEqual(Footer.objects.get().phone_link, 'tel:+79000000000')
+
+    def test_unsaved_singleton_has_render_fields(self):
+        purchase = PurchaseOptionsBlock.load()
+        self.assertIsNone(purchase.updated_at)
+        self.assertEqual(purchase.basic_features_list, [
+            'Полный доступ к симулятору', 'Все локации и режимы', 'Техническая поддержка',
+        ])
+        self.assertEqual(Footer.load().phone_link, 'tel:89004784384')
+
+    def test_templates_use_stored_fields(self):
+        for model in (PrivacyPolicy, ProductInfo, PurchaseOptionsBlock, Footer):
+            self.save(model())
+        # Поля меняются в обход save(): шаблон должен вывести именно их
+        PrivacyPolicy.objects.update(content='Исходный текст', content_html='<p id="stored">Из поля</p>')
+        ProductInfo.objects.update(description='Исходный текст', description_html='Описание <i>из поля</i>')
+        PurchaseOptionsBlock.objects.update(basic_features='Исходный текст', basic_features_list=['Особенность из поля'])
+        Footer.objects.update(phone_link='tel:+0001112233')
+        bump_content_version(*(model._meta.label_lower for model in (
+            PrivacyPolicy, ProductInfo, PurchaseOptionsBlock, Footer,
+        )))
+
+        policy = self.client.get(reverse('privacy_policy'))
+        self.assertContains(policy, '<p id="stored">Из поля</p>', html=True)
+        self.assertNotContains(policy, 'Исходный текст')
+        index = self.client.get(reverse('index'))
+        self.assertContains(index, 'Описание <i>из поля</i>')
+        self.assertContains(index, 'Особенность из поля')
+        self.assertContains(index, 'href="tel:+0001112233"')
+        self.assertNotContains(index, 'Исходный текст')
@@ -0,0 +1,78 @@
+from collections import Counter
+
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import TestCase
+from django.urls import reverse
+
+from landing import metrics
+from landing.cache import bump_content_version
+from landing.testing import IsolatedSiteMixin
+
+TEMPLATE = (
+    '{% load landing_cache %}'
+    "{% cache_section 'footer' 'landing.footer' %}[{{ footer }}]{% endcache_section %}"
+    "{% cache_section 'gallery' 'landing.screenshotalbum' 'landing.screenshot' %}[{{ gallery }}]{% endcache_section %}"
+)
+
+
+class CacheSectionTests(IsolatedSiteMixin, TestCase):
+    """Секция перерисовывается только после правки моделей из её меток."""
+    site_settings = {
+        'PUBLISH_ON_SAVE': False, 'SERVE_FROM_SNAPSHOT': False, 'QUERY_BUDGET_ENABLED': False,
+        'METRICS_ENABLED': True,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(metrics._values.clear)
+        metrics._values.clear()
+        self.template = Template(TEMPLATE)
+        self.renders = Counter()
+
+    def render(self):
+        def section(name):
+            def value():
+                self.renders[name] += 1
+                return '%s %d' % (name, self.renders[name])
+            return value
+        return self.template.render(Context({'footer': section('footer'), 'gallery': section('gallery')}))
+
+    def section_results(self):
+        return {
+            labels: value for (name, labels), value in metrics._values.items() if name == 'dron_section_cache_total'
+        }
+
+    def test_sections_depend_only_on_their_labels(self):
+        self.assertEqual(self.render(), '[footer 1][gallery 1]')
+        self.assertEqual(self.render(), '[footer 1][gallery 1]')
+        # Модель, которой нет в метках, не трогает ни одну секцию
+        bump_content_version('landing.trailer')
+        self.assertEqual(self.render(), '[footer 1][gallery 1]')
+        bump_content_version('landing.footer')
+        self.assertEqual(self.render(), '[footer 2][gallery 1]')
+        # Любая из нескольких меток
+        bump_content_version('landing.screenshot')
+        self.assertEqual(self.render(), '[footer 2][gallery 2]')
+        bump_content_version('landing.screenshotalbum')
+        self.assertEqual(self.render(), '[footer 2][gallery 3]')
+        self.assertEqual(self.section_results(), {
+            ('footer', 'miss'): 2, ('footer', 'hit'): 4,
+            ('gallery', 'miss'): 3, ('gallery', 'hit'): 3,
+        })
+
+    def test_labels_are_required(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load landing_cache %}{% cache_section 'footer' %}{% endcache_section %}")
+
+    def test_index_rerenders_edited_section(self):
+        url = reverse('index')
+        self.client.get(url)
+        sections = {name for name, result in self.section_results()}
+        self.assertIn('trailer', sections)
+        metrics._values.clear()
+        # Страница целиком собирается заново, из секций — только трейлер
+        bump_content_version('landing.trailer')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        results = self.section_results()
+        self.assertEqual({name for name, result in results if result == 'miss'}, {'trailer'})
+        self.assertEqual({name for name, result in results if result == 'hit'}, sections - {'trailer'})
@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from unittest import skipIf
+
+from django.test import SimpleTestCase, override_settings
+
+from landing.shm import WAYS, MediaReader, SharedArena, fcntl, media_arena
+from landing.utils import private_directory
+
+BLOCK_SIZE = 4096
+KEYS = ['key-%d' % number for number in range(4 * WAYS)]
+
+
+def _value(key):
+    # Длина зависит от ключа: старые ключ и длина с новыми данными дают другое значение
+    return (key + ';').encode('ascii') * (10 + KEYS.index(key) * 7)
+
+
+def _writer(path, deadline):
+    arena = SharedArena(path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+    while time.monotonic() < deadline:
+        key = random.choice(KEYS)
+        if random.random() < 0.1:
+            arena.delete(key)
+        else:
+            arena.set(key, _value(key))
+
+
+def _reader(path, deadline, torn, hits):
+    arena = SharedArena(path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+    while time.monotonic() < deadline:
+        key = random.choice(KEYS)
+        data = arena.get(key)
+        if data is not None:
+            hits.value += 1
+            if data != _value(key):
+                torn.value += 1
+
+
+@skipIf(fcntl is None, 'Разделяемая арена требует fcntl')
+class SharedArenaTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-arena-')
+        self.path = os.path.join(self.directory, 'test.arena')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        arena = SharedArena(self.path, BLOCK_SIZE * WAYS * 2, BLOCK_SIZE)
+        self.addCleanup(arena.close)
+        self.assertTrue(arena.set('a', b'first'))
+        self.assertEqual(arena.get('a'), b'first')
+        self.assertTrue(arena.set('a', b'second value'))
+        self.assertEqual(arena.get('a'), b'second value')
+        self.assertFalse(arena.set('big', b'x' * (BLOCK_SIZE + 1)))
+        self.assertTrue(arena.delete('a'))
+        self.assertIsNone(arena.get('a'))
+
+    def test_eviction_keeps_set_size(self):
+        # Один набор: девятый ключ вытесняет тот, к которому дольше не обращались
+        arena = SharedArena(self.path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+        self.addCleanup(arena.close)
+        for key in KEYS[:WAYS + 1]:
+            arena.set(key, _value(key))
+        present = [key for key in KEYS[:WAYS + 1] if arena.get(key) is not None]
+        self.assertEqual(len(present), WAYS)
+        self.assertNotIn(KEYS[0], present)
+
+    def test_no_torn_reads_between_processes(self):
+        """Читатель без блокировок не получает данные одного ключа под другим."""
+        context = multiprocessing.get_context('fork')
+        torn = context.Value('q', 0)
+        hits = context.Value('q', 0)
+        deadline = time.monotonic() + 3
+        # Создаём файл арены до старта процессов
+        SharedArena(self.path, BLOCK_SIZE * WAYS, BLOCK_SIZE).close()
+        processes = [
+            context.Process(target=_writer, args=(self.path, deadline)),
+            context.Process(target=_writer, args=(self.path, deadline)),
+            context.Process(target=_reader, args=(self.path, deadline, torn, hits)),
+            context.Process(target=_reader, args=(self.path, deadline, torn, hits)),
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+        self.assertGreater(hits.value, 0)
+        self.assertEqual(torn.value, 0)
+
+    def test_symlink_is_not_followed(self):
+        target = os.path.join(self.directory, 'target')
+        with open(target, 'wb') as f:
+            f.write(b'foreign data')
+        os.symlink(target, self.path)
+        arena = SharedArena(self.path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+        self.addCleanup(arena.close)
+        arena.set('a', b'value')
+        self.assertFalse(os.path.islink(self.path))
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'foreign data')
+
+    def test_foreign_file_is_replaced(self):
+        """Файл с правильным заголовком, но доступный другим, не используется."""
+        arena = SharedArena(self.path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+        arena.set('a', b'planted')
+        arena.close()
+        os.chmod(self.path, 0o666)
+        arena = SharedArena(self.path, BLOCK_SIZE * WAYS, BLOCK_SIZE)
+        self.addCleanup(arena.close)
+        self.assertIsNone(arena.get('a'))
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    @skipIf(not hasattr(os, 'getuid') or os.getuid() != 0, 'Нужен root, чтобы сменить владельца каталога')
+    def test_foreign_directory_is_refused(self):
+        directory = os.path.join(self.directory, 'foreign')
+        os.mkdir(directory, 0o700)
+        os.chown(directory, 65534, 65534)
+        with self.assertRaises(PermissionError):
+            private_directory(directory)
+        with self.assertRaises(PermissionError):
+            SharedArena(os.path.join(directory, 'test.arena'), BLOCK_SIZE * WAYS, BLOCK_SIZE)
+
+
+@skipIf(fcntl is None, 'Разделяемая арена требует fcntl')
+class MediaArenaTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='test-media-arena-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.video = os.path.join(self.directory, 'video.mp4')
+        self.content = os.urandom(8 * BLOCK_SIZE)
+        with open(self.video, 'wb') as f:
+            f.write(self.content)
+
+    def media_settings(self, path):
+        return override_settings(
+            MEDIA_HOT_CACHE_PATH=path, MEDIA_HOT_CACHE_SIZE=BLOCK_SIZE * WAYS, MEDIA_HOT_CACHE_BLOCK=BLOCK_SIZE,
+            MEDIA_HOT_CACHE_HEAD=2 * BLOCK_SIZE, MEDIA_HOT_CACHE_TAIL=BLOCK_SIZE,
+        )
+
+    def test_planted_blocks_are_not_served(self):
+        """Блоки из подложенного файла арены не попадают в ответ вместо байтов видео."""
+        planted = os.path.join(self.directory, 'planted', 'media.arena')
+        with self.media_settings(planted):
+            reader = MediaReader(self.video)
+            reader.arena.set('%s:0' % reader.version, b'x' * BLOCK_SIZE)
+        target = os.path.join(self.directory, 'run', 'media.arena')
+        os.mkdir(os.path.dirname(target), 0o700)
+        shutil.copyfile(planted, target)
+        os.chmod(target, 0o644)
+        with self.media_settings(target):
+            reader = MediaReader(self.video)
+            self.addCleanup(reader.close)
+            self.assertTrue(reader.is_hot(0))
+            self.assertEqual(b''.join(reader.iter_range(0, 2 * BLOCK_SIZE, BLOCK_SIZE)), self.content[:2 * BLOCK_SIZE])
+
+    @skipIf(not hasattr(os, 'getuid') or os.getuid() != 0, 'Нужен root, чтобы сменить владельца каталога')
+    def test_foreign_directory_disables_hot_cache(self):
+        directory = os.path.join(self.directory, 'foreign')
+        os.mkdir(directory, 0o700)
+        os.chown(directory, 65534, 65534)
+        with self.media_settings(os.path.join(directory, 'media.arena')):
+            with self.assertLogs('landing.shm', 'ERROR'):
+                self.assertIsNone(media_arena())
+            reader = MediaReader(self.video)
+            self.addCleanup(reader.close)
+            self.assertFalse(reader.is_hot(0))
+            self.assertEqual(reader.read(0, 100), self.content[:100])
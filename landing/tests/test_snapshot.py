@@ -0,0 +1,108 @@
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.test import TestCase
+from django.urls import reverse
+
+from landing.models import (
+    AppScreenshot, PrivacyPolicy, PurchaseOptionsBlock, Screenshot, ScreenshotAlbum, Trailer,
+)
+from landing.snapshot import SINGLETON_MODELS, get_snapshot, write_snapshot
+from landing.testing import BUDGET_SETTINGS, IsolatedSiteMixin
+
+
+class SnapshotTests(IsolatedSiteMixin, TestCase):
+    """Снимок контента: те же данные, что в БД, и публичные страницы без запросов."""
+    # Без кэшей страниц и секций: каждый запрос рендерится заново
+    site_settings = dict(BUDGET_SETTINGS, SERVE_FROM_SNAPSHOT=True)
+
+    def setUp(self):
+        super().setUp()
+        PrivacyPolicy(title='Политика', content='Первый абзац\n\nВторой <абзац>').save()
+        Trailer(title='Трейлер из снимка').save()
+        PurchaseOptionsBlock(basic_features='Полёты\n\nЛокации\n').save()
+        self.albums = ScreenshotAlbum.objects.bulk_create(
+            ScreenshotAlbum(title='Альбом %d' % number, order=order) for number, order in enumerate((1, 0, 1))
+        )
+        # bulk_create: без сигналов, которые читают файлы изображений
+        Screenshot.objects.bulk_create(
+            Screenshot(album=album, image='screenshots/%d-%d.png' % (album.pk, number), caption='Кадр %d' % number)
+            for album in self.albums[:2] for number in range(3)
+        )
+        AppScreenshot.objects.bulk_create(
+            AppScreenshot(title='Экран %d' % number, image='app_screenshots/%d.png' % number, order=order)
+            for number, order in enumerate((1, 0))
+        )
+
+    def assertSameFields(self, obj, expected):
+        for field in type(expected)._meta.concrete_fields:
+            # DjangoJSONEncoder хранит время с точностью до миллисекунд
+            if isinstance(field, models.DateTimeField):
+                continue
+            value, expected_value = getattr(obj, field.attname), getattr(expected, field.attname)
+            if isinstance(field, models.FileField):
+                # Пустое поле файла без записи в БД — None, после снимка — ''
+                value, expected_value = value.name or '', expected_value.name or ''
+            with self.subTest(model=type(expected).__name__, field=field.name):
+                self.assertEqual(value, expected_value)
+
+    def test_round_trip(self):
+        write_snapshot()
+        expected_albums = list(ScreenshotAlbum.objects.order_by('order', 'pk'))
+        expected_screenshots = {
+            album.pk: list(album.screenshots.order_by('pk')) for album in expected_albums
+        }
+        expected_app_screenshots = list(AppScreenshot.objects.order_by('order', 'pk'))
+        expected_singletons = {label: apps.get_model(label)._load_from_db() for label in SINGLETON_MODELS}
+
+        with self.assertNumQueries(0):
+            snapshot = get_snapshot()
+            for label, expected in expected_singletons.items():
+                self.assertSameFields(snapshot.singletons[label], expected)
+            # Поля для шаблона попадают в снимок готовыми
+            policy = snapshot.singleton(PrivacyPolicy)
+            self.assertEqual(policy.content_html, '<p>Первый абзац</p>\n\n<p>Второй &lt;абзац&gt;</p>')
+            self.assertEqual(snapshot.singleton(PurchaseOptionsBlock).basic_features_list, ['Полёты', 'Локации'])
+            self.assertEqual([album.pk for album in snapshot.albums], [album.pk for album in expected_albums])
+            for album in snapshot.albums:
+                screenshots = snapshot.screenshots[album.pk]
+                for screenshot, expected in zip(screenshots, expected_screenshots[album.pk], strict=True):
+                    self.assertSameFields(screenshot, expected)
+                    self.assertEqual(screenshot.album.title, album.title)
+                self.assertEqual(album.screenshot_count, len(screenshots))
+                self.assertEqual(album.first_screenshot, screenshots[0] if screenshots else None)
+            for screenshot, expected in zip(snapshot.app_screenshots, expected_app_screenshots, strict=True):
+                self.assertSameFields(screenshot, expected)
+            # Файл не менялся — тот же объект
+            self.assertIs(get_snapshot(), snapshot)
+        write_snapshot()
+        self.assertIsNot(get_snapshot(), snapshot)
+
+    def test_pages_render_from_snapshot(self):
+        write_snapshot()
+        # Правка в обход сигналов: снимок её не видит
+        Trailer.objects.update(title='Только в БД')
+        PrivacyPolicy.objects.update(content_html='<p>Только в БД</p>')
+        with self.assertNumQueries(0):
+            index = self.client.get(reverse('index'))
+            policy = self.client.get(reverse('privacy_policy'))
+        self.assertContains(index, 'Трейлер из снимка')
+        self.assertContains(index, 'Альбом 1')
+        self.assertNotContains(index, 'Только в БД')
+        self.assertContains(policy, '<p>Второй &lt;абзац&gt;</p>', html=True)
+        self.assertNotContains(policy, 'Только в БД')
+
+    def test_snapshot_of_other_format_is_ignored(self):
+        write_snapshot()
+        path = str(settings.CONTENT_SNAPSHOT_FILE)
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        data['format'] -= 1
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        with self.assertLogs('landing.snapshot', 'WARNING'):
+            self.assertIsNone(get_snapshot())
+        Trailer.objects.update(title='Только в БД')
+        self.assertContains(self.client.get(reverse('index')), 'Только в БД')
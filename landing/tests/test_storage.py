@@ -0,0 +1,76 @@
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from landing.models import ImageRendition, Screenshot, ScreenshotAlbum
+from landing.storage import delete_unreferenced, is_content_addressed, media_storage
+from landing.testing import IsolatedSiteMixin, image_file
+
+
+class ContentAddressedStorageTests(IsolatedSiteMixin, TestCase):
+    """Одинаковые загрузки — один файл, gc_media удаляет только файлы без ссылок."""
+    site_settings = {'PUBLISH_ON_SAVE': False, 'QUERY_BUDGET_ENABLED': False}
+
+    def setUp(self):
+        super().setUp()
+        self.album = ScreenshotAlbum.objects.create(title='Локации')
+
+    def upload(self, name, **kwargs):
+        return Screenshot.objects.create(album=self.album, image=image_file(name, **kwargs))
+
+    def files(self, directory):
+        return sorted(os.listdir(os.path.join(settings.MEDIA_ROOT, directory)))
+
+    def gc_media(self, **options):
+        """Имена удалённых (или, с dry_run, подлежащих удалению) файлов."""
+        stdout = StringIO()
+        call_command('gc_media', **dict({'min_age': 0, 'stdout': stdout}, **options))
+        return stdout.getvalue().splitlines()[:-1]
+
+    def test_identical_uploads_share_file(self):
+        first = self.upload('first.png')
+        second = self.upload('second.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_content_addressed(first.image.name))
+        self.assertEqual(self.files('screenshots'), [os.path.basename(first.image.name)])
+        other = self.upload('first.png', color=(10, 120, 10))
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(len(self.files('screenshots')), 2)
+
+    def test_gc_media_keeps_shared_file(self):
+        first = self.upload('first.png')
+        second = self.upload('second.png')
+        name = first.image.name
+        renditions = set(ImageRendition.objects.values_list('file', flat=True))
+        self.assertTrue(renditions)
+        first.delete()
+        # Файл и его копии остались у второго объекта
+        self.assertEqual(delete_unreferenced({name}), 0)
+        self.assertEqual(self.gc_media(), [])
+        self.assertTrue(media_storage.exists(name))
+        self.assertTrue(all(media_storage.exists(rendition) for rendition in renditions))
+
+        second.delete()
+        self.assertEqual(ImageRendition.objects.count(), 0)
+        self.assertEqual(sorted(self.gc_media(dry_run=True)), sorted(renditions | {name}))
+        self.assertTrue(media_storage.exists(name))
+        self.assertEqual(sorted(self.gc_media()), sorted(renditions | {name}))
+        self.assertFalse(media_storage.exists(name))
+        self.assertEqual(self.files('renditions'), [])
+
+    def test_gc_media_skips_original_names_and_young_files(self):
+        legacy = media_storage.path('screenshots/legacy.png')
+        os.makedirs(os.path.dirname(legacy), exist_ok=True)
+        with open(legacy, 'wb') as f:
+            f.write(image_file().read())
+        orphan = self.upload('orphan.png')
+        Screenshot.objects.filter(pk=orphan.pk).delete()
+        # Загрузка моложе --min-age могла ещё не попасть в базу
+        self.assertEqual(self.gc_media(min_age=3600), [])
+        self.assertTrue(media_storage.exists(orphan.image.name))
+        self.assertIn(orphan.image.name, self.gc_media())
+        # Файл с исходным именем мог попасть в MEDIA_ROOT не через модели
+        self.assertTrue(os.path.exists(legacy))
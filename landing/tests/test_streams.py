@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from unittest import mock, skipIf
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from landing import streams
+from landing.testing import IsolatedSiteMixin
+
+
+@skipIf(streams.fcntl is None, 'Таблица потоков требует flock')
+@override_settings(MEDIA_STREAM_MAX=2, MEDIA_STREAM_MAX_PER_CLIENT=1)
+class StreamLimitTests(IsolatedSiteMixin, SimpleTestCase):
+
+    def acquire(self, client):
+        ticket = streams.acquire(client)
+        if isinstance(ticket, streams.StreamTicket):
+            self.addCleanup(ticket.release)
+        return ticket
+
+    def test_one_client_does_not_take_every_slot(self):
+        self.assertIsInstance(self.acquire('10.0.0.1'), streams.StreamTicket)
+        refused = self.acquire('10.0.0.1')
+        self.assertIsInstance(refused, HttpResponse)
+        self.assertEqual(refused.status_code, 429)
+        self.assertIn('Retry-After', refused)
+        # Место второго клиента осталось свободным
+        self.assertIsInstance(self.acquire('10.0.0.2'), streams.StreamTicket)
+        self.assertEqual(self.acquire('10.0.0.3').status_code, 503)
+
+    def test_release_frees_the_slot(self):
+        ticket = self.acquire('10.0.0.1')
+        ticket.release()
+        self.assertIsInstance(self.acquire('10.0.0.1'), streams.StreamTicket)
+
+    def test_nginx_uses_the_same_limit(self):
+        self.assertIn('limit_conn media_per_client 1;', streams.nginx_limits())
+
+
+async def _chunks():
+    for number in range(3):
+        yield b'chunk %d' % number
+
+
+async def _enumerate(chunks):
+    number = 0
+    async for chunk in chunks:
+        yield number, chunk
+        number += 1
+
+
+@streams.limit_streams
+async def _async_stream(request):
+    return StreamingHttpResponse(_chunks())
+
+
+@streams.limit_streams
+async def _async_empty(request):
+    return HttpResponse(status=304)
+
+
+@skipIf(streams.fcntl is None, 'Таблица потоков требует flock')
+@override_settings(MEDIA_STREAM_MAX=2, MEDIA_STREAM_MAX_PER_CLIENT=1)
+class AsyncStreamLimitTests(IsolatedSiteMixin, SimpleTestCase):
+    """Под ASGI место в таблице (flock) освобождается в потоке, а не в цикле событий."""
+
+    def setUp(self):
+        super().setUp()
+        self.release_threads = []
+        release = streams.StreamTicket.release
+
+        def recording_release(ticket):
+            self.release_threads.append(threading.get_ident())
+            release(ticket)
+
+        patcher = mock.patch.object(streams.StreamTicket, 'release', recording_release)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get('/media/videos/trailer.mp4', REMOTE_ADDR='10.0.0.1')
+
+    def run_view(self, view, chunks=None):
+        async def run():
+            response = await view(self.request)
+            if response.streaming:
+                iterator = aiter(response)
+                try:
+                    async for number, _ in _enumerate(iterator):
+                        if number + 1 == chunks:
+                            break
+                finally:
+                    await iterator.aclose()
+            return threading.get_ident()
+
+        return asyncio.run(run())
+
+    def assertReleasedOffLoop(self, loop_thread):
+        self.assertTrue(self.release_threads)
+        self.assertNotIn(loop_thread, self.release_threads)
+        self.assertIsInstance(streams.acquire('10.0.0.1'), streams.StreamTicket)
+
+    def test_streamed_response(self):
+        self.assertReleasedOffLoop(self.run_view(_async_stream))
+
+    def test_aborted_stream(self):
+        # Клиент отключился после первого куска: Django закрывает только итератор
+        self.assertReleasedOffLoop(self.run_view(_async_stream, chunks=1))
+
+    def test_response_without_body(self):
+        self.assertReleasedOffLoop(self.run_view(_async_empty))
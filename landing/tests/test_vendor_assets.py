@@ -0,0 +1,150 @@
+import os
+import re
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from landing.assets import purge_css, split_selectors, vendor_static
+from landing.vendor_assets import (
+    OUTPUT_DIR, build_bootstrap_css, build_icons_css, icon_elements, used_classes, used_icons,
+)
+
+BOOTSTRAP_CSS = os.path.join(os.path.dirname(__file__), '..', '..', 'vendor', 'bootstrap', 'bootstrap.min.css')
+# Правила в том виде, в каком они есть в dist/css/bootstrap.min.css 5.3.3
+BOOTSTRAP_FRAGMENT = (
+    '@charset "UTF-8";/*!\n * Bootstrap  v5.3.3 (https://getbootstrap.com/)\n'
+    ' * Licensed under MIT (https://github.com/twbs/bootstrap/blob/main/LICENSE)\n'
+    ' */:root,[data-bs-theme=light]{--bs-blue:#0d6efd}'
+    '.btn-check:checked+.btn,.btn.active,.btn.show,.btn:first-child:active,:not(.btn-check)+.btn:active'
+    '{color:var(--bs-btn-active-color)}'
+    '.collapse:not(.show){display:none}'
+    '.carousel-item-next,.carousel-item-prev,.carousel-item.active{display:block}'
+    '.active.carousel-item-end,.carousel-item-next:not(.carousel-item-start){transform:translateX(100%)}'
+    '.visually-hidden,.visually-hidden-focusable:not(:focus):not(:focus-within){width:1px!important}'
+    '@media (min-width:992px){.navbar-expand-lg{flex-wrap:nowrap}.navbar-expand-md{flex-wrap:nowrap}}'
+    '@keyframes progress-bar-stripes{0%{background-position-x:1rem}}'
+    '.tooltip{z-index:1080}'
+)
+
+
+def _selectors(css):
+    """Все селекторы правил, включая вложенные в @media."""
+    return {
+        selector
+        for prelude in re.findall(r'(?:^|[{};])([^{};@]+)\{', re.sub(r'/\*.*?\*/', '', css, flags=re.S))
+        for selector in split_selectors(prelude)
+    }
+
+
+class SplitSelectorsTests(SimpleTestCase):
+
+    def test_commas_inside_parentheses(self):
+        self.assertEqual(
+            split_selectors('.a:not(.b,.c), .d:is(.e, .f) > .g,[data-x="1"]'),
+            ['.a:not(.b,.c)', '.d:is(.e, .f) > .g', '[data-x="1"]'],
+        )
+
+    def test_real_bootstrap_list(self):
+        self.assertEqual(
+            split_selectors('.btn-check:checked+.btn,.btn.active,:not(.btn-check)+.btn:active'),
+            ['.btn-check:checked+.btn', '.btn.active', ':not(.btn-check)+.btn:active'],
+        )
+
+
+class PurgeCssTests(SimpleTestCase):
+
+    def purge(self, classes):
+        return purge_css(BOOTSTRAP_FRAGMENT, set(classes))
+
+    def test_license_and_root_are_kept(self):
+        css = self.purge(())
+        self.assertTrue(css.startswith('@charset "UTF-8";/*!'))
+        self.assertIn('Bootstrap v5.3.3', css)
+        self.assertIn(':root,[data-bs-theme=light]{--bs-blue:#0d6efd}', css)
+        self.assertIn('@keyframes progress-bar-stripes', css)
+
+    def test_not_does_not_require_its_classes(self):
+        selectors = _selectors(self.purge({'btn', 'collapse', 'visually-hidden-focusable'}))
+        self.assertIn(':not(.btn-check)+.btn:active', selectors)
+        self.assertIn('.collapse:not(.show)', selectors)
+        self.assertIn('.visually-hidden-focusable:not(:focus):not(:focus-within)', selectors)
+        self.assertNotIn('.btn-check:checked+.btn', selectors)
+        self.assertNotIn('.btn.active', selectors)
+
+    def test_combinator_selector_needs_every_class(self):
+        selectors = _selectors(self.purge({'btn', 'btn-check'}))
+        self.assertIn('.btn-check:checked+.btn', selectors)
+        self.assertNotIn('.tooltip', selectors)
+
+    def test_media_keeps_only_used_rules(self):
+        css = self.purge({'navbar-expand-lg'})
+        self.assertIn('@media (min-width:992px){.navbar-expand-lg{flex-wrap:nowrap}}', css)
+
+    def test_runtime_classes_are_kept(self):
+        """Классы, которые добавляет JS Bootstrap, остаются без упоминания в шаблонах."""
+        selectors = _selectors(purge_css(BOOTSTRAP_FRAGMENT, {'carousel-item', 'collapse'} | {
+            'active', 'show', 'carousel-item-next', 'carousel-item-prev', 'carousel-item-start', 'carousel-item-end',
+        }))
+        for selector in (
+            '.carousel-item-next', '.carousel-item-prev', '.carousel-item.active', '.active.carousel-item-end',
+            '.carousel-item-next:not(.carousel-item-start)', '.collapse:not(.show)',
+        ):
+            self.assertIn(selector, selectors)
+
+
+class VendorBuildTests(SimpleTestCase):
+    """Сборка из исходников в vendor/ (Bootstrap 5.3.3, Font Awesome Free 6.6.0)."""
+
+    def test_bootstrap_keeps_runtime_classes(self):
+        selectors = _selectors(build_bootstrap_css(set()))
+        for selector in ('.carousel-item-next', '.fade:not(.show)', '.collapse:not(.show)', '.collapsing'):
+            self.assertIn(selector, selectors)
+        self.assertNotIn('.tooltip', selectors)
+
+    def test_bootstrap_keeps_template_classes(self):
+        with open(BOOTSTRAP_CSS, encoding='utf-8') as f:
+            full = f.read()
+        css = build_bootstrap_css(used_classes())
+        self.assertLess(len(css), len(full) / 4)
+        selectors = _selectors(css)
+        for selector in ('.navbar-expand-lg .navbar-collapse', '.navbar-toggler', '.container', '.d-flex'):
+            self.assertIn(selector, selectors)
+
+    def test_icon_collection(self):
+        icons = used_icons([
+            ['fas', 'fa-eye', 'feature-icon'],
+            ['fab', 'fa-telegram', 'fa-2x'],
+            ['fa-solid', 'fa-map-marked-alt', 'fa-fw'],
+            # Без класса стиля это не иконка
+            ['fa-eye'],
+        ])
+        self.assertEqual(icons, {('solid', 'eye'), ('brands', 'telegram'), ('solid', 'map-marked-alt')})
+
+    def test_template_icons_have_sources(self):
+        css, missing = build_icons_css(used_icons(icon_elements()))
+        self.assertEqual(missing, [])
+        self.assertIn('.fa-eye{--fa-icon:url("data:image/svg+xml,', css)
+        # Имя из Font Awesome 5 берётся из файла с новым именем
+        self.assertIn('.fa-map-marked-alt{', css)
+
+    def test_committed_build_is_current(self):
+        """Собранные файлы в репозитории совпадают со сборкой из исходников и шаблонов."""
+        with open(os.path.join(OUTPUT_DIR, 'bootstrap.min.css'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), build_bootstrap_css(used_classes()))
+        with open(os.path.join(OUTPUT_DIR, 'icons.css'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), build_icons_css(used_icons(icon_elements()))[0])
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class VendorStaticTests(SimpleTestCase):
+
+    def test_local_build_is_used(self):
+        for name, (path, fallback) in settings.VENDOR_ASSETS.items():
+            with self.subTest(name), override_settings(DEBUG=True):
+                self.assertEqual(vendor_static(name), settings.STATIC_URL + path)
+
+    @override_settings(DEBUG=True, VENDOR_ASSETS={'missing_css': ('landing/vendor/missing.css', 'https://cdn.example/x.css')})
+    def test_cdn_without_build(self):
+        self.assertEqual(vendor_static('missing_css'), 'https://cdn.example/x.css')
@@ -1,8 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from .metrics import metrics_view
+
+# Под ASGI видео и медиа отдаются асинхронно и не держат поток на всё время загрузки
+if settings.MEDIA_ASYNC_STREAMING:
+    stream_video, serve_media = views.stream_video_async, views.serve_media_async
+else:
+    stream_video, serve_media = views.stream_video, views.serve_media
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('privacy-policy/', views.privacy_policy, name='privacy_policy'),
-    path('media/videos/<str:filename>', views.stream_video, name='stream_video'),
+    path('api/albums/<int:album_id>/screenshots/', views.album_screenshots, name='album_screenshots'),
+    path('api/app-screenshots/', views.app_screenshots, name='app_screenshots'),
+    path('video/trailer.m3u8', views.trailer_playlist, name='trailer_playlist'),
+    path('media/videos/<str:filename>', stream_video, name='stream_video'),
+    path('media/<path:path>', serve_media, name='serve_media'),
+    path('metrics', metrics_view, name='metrics'),
 ]
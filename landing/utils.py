@@ -0,0 +1,51 @@
+import os
+import re
+import stat
+import tempfile
+
+
+def write_atomic(path, data, mode=0o644):
+    """
+    Записывает файл через временный файл и os.replace: читатели (воркеры,
+    nginx) видят либо старую, либо новую версию целиком.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def private_directory(path):
+    """
+    Создаёт каталог path с правами 0700 и проверяет, что это каталог (не
+    ссылка) текущего пользователя. Файлы в нём воркеры отображают в память
+    и читают как свои, поэтому чужой каталог — ошибка, а не предупреждение.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):  # Windows: права не проверяются
+        return path
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError('%s должен быть каталогом пользователя сайта' % path)
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def split_lines(text):
+    """Непустые строки текста без пробелов по краям."""
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+def tel_link(phone):
+    """Ссылка tel: из номера в любом написании: остаются цифры и плюс."""
+    number = re.sub(r'[^\d+]', '', phone or '')
+    return 'tel:%s' % number if number else ''
@@ -0,0 +1,215 @@
+"""
+Сборка сторонних стилей и иконок из исходников в репозитории.
+
+Вместо полного Bootstrap и всего Font Awesome с CDN сайт подключает:
+  landing/vendor/bootstrap.min.css     — Bootstrap только с классами из шаблонов;
+  landing/vendor/bootstrap.bundle.min.js — локальная копия JS Bootstrap;
+  landing/vendor/icons.css             — используемые иконки Font Awesome
+                                          в виде SVG-масок (шрифт не нужен).
+
+Исходники лежат в settings.VENDOR_SOURCE_DIR и в сборке сеть не нужна:
+  bootstrap/bootstrap.min.css, bootstrap/bootstrap.bundle.min.js
+      — из dist/ архива Bootstrap 5.3.3;
+  fontawesome/svgs/{solid,regular,brands}/*.svg, fontawesome/LICENSE.txt
+      — из архива Font Awesome Free 6.6.0 (fontawesome-free-6.6.0-web).
+
+Собранные файлы коммитятся; если файла нет, шаблоны берут его с CDN
+(см. vendor_static).
+"""
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.template.utils import get_app_template_dirs
+
+from .assets import minify_css, purge_css
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'static', 'landing', 'vendor')
+
+# Классы, которые JS Bootstrap добавляет сам: в шаблонах их нет
+BOOTSTRAP_RUNTIME_CLASSES = frozenset((
+    'active', 'show', 'showing', 'hiding', 'collapse', 'collapsing', 'collapse-horizontal', 'fade',
+    'carousel-item-next', 'carousel-item-prev', 'carousel-item-start', 'carousel-item-end', 'pointer-event',
+    'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop', 'was-validated', 'is-valid', 'is-invalid',
+    'disabled',
+))
+
+ICON_STYLES = {
+    'fa': 'solid', 'fas': 'solid', 'fa-solid': 'solid',
+    'far': 'regular', 'fa-regular': 'regular',
+    'fab': 'brands', 'fa-brands': 'brands',
+}
+# Служебные классы Font Awesome, а не имена иконок
+ICON_MODIFIERS = frozenset((
+    'fa-fw', 'fa-lg', 'fa-xs', 'fa-sm', 'fa-xl', 'fa-2xl', 'fa-spin', 'fa-pulse', 'fa-beat', 'fa-fade',
+    'fa-flip', 'fa-shake', 'fa-border', 'fa-inverse', 'fa-li', 'fa-ul', 'fa-stack', 'fa-stack-1x',
+    'fa-stack-2x', 'fa-rotate-90', 'fa-rotate-180', 'fa-rotate-270', 'fa-flip-horizontal', 'fa-flip-vertical',
+) + tuple('fa-%dx' % size for size in range(1, 11)))
+# Шаблоны написаны под имена Font Awesome 5, в архиве 6-й версии файлы переименованы
+ICON_ALIASES = {
+    'cogs': 'gears',
+    'home': 'house',
+    'map-marked-alt': 'map-location-dot',
+    'map-marker-alt': 'location-dot',
+    'search': 'magnifying-glass',
+    'shield-alt': 'shield-halved',
+    'sign-out-alt': 'right-from-bracket',
+    'times': 'xmark',
+    'external-link-alt': 'up-right-from-square',
+}
+
+_CLASS_ATTRS = re.compile(r'''class\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+_TEMPLATE_SYNTAX = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+_JS_STRINGS = re.compile(r'''"((?:\\.|[^"\\])*)"|'((?:\\.|[^'\\])*)\'''')
+_CLASS_NAME = re.compile(r'^-?[_a-zA-Z][-\w]*$')
+_SVG_COMMENTS = re.compile(r'<!--.*?-->', re.S)
+_SVG_VIEWBOX = re.compile(r'viewBox="([\d.\s-]+)"')
+
+
+class VendorSourceError(Exception):
+    pass
+
+
+def template_files():
+    dirs = list(get_app_template_dirs('templates'))
+    for engine in settings.TEMPLATES:
+        dirs.extend(str(path) for path in engine.get('DIRS', ()))
+    # Только шаблоны проекта: админка и сторонние приложения свои стили не берут из Bootstrap сайта
+    project_root = str(settings.BASE_DIR)
+    for directory in dirs:
+        if not os.path.abspath(directory).startswith(project_root):
+            continue
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt')):
+                    yield os.path.join(root, name)
+
+
+def script_files():
+    static_dir = os.path.join(os.path.dirname(__file__), 'static')
+    for root, _dirs, files in os.walk(static_dir):
+        if os.path.abspath(root).startswith(OUTPUT_DIR):
+            continue
+        for name in files:
+            if name.endswith('.js'):
+                yield os.path.join(root, name)
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _template_classes(source):
+    for match in _CLASS_ATTRS.finditer(source):
+        value = match.group(1) if match.group(1) is not None else match.group(2)
+        # Ветки {% if %} внутри class="..." оставляют свои классы, выражения отбрасываются
+        yield from _TEMPLATE_SYNTAX.sub(' ', value).split()
+
+
+def _script_classes(source):
+    for match in _JS_STRINGS.finditer(source):
+        value = match.group(1) if match.group(1) is not None else match.group(2)
+        yield from value.split()
+
+
+def used_classes():
+    """Все классы из шаблонов проекта и строк в его скриптах."""
+    classes = set()
+    for path in template_files():
+        classes.update(_template_classes(_read(path)))
+    for path in script_files():
+        classes.update(_script_classes(_read(path)))
+    return {name for name in classes if _CLASS_NAME.match(name)}
+
+
+def used_icons(classes_by_element):
+    """Множество (стиль, имя) по спискам классов отдельных элементов."""
+    icons = set()
+    for classes in classes_by_element:
+        style = next((ICON_STYLES[name] for name in classes if name in ICON_STYLES), None)
+        if style is None:
+            continue
+        for name in classes:
+            if name.startswith('fa-') and name not in ICON_STYLES and name not in ICON_MODIFIERS:
+                icons.add((style, name[3:]))
+    return icons
+
+
+def icon_elements():
+    for path in template_files():
+        for match in _CLASS_ATTRS.finditer(_read(path)):
+            value = match.group(1) if match.group(1) is not None else match.group(2)
+            yield _TEMPLATE_SYNTAX.sub(' ', value).split()
+
+
+def _source(*parts):
+    path = os.path.join(settings.VENDOR_SOURCE_DIR, *parts)
+    if not os.path.exists(path):
+        raise VendorSourceError('Нет исходного файла %s' % path)
+    return path
+
+
+def build_bootstrap_css(classes):
+    css = _read(_source('bootstrap', 'bootstrap.min.css'))
+    return purge_css(css, classes | BOOTSTRAP_RUNTIME_CLASSES)
+
+
+def _svg_data_uri(svg):
+    svg = ' '.join(_SVG_COMMENTS.sub('', svg).split())
+    return 'data:image/svg+xml,' + quote(svg.replace('"', "'"), safe=" /=:'-.,;()#")
+
+
+def build_icons_css(icons):
+    """
+    CSS с иконками в виде масок: <i class="fas fa-eye"> остаётся прежним,
+    иконка рисуется цветом текста и масштабируется по font-size.
+    """
+    rules = []
+    selectors = sorted('.' + name for name in ICON_STYLES)
+    rules.append(
+        '%s{display:inline-block;width:1em;height:1em;vertical-align:-.125em;background-color:currentColor;'
+        '-webkit-mask:var(--fa-icon) center/contain no-repeat;mask:var(--fa-icon) center/contain no-repeat}'
+        % ','.join(selectors)
+    )
+    missing = []
+    for style, name in sorted(icons):
+        filename = ICON_ALIASES.get(name, name) + '.svg'
+        path = os.path.join(settings.VENDOR_SOURCE_DIR, 'fontawesome', 'svgs', style, filename)
+        if not os.path.exists(path):
+            missing.append('%s/%s' % (style, name))
+            continue
+        svg = _read(path)
+        width = 1
+        viewbox = _SVG_VIEWBOX.search(svg)
+        if viewbox:
+            _, _, box_width, box_height = (float(value) for value in viewbox.group(1).split())
+            width = round(box_width / box_height, 4)
+        rules.append('.fa-%s{--fa-icon:url("%s");width:%sem}' % (name, _svg_data_uri(svg), width))
+    license_note = '/*! Font Awesome Free by @fontawesome - https://fontawesome.com ' \
+                   'License - https://fontawesome.com/license/free (Icons: CC BY 4.0) */'
+    return license_note + minify_css(''.join(rules)), missing
+
+
+def build_vendor_assets():
+    """Пишет собранные файлы в OUTPUT_DIR. Возвращает {имя: размер в байтах}."""
+    classes = used_classes()
+    outputs = {
+        'bootstrap.min.css': build_bootstrap_css(classes),
+        'bootstrap.bundle.min.js': _read(_source('bootstrap', 'bootstrap.bundle.min.js')),
+    }
+    outputs['icons.css'], missing = build_icons_css(used_icons(icon_elements()))
+    if missing:
+        # Без маски иконка превратится в закрашенный квадрат
+        raise VendorSourceError(
+            'Не найдены иконки: %s. Если в Font Awesome 6 у них другие имена, '
+            'добавьте их в ICON_ALIASES' % ', '.join(missing)
+        )
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    sizes = {}
+    for name, content in outputs.items():
+        with open(os.path.join(OUTPUT_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+        sizes[name] = len(content.encode('utf-8'))
+    return sizes
@@ -1,24 +1,78 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
-from django.http import Http404, StreamingHttpResponse
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
+import asyncio
 import os
 import mimetypes
-from django.utils.http import http_date
-from django.utils.timezone import now
+import secrets
+from urllib.parse import quote
+from django.utils.cache import get_conditional_response
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import condition, require_safe
 
+from .cache import cache_page_for_content, content_etag, content_last_modified
+from .images import image_payload
 from .models import (
-    AboutBlock, Trailer, ProductInfo, ScreenshotAlbum, AppScreenshot, 
+    AboutBlock, Trailer, ProductInfo, ScreenshotAlbum, Screenshot, AppScreenshot,
     VersionsBlock, FPVMode, PurchaseOptionsBlock, Footer, PrivacyPolicy, PageSettings
 )
+from .querybudget import query_budget
+from .shm import MediaReader
+from .snapshot import get_snapshot
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+from .streams import limit_streams
+
+
+# Сколько слайдов галереи отдаёт JSON API за один запрос
+GALLERY_PAGE_SIZE = 12
+GALLERY_MAX_PAGE_SIZE = 50
+
+
+def gallery_albums():
+    """
+    Альбомы для первого рендера: только число скриншотов и первый слайд,
+    остальные подгружает gallery.js через album_screenshots.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.albums
+    albums = list(ScreenshotAlbum.objects.annotate(
+        screenshot_count=Count('screenshots'),
+        first_screenshot_id=Min('screenshots__id'),
+    ))
+    first_screenshots = Screenshot.objects.in_bulk(
+        [album.first_screenshot_id for album in albums if album.first_screenshot_id]
+    )
+    for album in albums:
+        album.first_screenshot = first_screenshots.get(album.first_screenshot_id)
+    return albums
 
 
+@query_budget(6)
+@condition(etag_func=content_etag, last_modified_func=content_last_modified)
+@cache_page_for_content
 def index(request):
+    snapshot = get_snapshot()
+    if snapshot is None:
+        # Галереи ленивые: секции из кэша фрагментов (cache_section) не делают запросов
+        app_screenshots = AppScreenshot.objects.order_by('order', 'pk')
+        first_app_screenshot = SimpleLazyObject(app_screenshots.first)
+        app_screenshot_count = SimpleLazyObject(app_screenshots.count)
+    else:
+        first_app_screenshot = snapshot.app_screenshots[0] if snapshot.app_screenshots else None
+        app_screenshot_count = len(snapshot.app_screenshots)
     context = {
         'about_block': AboutBlock.load(),
         'trailer': Trailer.load(),
         'product_info': ProductInfo.load(),
-        'screenshot_albums': ScreenshotAlbum.objects.prefetch_related('screenshots').all(),
-        'app_screenshots': AppScreenshot.objects.all().order_by('order'),
+        'screenshot_albums': SimpleLazyObject(gallery_albums),
+        'first_app_screenshot': first_app_screenshot,
+        'app_screenshot_count': app_screenshot_count,
         'versions_block': VersionsBlock.load(),
         'fpv_mode': FPVMode.load(),
         'purchase_options_block': PurchaseOptionsBlock.load(),
@@ -27,56 +81,412 @@ def index(request):
     }
     return render(request, 'landing/index.html', context)
 
+@query_budget(2)
+@condition(etag_func=content_etag, last_modified_func=content_last_modified)
+@cache_page_for_content
 def privacy_policy(request):
     privacy_policy = PrivacyPolicy.load()
-    return render(request, 'landing/privacy_policy.html', {'privacy_policy': privacy_policy})
+    # Подвал base.html кэшируется общим фрагментом, поэтому данные те же, что на главной
+    return render(request, 'landing/privacy_policy.html', {'privacy_policy': privacy_policy, 'footer': Footer.load()})
 
 
-def stream_video(request, filename):
-    # Раздаём только из MEDIA_ROOT/videos/
-    video_dir = os.path.join(settings.MEDIA_ROOT, 'videos')
-    file_path = os.path.join(video_dir, filename)
-    if not os.path.isfile(file_path):
+def _page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', GALLERY_PAGE_SIZE))
+    except ValueError:
+        limit = GALLERY_PAGE_SIZE
+    return min(max(limit, 1), GALLERY_MAX_PAGE_SIZE)
+
+
+def _gallery_page(items, limit, cursor_for, describe):
+    """Ответ JSON API галереи: слайды и курсор следующей страницы."""
+    items = list(items[:limit + 1])
+    next_cursor = cursor_for(items[limit - 1]) if len(items) > limit else None
+    return JsonResponse({
+        'items': [dict(image_payload(item.image), id=item.pk, **describe(item)) for item in items[:limit]],
+        'next': next_cursor,
+    })
+
+
+@query_budget(2)
+@require_safe
+@condition(etag_func=content_etag)
+def album_screenshots(request, album_id):
+    """Скриншоты альбома по возрастанию id, курсор ?after=<id>."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        album = get_object_or_404(ScreenshotAlbum, pk=album_id)
+        screenshots = album.screenshots.order_by('pk')
+    elif album_id in snapshot.screenshots:
+        screenshots = snapshot.screenshots[album_id]
+    else:
         raise Http404()
+    after = request.GET.get('after', '')
+    if after:
+        if not after.isdigit():
+            return HttpResponseBadRequest('Некорректный курсор')
+        if snapshot is None:
+            screenshots = screenshots.filter(pk__gt=int(after))
+        else:
+            screenshots = [screenshot for screenshot in screenshots if screenshot.pk > int(after)]
+    return _gallery_page(
+        screenshots, _page_limit(request),
+        cursor_for=lambda screenshot: str(screenshot.pk),
+        describe=lambda screenshot: {'alt': screenshot.caption, 'caption': screenshot.caption},
+    )
 
-    file_size = os.path.getsize(file_path)
-    range_header = request.headers.get('Range')
-    content_type = 'video/mp4'
-
-    def file_iterator(start, end, chunk_size=8192):
-        with open(file_path, 'rb') as f:
-            f.seek(start)
-            remaining = end - start + 1
-            while remaining > 0:
-                chunk = f.read(min(chunk_size, remaining))
+
+@query_budget(1)
+@require_safe
+@condition(etag_func=content_etag)
+def app_screenshots(request):
+    """Скриншоты интерфейса по (order, id), курсор ?after=<order>-<id>."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        screenshots = AppScreenshot.objects.order_by('order', 'pk')
+    else:
+        screenshots = snapshot.app_screenshots
+    after = request.GET.get('after', '')
+    if after:
+        order, _, pk = after.partition('-')
+        if not (order.isdigit() and pk.isdigit()):
+            return HttpResponseBadRequest('Некорректный курсор')
+        order, pk = int(order), int(pk)
+        if snapshot is None:
+            screenshots = screenshots.filter(Q(order__gt=order) | Q(order=order, pk__gt=pk))
+        else:
+            screenshots = [screenshot for screenshot in screenshots if (screenshot.order, screenshot.pk) > (order, pk)]
+    return _gallery_page(
+        screenshots, _page_limit(request),
+        cursor_for=lambda screenshot: '%d-%d' % (screenshot.order, screenshot.pk),
+        describe=lambda screenshot: {'alt': screenshot.title, 'caption': ''},
+    )
+
+
+@query_budget(1)
+@require_safe
+@condition(etag_func=content_etag)
+def trailer_playlist(request):
+    """Плейлист HLS локального трейлера (сегменты — диапазоны файла в media/hls/)."""
+    trailer = Trailer.load()
+    if not trailer.local_video or not trailer.video_hls_playlist:
+        raise Http404()
+    return HttpResponse(trailer.video_hls_playlist, content_type='application/vnd.apple.mpegurl')
+
+
+# Блок чтения, когда WSGI-сервер не умеет sendfile (runserver и т.п.)
+FILE_BLOCK_SIZE = 512 * 1024
+# Больше диапазонов в одном запросе не обслуживаем, отдаём файл целиком
+MAX_RANGES = 16
+# Блок чтения для асинхронной отдачи под ASGI
+ASYNC_BLOCK_SIZE = 256 * 1024
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+
+
+class FileRange:
+    """
+    Файл, ограниченный диапазоном [start, start + length).
+
+    read() не выходит за конец диапазона, а fileno() и позиция файла
+    позволяют gunicorn отдать диапазон через os.sendfile без копирования.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def resolve_media_path(subdir, filename):
+    """Путь к файлу внутри MEDIA_ROOT/subdir, без выхода за его пределы."""
+    if '\x00' in filename:
+        raise Http404()
+    root = os.path.realpath(os.path.join(settings.MEDIA_ROOT, subdir))
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise Http404()
+    return path
+
+
+def _accel_redirect_path(path):
+    """Внутренний адрес nginx для файла из MEDIA_ROOT или None."""
+    if settings.MEDIA_OFFLOAD != 'x-accel':
+        return None
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+    return settings.MEDIA_OFFLOAD_PREFIX + quote(relative_path)
+
+
+def parse_range_header(header, size):
+    """
+    Разбирает заголовок Range (RFC 9110, раздел 14.2).
+
+    Возвращает None, если заголовок нужно проигнорировать и отдать файл
+    целиком, пустой список, если ни один диапазон не выполним (416),
+    иначе отсортированный список непересекающихся пар (start, end).
+    """
+    unit, _, range_set = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not range_set.strip():
+        return None
+    ranges = []
+    for spec in range_set.split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, dash, last = spec.partition('-')
+        first, last = first.strip(), last.strip()
+        if not dash or not (first.isdigit() or last.isdigit()):
+            return None
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # bytes=-N: последние N байт
+            suffix = int(last)
+            if suffix and size:
+                ranges.append((max(size - suffix, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        # Для If-Range допустимо только сильное сравнение
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _file_parts(path, parts, closing):
+    # Горячие блоки (начало и конец файла) MediaReader берёт из общей памяти
+    reader = MediaReader(path)
+    try:
+        for prefix, start, length in parts:
+            yield prefix
+            yield from reader.iter_range(start, length, FILE_BLOCK_SIZE)
+    finally:
+        reader.close()
+    yield closing
+
+
+async def _afile_parts(path, parts, closing):
+    # Чтение с диска идёт в пуле потоков, event loop свободен, а блоки из общей
+    # памяти копируются сразу. Следующий блок читается только после того, как
+    # сервер принял предыдущий (backpressure); при обрыве соединения Django
+    # отменяет генератор и файл закрывается.
+    reader = await asyncio.to_thread(MediaReader, path)
+    try:
+        for prefix, start, length in parts:
+            if prefix:
+                yield prefix
+            offset, end = start, start + length
+            while offset < end:
+                size = min(ASYNC_BLOCK_SIZE, end - offset)
+                chunk = reader.cached(offset, size)
+                if chunk is None:
+                    chunk = await asyncio.to_thread(reader.read, offset, size)
                 if not chunk:
                     break
-                remaining -= len(chunk)
+                offset += len(chunk)
                 yield chunk
+        if closing:
+            yield closing
+    finally:
+        reader.close()
 
-    if range_header:
-        try:
-            _, range_val = range_header.split('=')
-            start_str, end_str = (range_val.split('-') + [''])[:2]
-            start = int(start_str) if start_str else 0
-            end = int(end_str) if end_str else file_size - 1
-            end = min(end, file_size - 1)
-        except Exception:
-            start, end = 0, file_size - 1
-        length = end - start + 1
-        response = StreamingHttpResponse(file_iterator(start, end), status=206, content_type=content_type)
-        response['Content-Length'] = str(length)
-        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-        response['Accept-Ranges'] = 'bytes'
-        response['Last-Modified'] = http_date(os.path.getmtime(file_path))
-        response['Cache-Control'] = 'public, max-age=86400'
-        response['Date'] = http_date(now().timestamp())
-        return response
 
-    response = StreamingHttpResponse(file_iterator(0, file_size - 1), content_type=content_type)
-    response['Content-Length'] = str(file_size)
-    response['Accept-Ranges'] = 'bytes'
-    response['Last-Modified'] = http_date(os.path.getmtime(file_path))
-    response['Cache-Control'] = 'public, max-age=86400'
-    response['Date'] = http_date(now().timestamp())
+def _prepare_file_response(request, path, content_type, cache_control):
+    """
+    Общая часть serve_file и aserve_file: проверки, условные запросы
+    и разбор Range. Возвращает готовый ответ или описание тела ответа:
+    (status, content_type, headers, parts, closing), где parts — список
+    (префикс, начало, длина) кусков файла.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = '"%x-%x"' % (size, stat.st_mtime_ns)
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+    }
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        if conditional.status_code == 304:
+            for name, value in headers.items():
+                conditional[name] = value
+        return conditional, None
+
+    accel_path = _accel_redirect_path(path)
+    if accel_path is not None:
+        # Диапазоны, HEAD и передачу байтов через sendfile делает nginx,
+        # от нас остаются Content-Type и Cache-Control
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_path
+        response['Cache-Control'] = cache_control
+        return response, None
+
+    ranges = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(range_header, size)
+
+    if ranges == []:
+        headers['Content-Range'] = 'bytes */%d' % size
+        return HttpResponse(status=416, headers=headers), None
+
+    if ranges is None:
+        status, parts, closing = 200, [(b'', 0, size)], b''
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        if settings.MEDIA_STREAM_CHUNK and range_header.rstrip().endswith('-'):
+            # Открытый диапазон отдаём частью: плеер сам запросит продолжение
+            end = min(end, start + settings.MEDIA_STREAM_CHUNK - 1)
+        status, parts, closing = 206, [(b'', start, end - start + 1)], b''
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+    else:
+        boundary = secrets.token_hex(16)
+        status = 206
+        parts = []
+        for i, (start, end) in enumerate(ranges):
+            part_header = '%s--%s\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\n\r\n' % (
+                '\r\n' if i else '', boundary, content_type, start, end, size,
+            )
+            parts.append((part_header.encode('ascii'), start, end - start + 1))
+        closing = ('\r\n--%s--\r\n' % boundary).encode('ascii')
+        content_type = 'multipart/byteranges; boundary=%s' % boundary
+
+    headers['Content-Length'] = str(sum(len(prefix) + length for prefix, _, length in parts) + len(closing))
+    if request.method == 'HEAD':
+        return HttpResponse(status=status, content_type=content_type, headers=headers), None
+    return None, (status, content_type, headers, parts, closing)
+
+
+def serve_file(request, path, content_type=None, cache_control=MEDIA_CACHE_CONTROL):
+    """
+    Отдаёт файл с поддержкой HEAD, условных запросов и Range,
+    включая suffix-диапазоны, If-Range, 416 и multipart/byteranges.
+    """
+    response, body = _prepare_file_response(request, path, content_type, cache_control)
+    if response is not None:
+        return response
+    status, content_type, headers, parts, closing = body
+    _, start, length = parts[0]
+    if len(parts) > 1 or MediaReader(path).is_hot_range(start, length):
+        # Диапазон внутри горячей зоны отдаём из общей памяти. Всё остальное,
+        # включая GET всего файла, — через sendfile без копирования в Python
+        return StreamingHttpResponse(
+            _file_parts(path, parts, closing),
+            status=status, content_type=content_type, headers=headers,
+        )
+    response = FileResponse(
+        FileRange(open(path, 'rb'), start, length),
+        status=status, content_type=content_type, headers=headers,
+    )
+    response.block_size = FILE_BLOCK_SIZE
     return response
+
+
+async def aserve_file(request, path, content_type=None, cache_control=MEDIA_CACHE_CONTROL):
+    """Асинхронный вариант serve_file для ASGI: поток занят только на время чтения блока."""
+    response, body = await asyncio.to_thread(
+        _prepare_file_response, request, path, content_type, cache_control,
+    )
+    if response is not None:
+        return response
+    status, content_type, headers, parts, closing = body
+    return StreamingHttpResponse(
+        _afile_parts(path, parts, closing),
+        status=status, content_type=content_type, headers=headers,
+    )
+
+
+def media_cache_control(path):
+    # Файл с именем из хэша содержимого не меняется: кэшируем навсегда
+    return IMMUTABLE_CACHE_CONTROL if is_content_addressed(path) else MEDIA_CACHE_CONTROL
+
+
+def is_long_stream(path):
+    """Видео занимает воркер надолго, поэтому его отдачи ограничиваются; картинки — нет."""
+    return (mimetypes.guess_type(path)[0] or '').startswith('video/')
+
+
+@limit_streams
+def _stream_file(request, path):
+    return serve_file(request, path, cache_control=media_cache_control(path))
+
+
+@limit_streams
+async def _astream_file(request, path):
+    return await aserve_file(request, path, cache_control=media_cache_control(path))
+
+
+@query_budget(0)
+@require_safe
+def stream_video(request, filename):
+    # Раздаём только из MEDIA_ROOT/videos/
+    path = resolve_media_path('videos', filename)
+    return _stream_file(request, path)
+
+
+@query_budget(0)
+@require_safe
+def serve_media(request, path):
+    path = resolve_media_path('', path)
+    if is_long_stream(path):
+        return _stream_file(request, path)
+    return serve_file(request, path, cache_control=media_cache_control(path))
+
+
+@query_budget(0)
+@require_safe
+async def stream_video_async(request, filename):
+    path = await asyncio.to_thread(resolve_media_path, 'videos', filename)
+    return await _astream_file(request, path)
+
+
+@query_budget(0)
+@require_safe
+async def serve_media_async(request, path):
+    path = await asyncio.to_thread(resolve_media_path, '', path)
+    if is_long_stream(path):
+        return await _astream_file(request, path)
+    return await aserve_file(request, path, cache_control=media_cache_control(path))